@@ -0,0 +1,168 @@
+"""
+noteAI タイトル分析キャッシュ
+
+prepare_training_data_v2 の TitleAnalysis を、(タイトル, Power Score, 分析器のバージョン) のハッシュをキーに
+保存する。収集で追記された数百件のために全件を分析し直す代わりに、--incremental では新しい行・変わった行だけを
+分析し、残りはキャッシュの結果から出力を作り直す。
+
+仕組み:
+- キーは BLAKE2b(バージョン, Power Score, タイトル) の16バイト。値は TitleAnalysis の JSON
+- 分析器のバージョンは規則表（TITLE_PATTERNS・HOOK_PATTERNS）のハッシュなので、規則を変えると
+  キーが変わって自動的に分析し直しになる。開いたときに別のバージョンの行は削除する
+- キーごとに最後に参照した実行の ID（run_id）を別の細い表（seen）に記録し、実行が終わったら今回参照
+  しなかった行を削除する（スキ数の更新で Power Score が変わると別のキーになるので、古いキーを残さない）
+- 参照は記事をまとめて（CACHE_CONFIG["batch_size"] 件ずつ）1回の SELECT、書き込みも数千件ずつ1回
+- WAL なので --workers の各プロセスが同じファイルを開いて読み書きできる
+
+使用方法:
+    python prepare_training_data_v2.py --incremental
+    python analysis_cache.py stats
+    python analysis_cache.py clear
+"""
+
+import argparse
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ============================================================
+# 設定
+# ============================================================
+
+CACHE_CONFIG = {
+    "path": Path("data") / "processed" / "analysis_cache.sqlite",
+    "batch_size": 500,           # 1回の SELECT で引く記事数（SQLite の変数の上限より小さく）
+    "write_batch_size": 10000,   # 分析結果をこの件数ためてから1回のトランザクションで書き込む
+    "busy_timeout": 60,          # 他のワーカーが書き込み中のときに待つ秒数
+}
+
+# ============================================================
+# キャッシュ
+# ============================================================
+
+class AnalysisCache:
+    """(タイトル, Power Score, 分析器のバージョン) → TitleAnalysis の JSON"""
+
+    def __init__(self, version: str, path: Path = None, prune: bool = True, run_id: Optional[int] = None):
+        # run_id を渡すと、参照・追加した行にその ID を記録する（delete_stale で他の行を削除）
+        self.version = version
+        self.run_id = run_id
+        self.path = Path(path or CACHE_CONFIG["path"])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=CACHE_CONFIG["busy_timeout"])
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis (
+                key BLOB PRIMARY KEY,
+                version TEXT NOT NULL,
+                analysis TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        # 参照の記録は分析結果と別の表にする（毎回全行の run_id を書き換えても、細い行だけで済む）
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY, run_id INTEGER NOT NULL) "
+                          "WITHOUT ROWID")
+        self.invalidated = 0
+        if prune:
+            self.invalidated = self.conn.execute(
+                "DELETE FROM analysis WHERE version != ?", (self.version,)).rowcount
+        self.conn.commit()
+        self._pending: List[Tuple[bytes, str, str]] = []
+        self._touched: List[bytes] = []   # 今回参照・追加した行（flush で seen に run_id を記録）
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key(self, title: str, power_score) -> bytes:
+        text = f"{self.version}\x00{power_score!r}\x00{title}"
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, str]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(f"SELECT key, analysis FROM analysis WHERE key IN ({placeholders})", keys)
+        return dict(rows)
+
+    def lookup(self, notes: Iterable[Dict]) -> Iterator[Tuple[Dict, bytes, Optional[str]]]:
+        """記事 → (記事, キー, キャッシュ済みの分析の JSON か None)。記事は batch_size 件ずつまとめて引く"""
+        batch: List[Tuple[Dict, bytes]] = []
+        for note in notes:
+            batch.append((note, self.key(note.get("title", ""), note.get("power_score", 0))))
+            if len(batch) >= CACHE_CONFIG["batch_size"]:
+                yield from self._lookup_batch(batch)
+                batch = []
+        yield from self._lookup_batch(batch)
+
+    def _lookup_batch(self, batch: List[Tuple[Dict, bytes]]) -> Iterator[Tuple[Dict, bytes, Optional[str]]]:
+        cached = self.get_many([key for _, key in batch])
+        if self.run_id is not None:
+            self._touched += cached.keys()
+        for note, key in batch:
+            yield note, key, cached.get(key)
+        if len(self._pending) + len(self._touched) >= CACHE_CONFIG["write_batch_size"]:
+            self.flush()
+
+    def put(self, key: bytes, analysis: str):
+        self._pending.append((key, self.version, analysis))
+        if self.run_id is not None:
+            self._touched.append(key)
+
+    def flush(self):
+        if not self._pending and not self._touched:
+            return
+        self.conn.executemany("INSERT OR REPLACE INTO analysis (key, version, analysis) VALUES (?, ?, ?)",
+                              self._pending)
+        self.conn.executemany("INSERT OR REPLACE INTO seen (key, run_id) VALUES (?, ?)",
+                              ((key, self.run_id) for key in self._touched))
+        self.conn.commit()
+        self._pending = []
+        self._touched = []
+
+    def delete_stale(self) -> int:
+        """この run_id の実行で参照しなかった行を削除（削除した件数を返す。実行が最後まで終わってから呼ぶ）"""
+        self.flush()
+        deleted = self.conn.execute(
+            "DELETE FROM analysis WHERE key NOT IN (SELECT key FROM seen WHERE run_id = ?)", (self.run_id,)).rowcount
+        self.conn.execute("DELETE FROM seen WHERE run_id != ?", (self.run_id,))
+        self.conn.commit()
+        return deleted
+
+    def stats(self) -> Dict:
+        entries, versions = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT version) FROM analysis").fetchone()
+        file_bytes = sum(p.stat().st_size for p in self.path.parent.glob(self.path.name + "*"))
+        return {"entries": entries, "versions": versions, "file_bytes": file_bytes}
+
+    def print_report(self):
+        s = self.stats()
+        print(f"🗃️ タイトル分析キャッシュ: {s['entries']}件 ({s['file_bytes'] / 1e6:.1f}MB, {self.path})")
+        if self.invalidated:
+            print(f"  - 規則表の変更で無効化: {self.invalidated}件")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI タイトル分析キャッシュ")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--path", type=Path, default=CACHE_CONFIG["path"])
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        for path in args.path.parent.glob(args.path.name + "*"):
+            path.unlink()
+        print(f"🗑️ {args.path} を削除しました")
+    else:
+        # バージョンを渡さずに開く（他のバージョンの行も消さない）
+        with AnalysisCache("", args.path, prune=False) as cache:
+            cache.print_report()
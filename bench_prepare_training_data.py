@@ -0,0 +1,299 @@
+"""
+noteAI データ準備（prepare_training_data_v2）のベンチマーク
+
+合成タイトル・合成コーパスで、データ準備の各段階の速度を計測し、従来の処理と結果が同じことを確認する。
+
+使用方法:
+    python bench_prepare_training_data.py titles --titles 1000000     # タイトル照合（titles/sec）
+    python bench_prepare_training_data.py chars --titles 1000000      # 文字種の一括集計・漢字比率
+    python bench_prepare_training_data.py process --rows 200000 --workers 1 2 4   # process_data の並列化
+    python bench_prepare_training_data.py memory --sizes 10000 1000000   # process_data のピークメモリ（行数によらず一定か）
+    python bench_prepare_training_data.py incremental --rows 200000 --appended 500   # --incremental の再処理
+"""
+
+import argparse
+import filecmp
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+
+import prepare_training_data_v2 as prep
+
+# ============================================================
+# 合成データ
+# ============================================================
+
+# 実際のタイトルに出てくる断片（パターン・フックに当たるもの、当たらないもの、境界の例）
+TITLE_FRAGMENTS = [
+    "なぜ", "どうして", "私が", "副業を", "やめた", "辞めた", "3つの", "5選", "10個", "TOP10", "TOP３",
+    "１２つの", "理由", "本当に", "マジで", "ガチで", "めちゃくちゃ", "超", "最強", "神", "AIで", "ChatGPT",
+    "変わった", "になった", "できた", "できるように", "達成", "話", "した話", "という話", "って話", "の話",
+    "【保存版】", "「習慣」", "『読書』", "のコツ", "のやり方", "の始め方", "する方法", "〜の方法", "してみた",
+    "やってみた", "を試した", "体験記", "から", "月5万円", "だけ", "のみ", "限定", "秘密", "vs", "より",
+    "じゃなくて", "と", "しない", "捨てた", "やらない", "失敗", "とは？", "？", "?", "!!", "！！", "！",
+    "まとめ", "日記", "考察", "習慣化", "エンジニア", "30代", "転職", "投資", "読書", "noteを書く",
+]
+
+
+def iter_synthetic_titles(num_titles: int, seed: int = 0) -> Iterator[str]:
+    """断片を4〜20個つないだ合成タイトル（平均約40文字、収集データの実測に近い。末尾に改行が付いたものも少し混ぜる）"""
+    rng = random.Random(seed)
+    for _ in range(num_titles):
+        title = "".join(rng.choice(TITLE_FRAGMENTS) for _ in range(rng.randint(4, 20)))
+        if rng.random() < 0.01:
+            title += "\n"
+        yield title
+
+
+def synthetic_titles(num_titles: int, seed: int = 0) -> List[str]:
+    return list(iter_synthetic_titles(num_titles, seed))
+
+
+CATEGORIES = ["money_invest", "self_improvement", "ai_tech", "lifehack", "entertainment", "side_job"]
+
+
+def write_synthetic_notes(path: Path, num_rows: int, seed: int = 0, append: bool = False):
+    """収集データ（raw_notes_custom.jsonl）と同じ形の合成記事を書き出す（append なら追記）"""
+    rng = random.Random(seed)
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for i, title in enumerate(iter_synthetic_titles(num_rows, seed)):
+            followers = rng.randint(5, 3000)
+            likes = rng.randint(0, followers * 3)
+            note = {
+                "id": str(i),
+                "title": title,
+                "user_nickname": f"user{rng.randint(1, num_rows // 10 + 1)}",
+                "like_count": likes,
+                "follower_count": followers,
+                "power_score": round(likes / followers, 2),
+                "category": rng.choice(CATEGORIES),
+            }
+            f.write(json.dumps(note, ensure_ascii=False) + "\n")
+
+# ============================================================
+# タイトル照合
+# ============================================================
+
+def bench_titles(num_titles: int, seed: int):
+    """detect_patterns + detect_hooks（従来）と TITLE_MATCHER（1パス）の titles/sec と結果の一致"""
+    titles = synthetic_titles(num_titles, seed)
+
+    started = time.perf_counter()
+    legacy = [(prep.detect_patterns(title), prep.detect_hooks(title)) for title in titles]
+    legacy_elapsed = time.perf_counter() - started
+
+    match = prep.TITLE_MATCHER.match
+    started = time.perf_counter()
+    compiled = [match(title) for title in titles]
+    compiled_elapsed = time.perf_counter() - started
+
+    mismatches = sum(a != b for a, b in zip(legacy, compiled))
+
+    print("=" * 60)
+    print(f"📈 タイトル照合ベンチマーク（{num_titles}タイトル）")
+    print("=" * 60)
+    print(f"  detect_patterns + detect_hooks: {num_titles / legacy_elapsed:>10,.0f} titles/sec")
+    print(f"  TITLE_MATCHER（1パス）        : {num_titles / compiled_elapsed:>10,.0f} titles/sec "
+          f"({legacy_elapsed / compiled_elapsed:.1f}x)")
+    print(f"  不一致: {mismatches}件")
+
+# ============================================================
+# 文字種
+# ============================================================
+
+def _kanji_ratio_bonus(char_types) -> float:
+    """calculate_quality_score の文字種バランス項（1件ずつ）"""
+    total_chars = sum(char_types.values())
+    if total_chars > 0 and 0.2 <= char_types["kanji"] / total_chars <= 0.5:
+        return 0.05
+    return 0.0
+
+
+def bench_chars(num_titles: int, seed: int):
+    """analyze_char_types を1件ずつ（従来）と analyze_char_types_batch の速度と結果の一致"""
+    titles = synthetic_titles(num_titles, seed)
+
+    started = time.perf_counter()
+    legacy = [prep.analyze_char_types(title) for title in titles]
+    legacy_bonus = [_kanji_ratio_bonus(types) for types in legacy]
+    legacy_elapsed = time.perf_counter() - started
+
+    # 文字種表は1プロセスに1回だけ作る（保存済みなら読む）ので、その時間も一括の側に含めて比べる
+    started = time.perf_counter()
+    prep._build_char_class_table()
+    build_elapsed = time.perf_counter() - started
+
+    prep._char_class_table = prep._char_weight_table = None
+    started = time.perf_counter()
+    prep._get_char_class_table()
+    load_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    counts = prep.analyze_char_types_batch(titles)
+    bonus = prep.kanji_ratio_bonus_batch(counts)
+    batch_elapsed = time.perf_counter() - started
+
+    expected = np.array([[types[name] for name in prep.CHAR_TYPES] for types in legacy], dtype=np.int64)
+    mismatches = int((expected != counts).any(axis=1).sum()) + int((np.array(legacy_bonus) != bonus).sum())
+
+    print("=" * 60)
+    print(f"📈 文字種集計ベンチマーク（{num_titles}タイトル）")
+    print("=" * 60)
+    print(f"  1件ずつ（従来）      : {legacy_elapsed:6.2f}秒 ({num_titles / legacy_elapsed:>12,.0f} titles/sec)")
+    for label, setup in (("一括 + 表の読み込み   ", load_elapsed), ("一括 + 表の作成（初回）", build_elapsed)):
+        elapsed = batch_elapsed + setup
+        print(f"  {label}: {elapsed:6.2f}秒 ({num_titles / elapsed:>12,.0f} titles/sec, "
+              f"{legacy_elapsed / elapsed:.0f}x)")
+    print(f"  （表の作成 {build_elapsed:.3f}秒 / 読み込み {load_elapsed:.3f}秒 / 集計のみ {batch_elapsed:.2f}秒）")
+    print(f"  不一致: {mismatches}件")
+
+# ============================================================
+# process_data
+# ============================================================
+
+def bench_process(num_rows: int, workers: List[int], seed: int):
+    """process_data のワーカー数ごとの rows/sec と、出力が1プロセスのときとバイト単位で同じか"""
+    output_names = [prep.TRAINING_FILE.name, prep.EVOL_INSTRUCT_FILE.name, prep.QUALITY_REPORT_FILE.name]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = Path(tmp_dir) / "raw_notes.jsonl"
+        write_synthetic_notes(input_file, num_rows, seed)
+
+        print("=" * 60)
+        print(f"📈 process_data ベンチマーク（{num_rows}行、{input_file.stat().st_size / 1e6:.0f}MB）")
+        print("=" * 60)
+        baseline = None
+        for count in sorted(set([1] + workers)):
+            output_dir = Path(tmp_dir) / f"workers{count}"
+            started = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                prep.process_data(workers=count, input_file=input_file, output_dir=output_dir)
+            elapsed = time.perf_counter() - started
+
+            if baseline is None:
+                baseline, baseline_dir = elapsed, output_dir
+            _, mismatch, errors = filecmp.cmpfiles(baseline_dir, output_dir, output_names, shallow=False)
+            status = "一致" if not mismatch and not errors else f"不一致: {mismatch + errors}"
+            print(f"  workers={count:<3}: {elapsed:6.2f}秒 ({num_rows / elapsed:>10,.0f} rows/sec, "
+                  f"{baseline / elapsed:.1f}x)  出力: {status}")
+
+def bench_incremental(num_rows: int, num_appended: int, workers: int, seed: int):
+    """収集で数百件追記されたあとの再処理: 全件分析と --incremental（キャッシュ作成・追記後）の時間と出力の一致"""
+    output_names = [prep.TRAINING_FILE.name, prep.EVOL_INSTRUCT_FILE.name, prep.QUALITY_REPORT_FILE.name]
+
+    def run(label: str, output_dir: Path, incremental: bool, rows: int):
+        started = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            prep.process_data(workers=workers, input_file=input_file, output_dir=output_dir,
+                              incremental=incremental, cache_path=cache_path)
+        elapsed = time.perf_counter() - started
+        print(f"  {label:<30}: {elapsed:6.2f}秒 ({rows / elapsed:>10,.0f} rows/sec)")
+        return elapsed
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = Path(tmp_dir) / "raw_notes.jsonl"
+        cache_path = Path(tmp_dir) / "analysis_cache.sqlite"
+        write_synthetic_notes(input_file, num_rows, seed)
+
+        print("=" * 60)
+        print(f"📈 差分処理ベンチマーク（{num_rows}行 + 追記{num_appended}行、workers={workers}）")
+        print("=" * 60)
+        run("--incremental（キャッシュ作成）", Path(tmp_dir) / "cold", True, num_rows)
+        write_synthetic_notes(input_file, num_appended, seed + 1, append=True)
+        total = num_rows + num_appended
+        full = run("全件分析（追記後）", Path(tmp_dir) / "full", False, total)
+        warm = run("--incremental（追記後）", Path(tmp_dir) / "warm", True, total)
+
+        _, mismatch, errors = filecmp.cmpfiles(Path(tmp_dir) / "full", Path(tmp_dir) / "warm",
+                                               output_names, shallow=False)
+        status = "一致" if not mismatch and not errors else f"不一致: {mismatch + errors}"
+        print(f"  全件分析との比: {full / warm:.1f}x  出力: {status}")
+
+# 子プロセスで process_data を1回実行し、ピーク RSS（KB）を出力する。
+# Linux の ru_maxrss は exec 前の親プロセスの RSS も含むので、/proc の VmHWM を優先する
+_MEMORY_PROBE = """
+import os, resource, sys
+from contextlib import redirect_stdout
+from io import StringIO
+import prepare_training_data_v2 as prep
+with redirect_stdout(StringIO()):
+    prep.process_data(workers=int(sys.argv[3]), input_file=sys.argv[1], output_dir=sys.argv[2])
+if os.path.exists("/proc/self/status"):
+    with open("/proc/self/status") as f:
+        parent = next(line.split()[1] for line in f if line.startswith("VmHWM:"))
+else:
+    parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# --workers 2 以上のシャードを処理したワーカー（終了済みの子プロセス）のうち最大のピーク
+print(parent, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+MEMORY_TOLERANCE = 1.10   # 最小の行数に対するピーク RSS の許容倍率
+
+
+def bench_memory(sizes: List[int], workers: int, seed: int):
+    """行数を変えて process_data のピーク RSS を測り、行数によらず一定（許容倍率以内）か確かめる
+
+    親プロセスと、workers >= 2 ならワーカー（子プロセス）のうち最大のピークの大きい方で判定する。
+    """
+    print("=" * 60)
+    print(f"📈 process_data ピークメモリ（workers={workers}）")
+    print("=" * 60)
+    peaks = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_rows in sorted(sizes):
+            input_file = Path(tmp_dir) / f"raw_notes_{num_rows}.jsonl"
+            write_synthetic_notes(input_file, num_rows, seed)
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-c", _MEMORY_PROBE, str(input_file), str(Path(tmp_dir) / "out"), str(workers)],
+                cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True)
+            elapsed = time.perf_counter() - started
+            parent_mb, worker_mb = (int(value) / 1024 for value in result.stdout.split()[-2:])
+            peak_mb = max(parent_mb, worker_mb) if workers > 1 else parent_mb
+            peaks.append(peak_mb)
+            print(f"  {num_rows:>10,}行 ({input_file.stat().st_size / 1e6:7.1f}MB): "
+                  f"ピーク RSS {peak_mb:7.1f}MB" + (f"（親 {parent_mb:.1f}MB / ワーカー最大 {worker_mb:.1f}MB）"
+                                                   if workers > 1 else "") + f"  ({elapsed:.1f}秒)")
+            input_file.unlink()
+
+    growth = max(peaks) / peaks[0]
+    if growth > MEMORY_TOLERANCE:
+        print(f"  ❌ 行数に応じてメモリが増えています（{growth:.2f}倍 > {MEMORY_TOLERANCE}倍）")
+        sys.exit(1)
+    print(f"  ✅ 行数によらず一定（最小の行数の {growth:.2f}倍）")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI データ準備のベンチマーク")
+    parser.add_argument("command", choices=["titles", "chars", "process", "memory", "incremental"])
+    parser.add_argument("--titles", type=int, default=1_000_000, help="titles / chars: タイトル数")
+    parser.add_argument("--rows", type=int, default=200_000, help="process / incremental: 合成コーパスの行数")
+    parser.add_argument("--appended", type=int, default=500, help="incremental: 追記する行数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="process: 試すワーカー数 / memory・incremental: 先頭の値を使う")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000], help="memory: 行数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "titles":
+        bench_titles(args.titles, args.seed)
+    elif args.command == "chars":
+        bench_chars(args.titles, args.seed)
+    elif args.command == "process":
+        bench_process(args.rows, args.workers, args.seed)
+    elif args.command == "memory":
+        bench_memory(args.sizes, args.workers[0], args.seed)
+    elif args.command == "incremental":
+        bench_incremental(args.rows, args.appended, args.workers[0], args.seed)
@@ -16,14 +16,14 @@ note特化型AI開発プロジェクト - 完全版データ収集スクリプ
 1. キーワード検索でユーザーを発見
 2. 各ユーザーのフォロワー数を確認
 3. 条件に合うユーザーの記事を収集
-4. 「実力スコア」を計算してCSV出力
+4. 「実力スコア」を計算して出力（ユーザー1人分ごとに columnar_writer で書き出し）
 """
 
 import time
 from typing import Optional
 
-import pandas as pd
-import requests
+import http_client
+from columnar_writer import NOTE_SCHEMA, ColumnarWriter, RunningSummary
 
 # ==========================================
 # 設定
@@ -43,6 +43,10 @@ MAX_FOLLOWERS = 1000  # 最大フォロワー数（インフルエンサー除
 # 1キーワードあたりの検索結果数
 SEARCH_SIZE = 50
 
+# 出力ファイル（COLUMNAR_CONFIG["format"] で arrow / parquet も選べる）と列
+OUTPUT_FILE = "note_power_data.csv"
+SCHEMA = {name: kind for name, kind in NOTE_SCHEMA.items() if name != "published_at"}
+
 # APIアクセス間隔（秒）
 SLEEP_TIME = 2.0
 
@@ -63,7 +67,7 @@ def get_user_info(user_id: str) -> Optional[dict]:
     """ユーザー情報を取得"""
     url = f"https://note.com/api/v2/creators/{user_id}"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = http_client.get(url, headers=HEADERS, timeout=10)
         if r.status_code == 200:
             return r.json()["data"]
     except Exception:
@@ -81,7 +85,7 @@ def get_user_notes(user_id: str, max_pages: int = 10) -> list:
             f"https://note.com/api/v2/creators/{user_id}/contents?kind=note&page={page}"
         )
         try:
-            r = requests.get(url, headers=HEADERS, timeout=10)
+            r = http_client.get(url, headers=HEADERS, timeout=10)
             if r.status_code != 200:
                 break
 
@@ -109,7 +113,7 @@ def search_notes(keyword: str, size: int = 50) -> list:
     """キーワードで記事を検索し、ユーザーIDリストを取得"""
     url = f"https://note.com/api/v3/searches?q={keyword}&size={size}"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = http_client.get(url, headers=HEADERS, timeout=10)
         if r.status_code == 200:
             data = r.json()["data"]
             notes_data = data.get("notes", {})
@@ -125,7 +129,7 @@ def search_notes(keyword: str, size: int = 50) -> list:
 # ==========================================
 
 
-def collect_data() -> pd.DataFrame:
+def collect_data() -> RunningSummary:
     """完全なデータ収集フロー"""
 
     print("=" * 60)
@@ -181,80 +185,72 @@ def collect_data() -> pd.DataFrame:
 
     if not target_users:
         print("\n条件に合うユーザーが見つかりませんでした。")
-        return pd.DataFrame()
+        return RunningSummary()
 
-    # ステップ3: 記事データを収集
+    # ステップ3: 記事データを収集（ユーザー1人分ごとに書き出し、集計は逐次）
     print("\n[STEP 3] 記事データを収集中...")
-    all_data = []
 
-    for i, user in enumerate(target_users, 1):
-        user_id = user["user_id"]
-        followers = user["followers"]
-        nickname = user["nickname"]
+    with ColumnarWriter(OUTPUT_FILE, SCHEMA) as writer:
+        for i, user in enumerate(target_users, 1):
+            user_id = user["user_id"]
+            followers = user["followers"]
+            nickname = user["nickname"]
 
-        print(
-            f"  [{i}/{len(target_users)}] @{user_id} ({nickname}) - {followers}フォロワー"
-        )
+            print(
+                f"  [{i}/{len(target_users)}] @{user_id} ({nickname}) - {followers}フォロワー"
+            )
 
-        notes = get_user_notes(user_id)
+            notes = get_user_notes(user_id)
 
-        for note in notes:
-            title = note.get("name", "")
-            likes = note.get("likeCount", 0)
-            is_paid = note.get("isPaid", False)
-            note_key = note.get("key", "")
-
-            # 実力スコア = スキ数 ÷ フォロワー数
-            power_score = round(likes / followers, 4) if followers > 0 else 0
-
-            all_data.append(
-                {
-                    "user_id": user_id,
-                    "nickname": nickname,
-                    "followers": followers,
-                    "title": title,
-                    "likes": likes,
-                    "power_score": power_score,
-                    "is_paid": is_paid,
-                    "url": f"https://note.com/{user_id}/n/{note_key}",
-                }
-            )
+            for note in notes:
+                title = note.get("name", "")
+                likes = note.get("likeCount", 0)
+                is_paid = note.get("isPaid", False)
+                note_key = note.get("key", "")
 
-        print(f"    → {len(notes)}件の記事を取得")
-        time.sleep(SLEEP_TIME)
+                # 実力スコア = スキ数 ÷ フォロワー数
+                power_score = round(likes / followers, 4) if followers > 0 else 0
 
-    df = pd.DataFrame(all_data)
+                writer.write(
+                    {
+                        "user_id": user_id,
+                        "nickname": nickname,
+                        "followers": followers,
+                        "title": title,
+                        "likes": likes,
+                        "power_score": power_score,
+                        "is_paid": is_paid,
+                        "url": f"https://note.com/{user_id}/n/{note_key}",
+                    }
+                )
 
-    # ステップ4: 分析と保存
-    print("\n[STEP 4] データを分析・保存中...")
+            writer.flush()
+            print(f"    → {len(notes)}件の記事を取得")
+            time.sleep(SLEEP_TIME)
 
-    if not df.empty:
-        # 実力スコア順にソート
-        df = df.sort_values("power_score", ascending=False)
+    summary = writer.summary
 
-        # CSVに保存
-        output_file = "note_power_data.csv"
-        df.to_csv(output_file, index=False, encoding="utf-8-sig")
+    # ステップ4: 分析
+    print("\n[STEP 4] データを分析中...")
 
+    if summary.rows:
         print("\n" + "=" * 60)
         print("【収集完了サマリー】")
         print("=" * 60)
-        print(f"総記事数: {len(df)}件")
-        print(f"ユーザー数: {df['user_id'].nunique()}人")
-        print(f"有料記事数: {df['is_paid'].sum()}件")
+        summary.print_report()
 
         print("\n【実力スコア上位10件】（フォロワー比でスキが多い記事）")
-        top_10 = df.head(10)[["title", "likes", "followers", "power_score", "is_paid"]]
-        for i, row in top_10.iterrows():
+        for row in summary.top()[:10]:
             title = row["title"][:40]
             print(f"  {title}...")
             print(
                 f"    スキ: {row['likes']} | フォロワー: {row['followers']} | スコア: {row['power_score']:.2f}"
             )
 
-        print(f"\n✓ '{output_file}' に保存しました。")
+        print(f"\n✓ '{writer.path}' に保存しました（収集順。スコア順の並べ替えは読み込み側で）。")
+        http_client.print_stats()
 
-    return df
+    return summary
 
 
 # ==========================================
@@ -262,4 +258,4 @@ def collect_data() -> pd.DataFrame:
 # ==========================================
 
 if __name__ == "__main__":
-    df = collect_data()
+    summary = collect_data()
@@ -17,13 +17,26 @@ noteAI データ収集スクリプト - 世界最高水準版
 import csv
 import json
 import os
-import time
+import sys
+import threading
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-
-import requests
+from typing import Callable, Dict, List, Optional, Tuple
+
+import crawl_telemetry
+import http_client
+from creator_store import get_creator_store
+from crawl_pipeline import Pipeline, Stage
+from dedup_index import DedupIndex
+from jsonl_writer import JsonlWriter, atomic_write_json, rollback_jsonl
+from keyword_scheduler import KeywordScheduler
+from note_decode import Creator, Note, SearchPage, decode_contents, decode_creator, decode_search_page
+from note_merge import get_note_labels
+import search_iterator
+from search_iterator import SearchPager, iter_search_pages
+import response_cache
+from rate_limiter import limiter_from_config, parse_retry_after
 
 # ============================================================
 # 世界最高水準キーワード設定（2024-2025リサーチ結果）
@@ -166,9 +179,16 @@ CONFIG = {
     "min_followers": 5,         # フォロワー下限
     "min_likes_per_article": 20,  # 記事あたり最低いいね数
     "power_score_threshold": 0.5,  # Power Score閾値
-    "request_delay": 1.5,       # リクエスト間隔（秒）
+    "request_delay": 1.5,       # リクエスト間隔（秒）: 適応型レート制限の初期値
+    "min_request_delay": 1.0,   # 成功が続いたときの最短間隔
+    "max_request_delay": 20.0,  # 429/403 が続いたときの最長間隔
     "max_retries": 3,           # リトライ回数
     "articles_per_user": 30,    # ユーザーあたり最大記事数
+    "search_pages": 5,          # キーワードあたりの検索ページ数
+    "request_budget": None,     # スケジューラ版のリクエスト予算（None=全キーワード終了まで）
+    # パイプライン版（--pipeline）のステージ別ワーカー数とキュー上限
+    "pipeline_workers": {"search": 1, "profile": 2, "notes": 2},
+    "pipeline_queue_size": 50,
 }
 
 # ファイルパス
@@ -176,6 +196,7 @@ DATA_DIR = Path("data")
 PROGRESS_FILE = DATA_DIR / "collection_progress_custom.json"
 RAW_DATA_FILE = DATA_DIR / "raw_notes_custom.jsonl"
 USERS_FILE = DATA_DIR / "collected_users_custom.json"
+DEDUP_FILE = DATA_DIR / "dedup_index_custom.sqlite"   # 収集済み記事ID
 
 # HTTPヘッダー
 HEADERS = {
@@ -212,64 +233,68 @@ class NoteArticle:
 # API関数
 # ============================================================
 
-def api_request(url: str, params: dict = None) -> Optional[dict]:
-    """APIリクエスト（リトライ付き）"""
+# 全リクエスト共通の適応型レート制限（固定sleepの代わり）
+LIMITER = limiter_from_config(CONFIG)
+
+
+def api_request(url: str, params: dict = None, decode: Optional[Callable] = None):
+    """APIリクエスト（リトライ付き。decode を渡すと応答本文をそれで変換）"""
     for attempt in range(CONFIG["max_retries"]):
         try:
-            response = requests.get(
+            # トークンの取得（待機）はネットワークに出るときだけ。キャッシュのヒットはレート制御に数えない
+            response = http_client.get(
                 url,
                 params=params,
                 headers=HEADERS,
-                timeout=30
+                timeout=30,
+                limiter=LIMITER,
             )
 
             if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 403:
-                print(f"  ⚠️ 403 Forbidden - 待機中...")
-                time.sleep(10)
-            elif response.status_code == 429:
-                print(f"  ⚠️ 429 Rate Limited - 待機中...")
-                time.sleep(30)
+                if not http_client.is_cache_hit(response):
+                    LIMITER.on_success()
+                return decode(response.content) if decode else response.json()
+            elif response.status_code in (403, 429):
+                wait_time = LIMITER.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+                print(f"  ⚠️ {response.status_code} - {wait_time:.0f}秒待機中...")
             else:
                 print(f"  ⚠️ Status {response.status_code}")
+                LIMITER.on_error(CONFIG["request_delay"] * (attempt + 1))
 
         except Exception as e:
             print(f"  ❌ Error: {e}")
-
-        time.sleep(CONFIG["request_delay"] * (attempt + 1))
+            LIMITER.on_error(CONFIG["request_delay"] * (attempt + 1))
 
     return None
 
 
-def search_notes(keyword: str, page: int = 1) -> List[dict]:
-    """キーワードで記事検索"""
+def fetch_search_page(keyword: str, start: int, size: int = 20) -> Optional[SearchPage]:
+    """検索結果の1ページ（contents, isLastPage）を取得"""
     url = f"{BASE_URL}/v3/searches"
     params = {
         "q": keyword,
-        "size": 20,
-        "start": (page - 1) * 20,
+        "size": size,
+        "start": start,
         "sort": "like_count",
         "context": "note",
     }
 
-    result = api_request(url, params)
-    if result and "data" in result:
-        notes = result["data"].get("notes", {})
-        return notes.get("contents", [])
-    return []
+    return api_request(url, params, decode=decode_search_page)
+
+
+def search_notes(keyword: str, page: int = 1) -> List[Note]:
+    """キーワードで記事検索"""
+    notes = fetch_search_page(keyword, (page - 1) * 20)
+    return notes.get("contents", []) if notes else []
 
 
-def get_user_info(urlname: str) -> Optional[dict]:
+def get_user_info(urlname: str) -> Optional[Creator]:
     """ユーザー情報取得"""
     url = f"{BASE_URL}/v2/creators/{urlname}"
-    result = api_request(url)
-    if result and "data" in result:
-        return result["data"]
-    return None
+    return api_request(url, decode=decode_creator)
 
 
-def get_user_notes(urlname: str, page: int = 1) -> List[dict]:
+def get_user_notes(urlname: str, page: int = 1) -> List[Note]:
     """ユーザーの記事一覧取得"""
     url = f"{BASE_URL}/v2/creators/{urlname}/contents"
     params = {
@@ -278,11 +303,7 @@ def get_user_notes(urlname: str, page: int = 1) -> List[dict]:
         "per_page": 20,
     }
 
-    result = api_request(url, params)
-    if result and "data" in result:
-        contents = result["data"].get("contents", [])
-        return contents
-    return []
+    return api_request(url, params, decode=decode_contents) or []
 
 
 # ============================================================
@@ -296,17 +317,174 @@ def calculate_power_score(like_count: int, follower_count: int) -> float:
     return round(like_count / follower_count, 3)
 
 
-def collect_data():
-    """メイン収集処理"""
-    DATA_DIR.mkdir(exist_ok=True)
+def is_target_follower_count(follower_count: int) -> bool:
+    """フォロワー数フィルタ"""
+    return CONFIG["min_followers"] <= follower_count <= CONFIG["max_followers"]
+
+
+def build_article(article: dict, user: dict, urlname: str, follower_count: int,
+                  category: str, keyword: str) -> Optional[NoteArticle]:
+    """記事APIの応答からNoteArticleを作成（スキ数・Power Scoreフィルタ込み）"""
+    like_count = article.get("likeCount", 0)
+
+    if like_count < CONFIG["min_likes_per_article"]:
+        return None
+
+    power_score = calculate_power_score(like_count, follower_count)
+
+    if power_score < CONFIG["power_score_threshold"]:
+        return None
 
-    # 進捗読み込み
-    collected_users = set()
+    return NoteArticle(
+        id=str(article.get("id", "")),
+        title=article.get("name", ""),
+        user_id=str(user.get("id", "")),
+        user_name=user.get("nickname", ""),
+        user_urlname=urlname,
+        like_count=like_count,
+        follower_count=follower_count,
+        power_score=power_score,
+        category=category,
+        keyword=keyword,
+        body_preview=article.get("body", "")[:200],
+        published_at=article.get("publishAt", ""),
+        url=f"https://note.com/{urlname}/n/{article.get('key', '')}",
+    )
+
+
+def load_collected_users() -> set:
+    """収集済みユーザーを読み込む"""
     if USERS_FILE.exists():
         with open(USERS_FILE, "r", encoding="utf-8") as f:
-            collected_users = set(json.load(f))
+            return set(json.load(f))
+    return set()
+
+
+def load_collected_notes() -> DedupIndex:
+    """保存済みの記事IDのインデックスを開く（同じ記事を別のキーワードから重ねて保存しないため）
+
+    読み直すのは前回の commit 以降に書かれた行だけ。load_state の取り消しの後に呼ぶ。
+    """
+    notes = DedupIndex(DEDUP_FILE, "notes")
+    notes.catch_up(RAW_DATA_FILE, "id")
+    return notes
+
+
+def load_progress() -> Dict:
+    """進捗（キーワード・検索ページ・処理中ページの残り・収集済みユーザー）を読み込む"""
+    if PROGRESS_FILE.exists():
+        with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"keyword_index": 0, "pager": None, "pending_notes": [], "total_articles": 0}
+
+
+def load_state() -> Tuple[Dict, set]:
+    """進捗と収集済みユーザーを読み込み、最後のチェックポイント以降の書き込みを取り消す
+
+    全モード（通常・パイプライン・スケジューラ）が同じ進捗ファイルにデータ位置と収集済みユーザーを
+    チェックポイントするので、どのモードの後に起動しても、取り消すのは最後のチェックポイント以降の
+    書き込みだけで、取り消した記事のクリエイターは再処理される。
+    """
+    progress = load_progress()
+    collected_users = set(progress["collected_users"]) if "collected_users" in progress \
+        else load_collected_users()
+    if "data_offset" in progress:
+        # チェックポイント以降に書かれた記事は、そのクリエイターを再処理するので取り消す
+        rolled_back = rollback_jsonl(RAW_DATA_FILE, progress["data_offset"])
+        if rolled_back:
+            print(f"🩹 チェックポイント以降の書き込み {rolled_back}バイトを取り消しました")
+    return progress, collected_users
+
+
+def checkpoint_users(writer: JsonlWriter, progress: Dict, collected_users: set, collected_notes: DedupIndex):
+    """記事データを永続化してから、データ位置と収集済みユーザーを進捗に保存（パイプライン版・スケジューラ版）
+
+    キーワード・検索ページの位置（collect_data の再開用）はそのまま残す。
+    """
+    progress["collected_users"] = sorted(collected_users)
+    writer.checkpoint(PROGRESS_FILE, progress)
+    collected_notes.commit(RAW_DATA_FILE)  # ディスクに書いた記事のIDだけを記録
+    atomic_write_json(USERS_FILE, progress["collected_users"])
+
+
+def write_article(article_data: NoteArticle, collected_notes: DedupIndex, writer: JsonlWriter) -> bool:
+    """記事を1回だけ保存（保存済みならラベルだけ追加）。保存したらTrue"""
+    labels = get_note_labels()
+    labels.add(article_data.id, article_data.category, article_data.keyword)
+    if article_data.id in collected_notes:
+        return False
+    collected_notes.add(article_data.id)
+    writer.write({**asdict(article_data), **labels.label_fields(article_data.id)})
+    return True
+
+
+def _user_dict(user) -> Dict:
+    """検索結果の著者（note_decode.User、または進捗から復元した辞書）を辞書にする"""
+    return {key: user.get(key) for key in ("id", "urlname", "nickname", "followerCount")}
+
+
+def process_search_note(note: dict, category: str, keyword: str, collected_users: set,
+                        store, writer: JsonlWriter, collected_notes: DedupIndex) -> int:
+    """検索結果の1記事から著者を処理し、保存した記事数を返す"""
+    try:
+        get_note_labels().add(note.get("id"), category, keyword)  # 検索で見つかった記事
+        user = note.get("user", {})
+        urlname = user.get("urlname", "")
+
+        if not urlname or urlname in collected_users:
+            return 0
+
+        # 検索結果・保存済みのフォロワー数で事前に除外
+        if not store.should_fetch_profile(user, CONFIG["max_followers"], CONFIG["min_followers"]):
+            return 0
+
+        # ユーザー情報取得
+        user_info = get_user_info(urlname)
+        if not user_info:
+            return 0
+        store.record(urlname, user_info)
+
+        follower_count = user_info.get("followerCount", 0)
+
+        # フィルタリング
+        if not is_target_follower_count(follower_count):
+            return 0
+
+        collected_users.add(urlname)
+
+        # ユーザーの記事を収集
+        user_notes = get_user_notes(urlname)
+        articles_saved = 0
+
+        for article in user_notes[:CONFIG["articles_per_user"]]:
+            # 記事データ作成
+            article_data = build_article(article, user, urlname, follower_count,
+                                         category, keyword)
+            if article_data is None:
+                continue
+
+            # 保存（別のキーワードで保存済みの記事はラベルだけ追加）
+            if write_article(article_data, collected_notes, writer):
+                articles_saved += 1
+
+        if articles_saved > 0:
+            print(f"  ✅ @{urlname}: {articles_saved}記事 (F:{follower_count})")
+        return articles_saved
+
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        return 0
+
 
-    total_articles = 0
+def collect_data():
+    """メイン収集処理（クリエイター単位のチェックポイントから再開）"""
+    DATA_DIR.mkdir(exist_ok=True)
+
+    # 進捗読み込み（チェックポイント以降の書き込みは取り消す）
+    progress, collected_users = load_state()
+    collected_notes = load_collected_notes()
+
+    total_articles = progress["total_articles"]
 
     print("\n" + "="*60)
     print("🚀 noteAI 世界最高水準データ収集開始")
@@ -315,100 +493,232 @@ def collect_data():
     print(f"📊 カテゴリ: {list(SEARCH_KEYWORDS.keys())}")
     print(f"📊 カテゴリ比率: {CATEGORY_RATIO}")
     print(f"📊 収集済みユーザー: {len(collected_users)}人")
+    if progress["keyword_index"] or progress["pager"]:
+        print(f"📂 再開: キーワード {progress['keyword_index'] + 1}/{len(ALL_KEYWORDS)}"
+              + (f", 検索 {progress['pager']['page']}ページ目まで取得済み" if progress["pager"] else ""))
     print("="*60 + "\n")
 
-    with open(RAW_DATA_FILE, "a", encoding="utf-8") as f:
-        for idx, (category, keyword, ratio) in enumerate(ALL_KEYWORDS):
+    store = get_creator_store()
+    with JsonlWriter(RAW_DATA_FILE) as writer:
+        def checkpoint(idx: int, pager: Optional[SearchPager], pending: List[Dict]):
+            """記事データを永続化してから、データ位置と一緒に進捗を原子的に保存"""
+            progress.update(keyword_index=idx, pager=pager.state() if pager else None,
+                            pending_notes=pending, total_articles=total_articles,
+                            collected_users=sorted(collected_users))
+            writer.checkpoint(PROGRESS_FILE, progress)
+            collected_notes.commit(RAW_DATA_FILE)  # ディスクに書いた記事のIDだけを記録
+
+        def process_notes(notes: List[Dict], idx: int, category: str, keyword: str, pager: SearchPager):
+            """1ページ分を処理。リクエストを送ったクリエイターごとにチェックポイント"""
+            nonlocal total_articles
+            # 再開に必要なのは記事IDと著者だけ（進捗の JSON に残せるよう辞書にする）
+            notes = [{"id": note.get("id"), "user": _user_dict(note.get("user", {}))} for note in notes]
+            for i, note in enumerate(notes):
+                before = http_client.STATS.requests
+                total_articles += process_search_note(note, category, keyword, collected_users,
+                                                      store, writer, collected_notes)
+                if http_client.STATS.requests != before:
+                    checkpoint(idx, pager, notes[i + 1:])
+
+        for idx in range(progress["keyword_index"], len(ALL_KEYWORDS)):
+            category, keyword, ratio = ALL_KEYWORDS[idx]
             print(f"\n[{idx+1}/{len(ALL_KEYWORDS)}] 🔍 {category}: {keyword}")
 
-            # 検索
-            notes = search_notes(keyword)
-            if not notes:
+            # 途中のキーワードは保存したページング状態と処理中ページの残りから再開
+            if progress["pager"] and progress["pager"]["keyword"] == keyword:
+                pager = SearchPager.from_state(progress["pager"])
+                process_notes(progress["pending_notes"], idx, category, keyword, pager)
+            else:
+                pager = SearchPager(keyword, max_pages=CONFIG["search_pages"])
+
+            # 検索（次ページを先読みし、空ページ・重複ページで停止）
+            found = 0
+            for notes in iter_search_pages(fetch_search_page, keyword, pager=pager):
+                found += len(notes)
+                print(f"  → {len(notes)}件発見")
+                process_notes(notes, idx, category, keyword, pager)
+
+            if not found:
                 print(f"  → 記事なし")
-                continue
 
-            print(f"  → {len(notes)}件発見")
+            # キーワード完了（データを永続化してから進捗・ユーザー一覧を原子的に置き換える）
+            checkpoint(idx + 1, None, [])
+            atomic_write_json(USERS_FILE, list(collected_users))
+            crawl_telemetry.set_frontier(idx + 1, len(ALL_KEYWORDS))
+    collected_notes.close()
 
+    print("\n" + "="*60)
+    print("✅ 収集完了！")
+    print(f"📊 総記事数: {total_articles}")
+    print(f"📊 ユーザー数: {len(collected_users)}")
+    print(f"📁 保存先: {RAW_DATA_FILE}")
+    writer.print_report()
+    search_iterator.print_report()
+    http_client.print_stats()
+    response_cache.print_report()
+    store.print_report()
+    print("="*60)
+
+
+def collect_data_pipelined():
+    """パイプライン版の収集処理（検索・プロフィール・記事取得・書き込みを並行実行）"""
+    DATA_DIR.mkdir(exist_ok=True)
+
+    progress, collected_users = load_state()
+    collected_notes = load_collected_notes()
+    written_users = set(collected_users)    # 記事まで書き込んだユーザー（チェックポイントに残す）
+
+    store = get_creator_store()
+    lock = threading.Lock()
+    in_progress = set()     # プロフィール取得中のユーザー（重複取得防止）
+    totals = {"articles": 0, "users_since_save": 0, "keywords_searched": 0}
+
+    def search_stage(item, emit):
+        category, keyword, ratio = item
+        for notes in iter_search_pages(fetch_search_page, keyword, max_pages=CONFIG["search_pages"]):
+            print(f"  🔍 {category}: {keyword} → {len(notes)}件")
+            get_note_labels().add_many([(note.get("id"), category, keyword) for note in notes])
             for note in notes:
-                try:
-                    user = note.get("user", {})
-                    urlname = user.get("urlname", "")
-
-                    if not urlname or urlname in collected_users:
-                        continue
-
-                    # ユーザー情報取得
-                    user_info = get_user_info(urlname)
-                    if not user_info:
-                        continue
-
-                    follower_count = user_info.get("followerCount", 0)
-
-                    # フィルタリング
-                    if follower_count < CONFIG["min_followers"]:
-                        continue
-                    if follower_count > CONFIG["max_followers"]:
-                        continue
-
-                    collected_users.add(urlname)
-
-                    # ユーザーの記事を収集
-                    user_notes = get_user_notes(urlname)
-                    articles_saved = 0
-
-                    for article in user_notes[:CONFIG["articles_per_user"]]:
-                        like_count = article.get("likeCount", 0)
-
-                        if like_count < CONFIG["min_likes_per_article"]:
-                            continue
-
-                        power_score = calculate_power_score(like_count, follower_count)
-
-                        if power_score < CONFIG["power_score_threshold"]:
-                            continue
-
-                        # 記事データ作成
-                        article_data = NoteArticle(
-                            id=str(article.get("id", "")),
-                            title=article.get("name", ""),
-                            user_id=str(user.get("id", "")),
-                            user_name=user.get("nickname", ""),
-                            user_urlname=urlname,
-                            like_count=like_count,
-                            follower_count=follower_count,
-                            power_score=power_score,
-                            category=category,
-                            keyword=keyword,
-                            body_preview=article.get("body", "")[:200],
-                            published_at=article.get("publishAt", ""),
-                            url=f"https://note.com/{urlname}/n/{article.get('key', '')}",
-                        )
-
-                        # 保存
-                        f.write(json.dumps(asdict(article_data), ensure_ascii=False) + "\n")
-                        articles_saved += 1
-                        total_articles += 1
-
-                    if articles_saved > 0:
-                        print(f"  ✅ @{urlname}: {articles_saved}記事 (F:{follower_count})")
-
-                    time.sleep(CONFIG["request_delay"])
-
-                except Exception as e:
-                    print(f"  ❌ Error: {e}")
-                    continue
-
-            # 進捗保存
-            with open(USERS_FILE, "w", encoding="utf-8") as uf:
-                json.dump(list(collected_users), uf, ensure_ascii=False)
+                emit((category, keyword, note.get("user", {})))
+        with lock:
+            totals["keywords_searched"] += 1
+            crawl_telemetry.set_frontier(totals["keywords_searched"], len(ALL_KEYWORDS))
+
+    def profile_stage(item, emit):
+        category, keyword, user = item
+        urlname = user.get("urlname", "")
+        with lock:
+            if not urlname or urlname in collected_users or urlname in in_progress:
+                return
+            in_progress.add(urlname)
+        try:
+            if not store.should_fetch_profile(user, CONFIG["max_followers"], CONFIG["min_followers"]):
+                return
+            user_info = get_user_info(urlname)
+            if not user_info:
+                return
+            store.record(urlname, user_info)
+            follower_count = user_info.get("followerCount", 0)
+            if not is_target_follower_count(follower_count):
+                return
+            with lock:
+                collected_users.add(urlname)
+        finally:
+            with lock:
+                in_progress.discard(urlname)
+        emit((category, keyword, user, urlname, follower_count))
+
+    def notes_stage(item, emit):
+        category, keyword, user, urlname, follower_count = item
+        articles = []
+        for article in get_user_notes(urlname)[:CONFIG["articles_per_user"]]:
+            article_data = build_article(article, user, urlname, follower_count, category, keyword)
+            if article_data is not None:
+                articles.append(article_data)
+        emit((urlname, follower_count, articles))
+
+    with JsonlWriter(RAW_DATA_FILE) as writer:
+        def writer_stage(item, emit):
+            urlname, follower_count, articles = item
+            articles = [a for a in articles if write_article(a, collected_notes, writer)]
+            totals["articles"] += len(articles)
+            if articles:
+                print(f"  ✅ @{urlname}: {len(articles)}記事 (F:{follower_count})")
+            written_users.add(urlname)
+            totals["users_since_save"] += 1
+            if totals["users_since_save"] >= 20:
+                totals["users_since_save"] = 0
+                checkpoint_users(writer, progress, written_users, collected_notes)
+
+        workers = CONFIG["pipeline_workers"]
+        pipeline = Pipeline([
+            Stage("search", search_stage, workers["search"]),
+            Stage("profile", profile_stage, workers["profile"]),
+            Stage("notes", notes_stage, workers["notes"]),
+            Stage("writer", writer_stage, 1),
+        ], queue_size=CONFIG["pipeline_queue_size"], report_interval=30)
+
+        print("\n" + "="*60)
+        print("🚀 noteAI 世界最高水準データ収集開始（パイプライン版）")
+        print(f"📊 キーワード: {len(ALL_KEYWORDS)}個, ワーカー: {workers}")
+        print("="*60 + "\n")
+        pipeline.run(ALL_KEYWORDS)
+        checkpoint_users(writer, progress, written_users, collected_notes)
+    collected_notes.close()
 
     print("\n" + "="*60)
     print("✅ 収集完了！")
-    print(f"📊 総記事数: {total_articles}")
+    print(f"📊 総記事数: {totals['articles']}")
     print(f"📊 ユーザー数: {len(collected_users)}")
     print(f"📁 保存先: {RAW_DATA_FILE}")
+    pipeline.print_metrics()
+    writer.print_report()
+    search_iterator.print_report()
+    http_client.print_stats()
+    response_cache.print_report()
+    store.print_report()
     print("="*60)
 
 
+
+def collect_data_scheduled(budget: Optional[int] = None, policy: Optional[str] = None) -> KeywordScheduler:
+    """スケジューラ版の収集処理（収穫の多いキーワードに検索ページを配分）"""
+    DATA_DIR.mkdir(exist_ok=True)
+    progress, collected_users = load_state()
+    collected_notes = load_collected_notes()
+    budget = budget if budget is not None else CONFIG["request_budget"]
+
+    scheduler = KeywordScheduler([(category, keyword) for category, keyword, _ in ALL_KEYWORDS],
+                                 CATEGORY_RATIO, budget=budget, policy=policy,
+                                 max_pages=CONFIG["search_pages"])
+
+    print("\n" + "="*60)
+    print(f"🚀 noteAI 世界最高水準データ収集開始（スケジューラ版: {scheduler.policy}）")
+    print(f"📊 キーワード: {len(ALL_KEYWORDS)}個, 予算: {budget or '無制限'}リクエスト")
+    print("="*60 + "\n")
+
+    store = get_creator_store()
+    with JsonlWriter(RAW_DATA_FILE) as writer:
+        while (arm := scheduler.next_arm()) is not None:
+            before = http_client.get_stats()["requests"]
+            notes = arm.accept(fetch_search_page(arm.keyword, arm.next_start()))
+            print(f"🔍 {arm.category}: {arm.keyword} (p{arm.pager.page}) → {len(notes)}件")
+
+            accepted = 0
+            for note in notes:
+                accepted += process_search_note(note, arm.category, arm.keyword, collected_users,
+                                                store, writer, collected_notes)
+            scheduler.update(arm, accepted, http_client.get_stats()["requests"] - before)
+            if budget:
+                crawl_telemetry.set_frontier(min(scheduler.requests, budget), budget)
+
+            # 進捗保存（データ位置・収集済みユーザーは通常版と同じ進捗ファイルに）
+            checkpoint_users(writer, progress, collected_users, collected_notes)
+    collected_notes.close()
+
+    print("\n" + "="*60)
+    print("✅ 収集完了！")
+    print(f"📊 ユーザー数: {len(collected_users)}")
+    print(f"📁 保存先: {RAW_DATA_FILE}")
+    scheduler.print_report()
+    writer.print_report()
+    http_client.print_stats()
+    response_cache.print_report()
+    store.print_report()
+    print("="*60)
+    return scheduler
+
 if __name__ == "__main__":
-    collect_data()
+    if "--telemetry" in sys.argv:
+        port = int(sys.argv[sys.argv.index("--metrics-port") + 1]) if "--metrics-port" in sys.argv else None
+        crawl_telemetry.start_telemetry(limiters=[LIMITER], prometheus_port=port)
+    try:
+        if "--pipeline" in sys.argv:
+            collect_data_pipelined()
+        elif "--scheduled" in sys.argv:
+            budget = int(sys.argv[sys.argv.index("--budget") + 1]) if "--budget" in sys.argv else None
+            collect_data_scheduled(budget)
+        else:
+            collect_data()
+    finally:
+        crawl_telemetry.stop_telemetry()
@@ -21,7 +21,8 @@ from pathlib import Path
 from typing import Optional
 
 import pandas as pd
-import requests
+
+import http_client
 
 # ==========================================
 # 設定
@@ -195,7 +196,7 @@ def get_user_info(user_id: str) -> Optional[dict]:
     """ユーザー情報を取得"""
     url = f"https://note.com/api/v2/creators/{user_id}"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = http_client.get(url, headers=HEADERS, timeout=10)
         if r.status_code == 200:
             return r.json()["data"]
     except Exception:
@@ -213,7 +214,7 @@ def get_user_notes(user_id: str, max_pages: int = 20) -> list:
             f"https://note.com/api/v2/creators/{user_id}/contents?kind=note&page={page}"
         )
         try:
-            r = requests.get(url, headers=HEADERS, timeout=10)
+            r = http_client.get(url, headers=HEADERS, timeout=10)
             if r.status_code != 200:
                 break
 
@@ -241,7 +242,7 @@ def search_notes(keyword: str, size: int = 100) -> list:
     """キーワードで記事を検索"""
     url = f"https://note.com/api/v3/searches?q={keyword}&size={size}"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = http_client.get(url, headers=HEADERS, timeout=10)
         if r.status_code == 200:
             data = r.json()["data"]
             notes_data = data.get("notes", {})
@@ -477,6 +478,7 @@ def collect_data(resume: bool = True) -> pd.DataFrame:
             )
 
         print(f"\n✓ '{OUTPUT_FILE}' に保存しました。")
+        http_client.print_stats()
         print(
             f"✓ 進捗ファイル '{PROGRESS_FILE}' を削除して次回は最初から実行できます。"
         )
@@ -9,18 +9,35 @@ noteAI データ収集スクリプト v3.0
 - Evol-Instruct対応データ形式
 - レジューム機能強化
 - レート制限対応
+- 差分収集（--incremental: 前回の最新記事まででページングを停止）
+- フォロワー数・スキ数の定期更新（--refresh-stats）
+- 収穫の多いキーワードに検索を配分（--scheduled [--budget N]）
+- エンドポイント別レイテンシ・待機時間・ETAの記録（--telemetry [--metrics-port N]）
 """
 
 import csv
 import json
 import os
+import sys
 import time
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-
-import requests
+from typing import Callable, Dict, List, Optional, Tuple
+
+import crawl_telemetry
+import http_client
+import response_cache
+from creator_store import get_creator_store, newest_note
+from dedup_index import DedupIndex
+from engagement_store import get_engagement_store
+from jsonl_writer import JsonlWriter, count_records_after
+from note_decode import Creator, Note, SearchPage, decode_contents, decode_creator, decode_search_page
+from note_merge import get_note_labels
+import search_iterator
+from search_iterator import iter_search_pages
+from keyword_scheduler import KeywordScheduler
+from rate_limiter import limiter_from_config, parse_retry_after
 
 # ============================================================
 # 設定
@@ -84,16 +101,25 @@ CONFIG = {
     "max_followers": 2000,      # フォロワー上限（1000→2000）
     "min_likes_per_article": 30,  # 記事あたり最低いいね数
     "power_score_threshold": 0.8,  # Power Score閾値
-    "request_delay": 1.5,       # リクエスト間隔（秒）
+    "request_delay": 1.5,       # リクエスト間隔（秒）: 適応型レート制限の初期値
+    "min_request_delay": 1.0,   # 成功が続いたときの最短間隔
+    "max_request_delay": 20.0,  # 429/403 が続いたときの最長間隔
     "max_retries": 3,           # リトライ回数
     "articles_per_user": 50,    # ユーザーあたり最大記事数
+    "stats_refresh_days": 7,    # フォロワー数・スキ数の更新間隔（日）
+    "stats_refresh_pages": 1,   # スキ数更新で取得する記事一覧ページ数
+    "concurrency": 4,           # 非同期版の同時リクエスト数（crawl_engine.py）
+    "requests_per_second": 1 / 1.5,  # 非同期版の全体レート上限（従来の間隔と同等）
 }
 
 # ファイルパス
 DATA_DIR = Path("data")
 PROGRESS_FILE = DATA_DIR / "collection_progress_v3.json"
 RAW_DATA_FILE = DATA_DIR / "raw_notes_v3.jsonl"
-USERS_FILE = DATA_DIR / "collected_users_v3.json"
+USERS_FILE = DATA_DIR / "collected_users_v3.json"  # 旧形式（初回のみインデックスへ取り込み）
+DEDUP_FILE = DATA_DIR / "dedup_index_v3.sqlite"   # 収集済み記事ID・ユーザー
+USERS_INDEX_FILE = DEDUP_FILE  # 収集済みユーザー（work_queue のワーカーも記事IDと違ってこれを共有する）
+STATS_FILE = DATA_DIR / "note_stats_v3.jsonl"  # フォロワー数・スキ数のスナップショット
 
 # HTTPヘッダー（403対策）
 HEADERS = {
@@ -155,68 +181,98 @@ class NoteData:
 # API関数
 # ============================================================
 
-def safe_request(url: str, retries: int = CONFIG["max_retries"]) -> Optional[Dict]:
-    """安全なAPIリクエスト（リトライ付き）"""
+# 全リクエスト共通の適応型レート制限（固定sleepの代わり）
+LIMITER = limiter_from_config(CONFIG)
+
+def safe_request(url: str, retries: int = CONFIG["max_retries"], revalidate: bool = False,
+                 decode: Optional[Callable] = None):
+    """安全なAPIリクエスト（リトライ付き。revalidate ならキャッシュが期限内でもサーバーに確認）
+
+    decode（note_decode の decode_*）を渡すと、応答全体を辞書にせず必要なフィールドだけを取り出す。
+    """
     for attempt in range(retries):
         try:
-            response = requests.get(url, headers=HEADERS, timeout=30)
+            # トークンの取得（待機）はネットワークに出るときだけ。キャッシュのヒットはレート制御に数えない
+            response = http_client.get(url, headers=HEADERS, timeout=30, limiter=LIMITER,
+                                       revalidate=revalidate)
             if response.status_code == 200:
-                return response.json()
+                if not http_client.is_cache_hit(response):
+                    LIMITER.on_success()
+                return decode(response.content) if decode else response.json()
             elif response.status_code == 429:
-                # レート制限
-                wait_time = 60 * (attempt + 1)
-                print(f"  ⚠️ レート制限。{wait_time}秒待機...")
-                time.sleep(wait_time)
+                # レート制限（Retry-After を尊重し、レートを下げる）
+                wait_time = LIMITER.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+                print(f"  ⚠️ レート制限。{wait_time:.0f}秒待機...")
             elif response.status_code == 404:
                 return None
             elif response.status_code == 403:
-                # 403の場合は少し待って再試行
-                wait_time = 10 * (attempt + 1)
-                print(f"  ⚠️ HTTP 403。{wait_time}秒待機後リトライ...")
-                time.sleep(wait_time)
+                # 403もレート超過の兆候として扱う
+                wait_time = LIMITER.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+                print(f"  ⚠️ HTTP 403。{wait_time:.0f}秒待機後リトライ...")
             else:
                 print(f"  ⚠️ HTTP {response.status_code}")
-                time.sleep(5)
+                LIMITER.on_error()
         except Exception as e:
             print(f"  ⚠️ リクエストエラー: {e}")
-            time.sleep(5)
+            LIMITER.on_error()
     return None
 
-def get_user_info(user_id: str) -> Optional[Dict]:
+def get_user_info(user_id: str, revalidate: bool = False) -> Optional[Creator]:
     """ユーザー情報を取得"""
     url = f"{BASE_URL}/v2/creators/{user_id}"
-    data = safe_request(url)
-    if data and "data" in data:
-        return data["data"]
-    return None
+    return safe_request(url, revalidate=revalidate, decode=decode_creator)
 
-def get_user_notes(user_id: str, page: int = 1) -> List[Dict]:
+def get_user_notes(user_id: str, page: int = 1, revalidate: bool = False) -> List[Note]:
     """ユーザーの記事一覧を取得"""
     url = f"{BASE_URL}/v2/creators/{user_id}/contents?kind=note&page={page}"
-    data = safe_request(url)
-    if data and "data" in data and "contents" in data["data"]:
-        return data["data"]["contents"]
-    return []
+    return safe_request(url, revalidate=revalidate, decode=decode_contents) or []
+
+def fetch_search_page(keyword: str, start: int, size: int = 20) -> Optional[SearchPage]:
+    """検索結果の1ページ（contents, isLastPage）を取得"""
+    url = f"{BASE_URL}/v3/searches?q={keyword}&size={size}&start={start}"
+    return safe_request(url, decode=decode_search_page)
 
 def search_notes(keyword: str, page: int = 1) -> List[Dict]:
-    """キーワードで記事を検索"""
-    # v3 API: size=20, note_cursor でページング
-    url = f"{BASE_URL}/v3/searches?q={keyword}&size=20"
-    data = safe_request(url)
-    if data and "data" in data:
-        notes_data = data["data"].get("notes", {})
-        if isinstance(notes_data, dict) and "contents" in notes_data:
-            return notes_data["contents"]
-    return []
+    """キーワードで記事を検索（page は1始まり）"""
+    notes_data = fetch_search_page(keyword, (page - 1) * 20)
+    return notes_data["contents"] if notes_data else []
 
 # ============================================================
 # 収集ロジック
 # ============================================================
 
+def build_note_data(note: Dict, urlname: str, nickname: str, follower_count: int,
+                    category: str, keyword: str) -> Optional[NoteData]:
+    """記事APIの応答からNoteDataを作成（いいね数フィルタ込み）"""
+    like_count = note.get("likeCount", 0)
+
+    # いいね数フィルタ
+    if like_count < CONFIG["min_likes_per_article"]:
+        return None
+
+    note_data = NoteData(
+        note_id=str(note.get("id", "")),
+        title=note.get("name", ""),
+        body_preview=note.get("body", "")[:500] if note.get("body") else "",
+        user_id=urlname,
+        user_name=urlname,
+        user_nickname=nickname,
+        follower_count=follower_count,
+        like_count=like_count,
+        comment_count=note.get("commentCount", 0),
+        created_at=note.get("publishAt", ""),
+        category=category,
+        keyword=keyword,
+    )
+    note_data.calculate_scores()
+    return note_data
+
 class DataCollector:
-    def __init__(self):
-        self.collected_users: set = set()
-        self.collected_notes: set = set()
+    def __init__(self, incremental: bool = False):
+        self.incremental = incremental  # 収集済みユーザーも新着記事だけ再取得
+        self.collected_users: Optional[DedupIndex] = None
+        self.collected_notes: Optional[DedupIndex] = None
+        self.writer: Optional[JsonlWriter] = None
         self.progress: Dict = {
             "completed_keywords": [],
             "current_keyword_index": 0,
@@ -236,46 +292,60 @@ class DataCollector:
                 self.progress = json.load(f)
             print(f"📂 進捗をロード: {self.progress['total_notes']}記事, {self.progress['total_users']}ユーザー")
 
-        if USERS_FILE.exists():
-            with open(USERS_FILE, "r", encoding="utf-8") as f:
-                self.collected_users = set(json.load(f))
-
-        if RAW_DATA_FILE.exists():
-            with open(RAW_DATA_FILE, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        note = json.loads(line)
-                        self.collected_notes.add(note.get("note_id", ""))
-                    except:
-                        pass
+        # 書きかけの最終行を切り詰めてから追記用に開く
+        self.writer = JsonlWriter(RAW_DATA_FILE)
+        if "data_offset" in self.progress:
+            unsaved = count_records_after(RAW_DATA_FILE, self.progress["data_offset"])
+            if unsaved:
+                print(f"🩹 前回のチェックポイント以降の {unsaved}記事を検出（進捗に反映）")
+                self.progress["total_notes"] += unsaved
+                # 数えた行の後ろまで data_offset を進めて保存（次に落ちても二重に数えない）
+                self.writer.checkpoint(PROGRESS_FILE, self.progress)
+
+        # 収集済み記事ID・ユーザーはインデックスを開くだけ（前回以降の追記分だけ読み直す）
+        self.collected_users = DedupIndex(USERS_INDEX_FILE, "users")
+        self.collected_users.import_json_list(USERS_FILE)
+        self.collected_notes = DedupIndex(DEDUP_FILE, "notes")
+        self.collected_notes.catch_up(RAW_DATA_FILE, "note_id")
 
     def save_progress(self):
         """進捗を保存"""
         self.progress["last_updated"] = datetime.now().isoformat()
         self.progress["total_users"] = len(self.collected_users)
 
-        with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.progress, f, ensure_ascii=False, indent=2)
+        # データを fsync してから、データ位置込みの進捗を原子的に置き換える
+        self.writer.checkpoint(PROGRESS_FILE, self.progress)
 
-        with open(USERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(list(self.collected_users), f, ensure_ascii=False)
+        self.collected_users.commit()
+        self.collected_notes.commit(RAW_DATA_FILE)
 
     def save_note(self, note_data: NoteData):
-        """記事データを保存"""
-        with open(RAW_DATA_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(asdict(note_data), ensure_ascii=False) + "\n")
+        """記事データを保存（見つかったキーワード・カテゴリの集合を付ける）"""
+        labels = get_note_labels()
+        labels.add(note_data.note_id, note_data.category, note_data.keyword)
+        self.writer.write({**asdict(note_data), **labels.label_fields(note_data.note_id)})
         self.progress["total_notes"] += 1
         self.collected_notes.add(note_data.note_id)
 
     def process_user(self, urlname: str, category: str, keyword: str) -> int:
         """ユーザーの記事を処理（urlnameを使用）"""
-        if urlname in self.collected_users:
+        known = urlname in self.collected_users
+        if known and not self.incremental:
             return 0
 
-        # ユーザー情報取得
-        user_info = get_user_info(urlname)
-        if not user_info:
-            return 0
+        store = get_creator_store()
+        state = store.get_state(urlname) if known else None
+
+        # ユーザー情報取得（差分収集では更新間隔内の保存済みプロフィールを再利用）
+        user_info = None
+        if known:
+            user_info = store.fresh_profile(urlname, CONFIG["stats_refresh_days"] * 86400)
+        profile_fetched = user_info is None
+        if profile_fetched:
+            user_info = get_user_info(urlname, revalidate=known)
+            if not user_info:
+                return 0
+            store.record(urlname, user_info)
 
         follower_count = user_info.get("followerCount", 0)
 
@@ -287,47 +357,35 @@ class DataCollector:
 
         print(f"  👤 {nickname} (@{urlname}) - {follower_count}フォロワー")
 
-        # 記事を収集
+        # 記事を収集（新しい順。前回の最新記事に到達したら停止）
         notes_collected = 0
         page = 1
+        newest = None
+        reached_known = False
 
-        while notes_collected < CONFIG["articles_per_user"]:
-            time.sleep(CONFIG["request_delay"])
-            notes = get_user_notes(urlname, page)
+        while notes_collected < CONFIG["articles_per_user"] and not reached_known:
+            # 収集済みユーザーは前回以降の新着が目的なので、キャッシュ（1日）の記事一覧は使わない
+            notes = get_user_notes(urlname, page, revalidate=known)
 
             if not notes:
                 break
+            newest = newest_note([newest, *notes])
 
             for note in notes:
+                if state and state.reached(note):
+                    reached_known = True
+                    break
+
                 note_id = str(note.get("id", ""))
                 if note_id in self.collected_notes:
+                    get_note_labels().add(note_id, category, keyword)  # 別の経路で見つかった記事
                     continue
 
-                like_count = note.get("likeCount", 0)
-
-                # いいね数フィルタ
-                if like_count < CONFIG["min_likes_per_article"]:
-                    continue
-
-                # NoteDataを作成
-                note_data = NoteData(
-                    note_id=note_id,
-                    title=note.get("name", ""),
-                    body_preview=note.get("body", "")[:500] if note.get("body") else "",
-                    user_id=urlname,
-                    user_name=urlname,
-                    user_nickname=nickname,
-                    follower_count=follower_count,
-                    like_count=like_count,
-                    comment_count=note.get("commentCount", 0),
-                    created_at=note.get("publishAt", ""),
-                    category=category,
-                    keyword=keyword,
-                )
-                note_data.calculate_scores()
+                note_data = build_note_data(note, urlname, nickname, follower_count,
+                                            category, keyword)
 
                 # Power Score フィルタ
-                if note_data.power_score >= CONFIG["power_score_threshold"]:
+                if note_data and note_data.power_score >= CONFIG["power_score_threshold"]:
                     self.save_note(note_data)
                     notes_collected += 1
                     print(f"    ✅ {note_data.title[:30]}... (PS={note_data.power_score:.2f})")
@@ -337,6 +395,7 @@ class DataCollector:
                 break
 
         self.collected_users.add(urlname)
+        store.update_state(urlname, newest, category, keyword, stats_refreshed=profile_fetched)
         return notes_collected
 
     def collect_from_keyword(self, category: str, keyword: str):
@@ -345,13 +404,9 @@ class DataCollector:
 
         users_found = {}  # urlname -> user_data
 
-        for page in range(5):  # 最大5ページ
-            time.sleep(CONFIG["request_delay"])
-            notes = search_notes(keyword, page)
-
-            if not notes:
-                break
-
+        # 最大5ページ（次ページを先読みし、空ページ・重複ページで停止）
+        for notes in iter_search_pages(fetch_search_page, keyword, max_pages=5):
+            get_note_labels().add_many([(note.get("id"), category, keyword) for note in notes])
             for note in notes:
                 user_data = note.get("user", {})
                 urlname = user_data.get("urlname", "")
@@ -361,12 +416,17 @@ class DataCollector:
         print(f"  📊 {len(users_found)}人のユーザーを発見")
 
         # 各ユーザーを処理（urlnameを使用）
-        for urlname in users_found:
+        store = get_creator_store()
+        for urlname, user_data in users_found.items():
             if len(self.collected_users) >= CONFIG["max_users"]:
                 print(f"\n🎯 目標ユーザー数 ({CONFIG['max_users']}) に到達!")
                 return
 
-            time.sleep(CONFIG["request_delay"])
+            # 検索結果・保存済みのフォロワー数で、プロフィール取得前に除外
+            if urlname in self.collected_users or \
+                    not store.should_fetch_profile(user_data, CONFIG["max_followers"]):
+                continue
+
             self.process_user(urlname, category, keyword)
 
         self.progress["completed_keywords"].append(f"{category}:{keyword}")
@@ -390,6 +450,7 @@ class DataCollector:
 
             self.progress["current_keyword_index"] = i
             self.collect_from_keyword(category, keyword)
+            crawl_telemetry.set_frontier(i + 1, len(ALL_KEYWORDS))
 
             # 定期保存
             if i % 5 == 0:
@@ -405,12 +466,142 @@ class DataCollector:
         print("\n" + "=" * 60)
         print("✅ 収集完了!")
         print(f"📊 合計: {self.progress['total_notes']}記事, {len(self.collected_users)}ユーザー")
+        self.writer.print_report()
+        search_iterator.print_report()
+        http_client.print_stats()
+        response_cache.print_report()
+        get_creator_store().print_report()
+        print("=" * 60)
+
+    def run_scheduled(self, budget: Optional[int] = None, policy: Optional[str] = None) -> KeywordScheduler:
+        """キーワードスケジューラで検索ページを配分して収集"""
+        scheduler = KeywordScheduler(ALL_KEYWORDS, budget=budget, policy=policy)
+        store = get_creator_store()
+
+        print("=" * 60)
+        print(f"🚀 noteAI データ収集 v3.0 開始（スケジューラ版: {scheduler.policy}）")
+        print(f"📊 目標: {CONFIG['max_users']}ユーザー, 予算: {budget or '無制限'}リクエスト")
+        print("=" * 60)
+
+        while len(self.collected_users) < CONFIG["max_users"]:
+            arm = scheduler.next_arm()
+            if arm is None:
+                break
+            before = http_client.get_stats()["requests"]
+            notes = arm.accept(fetch_search_page(arm.keyword, arm.next_start()))
+            print(f"\n🔍 [{arm.category}] '{arm.keyword}' (p{arm.pager.page}) → {len(notes)}件")
+
+            accepted = 0
+            for note in notes:
+                user_data = note.get("user", {})
+                urlname = user_data.get("urlname", "")
+                if not urlname or urlname in self.collected_users or \
+                        not store.should_fetch_profile(user_data, CONFIG["max_followers"]):
+                    continue
+                accepted += self.process_user(urlname, arm.category, arm.keyword)
+            scheduler.update(arm, accepted, http_client.get_stats()["requests"] - before)
+            if budget:
+                crawl_telemetry.set_frontier(min(scheduler.requests, budget), budget)
+            self.save_progress()
+
+        print("\n" + "=" * 60)
+        print("✅ 収集完了!")
+        print(f"📊 合計: {self.progress['total_notes']}記事, {len(self.collected_users)}ユーザー")
+        scheduler.print_report()
+        self.writer.print_report()
+        http_client.print_stats()
+        print("=" * 60)
+        return scheduler
+
+    def run_incremental(self):
+        """収集済みユーザーの新着記事だけを取得（検索なし）"""
+        store = get_creator_store()
+        users = sorted(self.collected_users)
+
+        print("=" * 60)
+        print("🔄 noteAI 差分収集 開始")
+        print(f"📊 対象: {len(users)}ユーザー（前回の最新記事まで取得）")
+        print("=" * 60)
+
+        start = time.perf_counter()
+        new_notes = 0
+        for i, urlname in enumerate(users):
+            state = store.get_state(urlname)
+            category, keyword = (state.category, state.keyword) if state else ("", "")
+            new_notes += self.process_user(urlname, category, keyword)
+            crawl_telemetry.set_frontier(i + 1, len(users))
+            if i % 20 == 0:
+                self.save_progress()
+
+        self.save_progress()
+
+        print("\n" + "=" * 60)
+        print(f"✅ 差分収集完了! 新着 {new_notes}記事 ({time.perf_counter() - start:.1f}秒)")
+        self.writer.print_report()
+        http_client.print_stats()
+        response_cache.print_report()
         print("=" * 60)
 
+    def refresh_stats(self):
+        """フォロワー数・スキ数だけを更新（stats_refresh_days ごと、直近ページのみ）"""
+        store = get_creator_store()
+        due = store.stats_due(self.collected_users, CONFIG["stats_refresh_days"] * 86400)
+
+        print("=" * 60)
+        print(f"📈 フォロワー数・スキ数の更新: {len(due)}/{len(self.collected_users)}ユーザー")
+        print("=" * 60)
+
+        snapshots = 0
+        with JsonlWriter(STATS_FILE) as stats_writer:
+            for i, urlname in enumerate(due):
+                crawl_telemetry.set_frontier(i, len(due))
+                # 記録する値は fetched_at 時点のものなので、キャッシュの古い応答は使わない
+                user_info = get_user_info(urlname, revalidate=True)
+                if not user_info:
+                    continue
+                store.record(urlname, user_info)
+                follower_count = user_info.get("followerCount", 0)
+                fetched_at = datetime.now().isoformat()
+
+                for page in range(1, CONFIG["stats_refresh_pages"] + 1):
+                    for note in get_user_notes(urlname, page, revalidate=True):
+                        stats_writer.write({
+                            "note_id": str(note.get("id", "")),
+                            "user_id": urlname,
+                            "follower_count": follower_count,
+                            "like_count": note.get("likeCount", 0),
+                            "comment_count": note.get("commentCount", 0),
+                            "fetched_at": fetched_at,
+                        })
+                        snapshots += 1
+                # スナップショットを永続化してから更新済みにする
+                stats_writer.sync()
+                store.mark_stats_refreshed(urlname)
+
+        print(f"✅ 更新完了: {snapshots}件のスナップショット → {STATS_FILE}")
+        engagement = get_engagement_store()
+        engagement.ingest_jsonl(STATS_FILE)
+        engagement.print_report()
+        http_client.print_stats()
+
 # ============================================================
 # メイン
 # ============================================================
 
 if __name__ == "__main__":
-    collector = DataCollector()
-    collector.run()
+    if "--telemetry" in sys.argv:
+        port = int(sys.argv[sys.argv.index("--metrics-port") + 1]) if "--metrics-port" in sys.argv else None
+        crawl_telemetry.start_telemetry(limiters=[LIMITER], prometheus_port=port)
+    try:
+        if "--refresh-stats" in sys.argv:
+            DataCollector().refresh_stats()
+        elif "--incremental" in sys.argv:
+            DataCollector(incremental=True).run_incremental()
+        elif "--scheduled" in sys.argv:
+            budget = int(sys.argv[sys.argv.index("--budget") + 1]) if "--budget" in sys.argv else None
+            DataCollector().run_scheduled(budget)
+        else:
+            collector = DataCollector()
+            collector.run()
+    finally:
+        crawl_telemetry.stop_telemetry()
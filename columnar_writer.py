@@ -0,0 +1,215 @@
+"""
+noteAI 列指向ストリーミング書き出し
+
+収集した行を全部メモリに溜めて最後に DataFrame → CSV にする代わりに、クリエイター1人分ごとに
+行グループとしてファイルへ書き出す。集計（件数・ユーザー数・有料記事数・スコア上位）も逐次計算するので、
+収集が長くなってもメモリは増えず、途中で落ちても書き出し済みの行は残る。
+
+形式:
+- csv: CSV（utf-8-sig。既定。prepare_training_data などの後段がそのまま読める）
+- arrow: Arrow IPC ストリーム（pyarrow。行グループごとに書き出し、途中で落ちても読める）
+- parquet: Parquet（pyarrow。フッターは close 時に書くため、完了したファイルだけ読める）
+- auto: pyarrow があれば arrow、無ければ csv
+arrow / parquet / auto は COLUMNAR_CONFIG["format"] か fmt 引数で指定したときだけ使う（後段は read_table で読む）
+
+使用方法:
+    with ColumnarWriter("note_data.csv", NOTE_SCHEMA) as writer:
+        for row in rows:
+            writer.write(row)
+        writer.flush()          # クリエイター1人分が終わるたびに
+    writer.summary.print_report()
+
+    df = read_table("note_data.arrow")   # 形式は拡張子で判定（書きかけの arrow も読める）
+"""
+
+import csv
+import heapq
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow は任意依存（無ければ CSV）
+    pa = None
+
+# ============================================================
+# 設定
+# ============================================================
+
+COLUMNAR_CONFIG = {
+    "format": "csv",         # csv / arrow / parquet / auto（arrow 系は後段も read_table で読む場合だけ）
+    "top_k": 10,             # 集計で保持するスコア上位の件数
+}
+
+SUFFIXES = {"arrow": ".arrow", "parquet": ".parquet", "csv": ".csv"}
+
+# 収集スクリプトの1行（記事）の列と型
+NOTE_SCHEMA = {
+    "user_id": str,
+    "nickname": str,
+    "followers": int,
+    "title": str,
+    "likes": int,
+    "power_score": float,
+    "is_paid": bool,
+    "published_at": str,
+    "url": str,
+}
+
+# ============================================================
+# 逐次集計
+# ============================================================
+
+class RunningSummary:
+    """書き出した行の集計（行を保持せず、スコア上位 top_k 件とユーザーIDだけ持つ）"""
+
+    def __init__(self, top_k: int = None, score_column: str = "power_score"):
+        self.top_k = top_k or COLUMNAR_CONFIG["top_k"]
+        self.score_column = score_column
+        self.rows = 0
+        self.paid = 0
+        self.score_total = 0.0
+        self.users = set()
+        self._top: List = []  # (スコア, -連番, 行) の最小ヒープ（同点は先に書いた行を優先）
+
+    def add(self, row: Dict):
+        self.rows += 1
+        self.paid += bool(row.get("is_paid"))
+        self.users.add(row.get("user_id"))
+        score = row.get(self.score_column) or 0
+        self.score_total += score
+        item = (score, -self.rows, row)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, item)
+        elif item[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, item)
+
+    def top(self) -> List[Dict]:
+        """スコア上位（降順）"""
+        return [row for _, _, row in sorted(self._top, key=lambda item: item[:2], reverse=True)]
+
+    def print_report(self):
+        print(f"総記事数: {self.rows}件")
+        print(f"ユーザー数: {len(self.users)}人")
+        print(f"有料記事数: {self.paid}件")
+        if self.rows:
+            print(f"平均Power Score: {self.score_total / self.rows:.4f}")
+
+# ============================================================
+# 書き出し
+# ============================================================
+
+def resolve_format(fmt: str = None) -> str:
+    fmt = fmt or COLUMNAR_CONFIG["format"]
+    if fmt == "auto":
+        return "arrow" if pa is not None else "csv"
+    if fmt in ("arrow", "parquet") and pa is None:
+        raise ImportError(f"{fmt} 形式には pyarrow が必要です（pip install pyarrow）。csv を指定してください")
+    return fmt
+
+
+def output_path(path: Union[str, Path], fmt: str = None) -> Path:
+    """形式に合わせて拡張子を付け替えたパス"""
+    return Path(path).with_suffix(SUFFIXES[resolve_format(fmt)])
+
+
+def _coerce(value, kind: type):
+    if value is None:
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ColumnarWriter:
+    """行をバッファし、flush() のたびに行グループとして書き出す"""
+
+    def __init__(self, path: Union[str, Path], schema: Dict[str, type] = None, fmt: str = None,
+                 summary: Optional[RunningSummary] = None):
+        self.format = resolve_format(fmt)
+        self.path = output_path(path, self.format)
+        self.schema = schema or NOTE_SCHEMA
+        self.summary = summary if summary is not None else RunningSummary()
+        self.columns = list(self.schema)
+        self.row_groups = 0
+        self._buffer: List[Dict] = []
+        self._writer = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, row: Dict):
+        row = {name: _coerce(row.get(name), kind) for name, kind in self.schema.items()}
+        self._buffer.append(row)
+        self.summary.add(row)
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.format == "csv":
+            self._file = open(self.path, "w", encoding="utf-8-sig", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+            self._writer.writeheader()
+            return
+        types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+        self._arrow_schema = pa.schema([(name, types[kind]) for name, kind in self.schema.items()])
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(self.path, self._arrow_schema)
+        else:
+            self._file = pa.OSFile(str(self.path), "wb")
+            self._writer = pa.ipc.new_stream(self._file, self._arrow_schema)
+
+    def flush(self):
+        """バッファの行を1つの行グループとして書き出し、ディスクに反映"""
+        if self._writer is None:
+            self._open()
+        if not self._buffer:
+            return
+        if self.format == "csv":
+            self._writer.writerows(self._buffer)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        else:
+            batch = pa.RecordBatch.from_pydict(
+                {name: [row[name] for row in self._buffer] for name in self.columns}, schema=self._arrow_schema)
+            self._writer.write_batch(batch)
+            if self._file is not None:
+                self._file.flush()
+        self._buffer = []
+        self.row_groups += 1
+
+    def close(self):
+        if self._writer is None and not self._buffer:
+            return
+        self.flush()
+        if self.format != "csv":
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        self._writer = self._file = None
+
+
+def read_table(path: Union[str, Path]):
+    """書き出したファイルを pandas.DataFrame で読む（書きかけの arrow は読めた行グループまで）"""
+    import pandas as pd
+
+    path = Path(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path, encoding="utf-8-sig")
+    if path.suffix == ".parquet":
+        return pq.read_table(path).to_pandas()
+    batches = []
+    with pa.OSFile(str(path), "rb") as f:
+        reader = pa.ipc.open_stream(f)
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except pa.ArrowInvalid:
+            pass  # 途中で落ちたときの書きかけの行グループ
+    return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
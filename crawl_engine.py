@@ -0,0 +1,398 @@
+"""
+noteAI 非同期クロールエンジン
+
+collect_power_data_v3.DataCollector と同じ NoteData / raw_notes_v3.jsonl を出力しつつ、
+複数リクエストを同時に発行してネットワーク待ち時間を重ねる。
+
+改善点:
+- asyncio による同時実行（N件を常に処理中に保つ）
+- グローバルな適応型レート制限でリクエスト総数を制限（429/403で自動減速）
+- トランスポート差し替え可能（requests / aiohttp / テスト用）
+- 応答は必要なフィールドだけを型付きでデコード（note_decode、本文は500文字まで）
+
+使用方法:
+    python crawl_engine.py --concurrency 8 --rate 2.0   # 本番収集
+    python crawl_engine.py bench --keywords 3            # スタブサーバーで同期版と比較
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import collect_power_data_v3 as v3
+import http_client
+import response_cache
+from collect_power_data_v3 import CONFIG, HEADERS, DataCollector, build_note_data
+from creator_store import get_creator_store, reset_creator_store
+from note_merge import get_note_labels, reset_note_labels
+from note_decode import Creator, Note, SearchPage, decode_contents, decode_creator, decode_search_page
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+import search_iterator
+from search_iterator import SearchPager
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp は任意依存
+    aiohttp = None
+
+# ============================================================
+# トランスポート
+# ============================================================
+
+@dataclass
+class TransportResponse:
+    """トランスポート共通のレスポンス"""
+    status: int
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class RequestsTransport:
+    """共有セッション（http_client）を別スレッドで実行するトランスポート（標準）"""
+
+    def __init__(self, pool_size: int = 16):
+        if pool_size > http_client.CLIENT_CONFIG["pool_size"]:
+            http_client.configure(pool_size=pool_size)
+
+    def _get(self, url: str, params: Optional[Dict], timeout: float) -> TransportResponse:
+        response = http_client.get(url, params=params, headers=HEADERS, timeout=timeout)
+        return TransportResponse(response.status_code, response.content, dict(response.headers))
+
+    def _cached(self, url: str, params: Optional[Dict]) -> Optional[TransportResponse]:
+        response = http_client.get_cached(url, params)
+        if response is None:
+            return None
+        return TransportResponse(response.status_code, response.content, dict(response.headers))
+
+    async def get(self, url: str, params: Optional[Dict] = None, timeout: float = 30) -> TransportResponse:
+        return await asyncio.to_thread(self._get, url, params, timeout)
+
+    async def cached(self, url: str, params: Optional[Dict] = None) -> Optional[TransportResponse]:
+        """レスポンスキャッシュだけで返せる応答（無ければNone。レート制限のトークンを使わない）"""
+        return await asyncio.to_thread(self._cached, url, params)
+
+    async def close(self):
+        pass
+
+
+class AiohttpTransport:
+    """aiohttp によるネイティブ非同期トランスポート"""
+
+    def __init__(self, pool_size: int = 16):
+        self.pool_size = pool_size
+        self.session = None
+
+    async def get(self, url: str, params: Optional[Dict] = None, timeout: float = 30) -> TransportResponse:
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(headers=HEADERS, connector=connector)
+        async with self.session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            body = await response.read()
+            return TransportResponse(response.status, body, dict(response.headers))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+def default_transport(pool_size: int) -> "RequestsTransport | AiohttpTransport":
+    """利用可能なトランスポートを選択"""
+    if aiohttp is not None:
+        return AiohttpTransport(pool_size)
+    return RequestsTransport(pool_size)
+
+# ============================================================
+# クローラー
+# ============================================================
+
+class AsyncCrawler:
+    """同時実行数とレートを制御するHTTPクライアント"""
+
+    def __init__(self, transport, concurrency: int, rate: float):
+        self.transport = transport
+        # rate は初期値かつ上限。429/403 を受けると下げ、成功が続くと戻す
+        self.limiter = AdaptiveRateLimiter(
+            rate=rate,
+            min_rate=min(rate, 1.0 / CONFIG["max_request_delay"]),
+            max_rate=rate,
+            burst=concurrency,
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.request_count = 0
+
+    async def fetch_json(self, url: str, params: Optional[Dict] = None,
+                         retries: int = CONFIG["max_retries"], decode=None):
+        """safe_request と同じリトライ規則でJSONを取得（decode を渡すと応答本文をそれで変換）
+
+        トランスポートのキャッシュで返せる応答は、トークンの予約・待機も成功の記録もしない。
+        """
+        cached = getattr(self.transport, "cached", None)
+        response = await cached(url, params) if cached else None
+        if response is not None:
+            return decode(response.body) if decode else response.json()
+
+        for attempt in range(retries):
+            wait = self.limiter.reserve()
+            if wait > 0:
+                self.limiter.record_sleep(wait)
+                await asyncio.sleep(wait)
+            try:
+                async with self.semaphore:
+                    self.request_count += 1
+                    response = await self.transport.get(url, params)
+                if response.status == 200:
+                    if response.headers.get("X-Cache") != "HIT":  # 予約後に他のタスクがキャッシュした応答
+                        self.limiter.on_success()
+                    return decode(response.body) if decode else response.json()
+                elif response.status in (403, 429):
+                    wait_time = self.limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+                    print(f"  ⚠️ HTTP {response.status}。{wait_time:.0f}秒待機後リトライ...")
+                elif response.status == 404:
+                    return None
+                else:
+                    print(f"  ⚠️ HTTP {response.status}")
+                    self.limiter.on_error()
+            except Exception as e:
+                print(f"  ⚠️ リクエストエラー: {e}")
+                self.limiter.on_error()
+        return None
+
+    async def get_user_info(self, user_id: str) -> Optional[Creator]:
+        return await self.fetch_json(f"{v3.BASE_URL}/v2/creators/{user_id}", decode=decode_creator)
+
+    async def get_user_notes(self, user_id: str, page: int = 1) -> List[Note]:
+        url = f"{v3.BASE_URL}/v2/creators/{user_id}/contents"
+        return await self.fetch_json(url, {"kind": "note", "page": page}, decode=decode_contents) or []
+
+    async def fetch_search_page(self, keyword: str, start: int, size: int = 20) -> Optional[SearchPage]:
+        params = {"q": keyword, "size": size, "start": start}
+        return await self.fetch_json(f"{v3.BASE_URL}/v3/searches", params, decode=decode_search_page)
+
+    async def search_notes(self, keyword: str, max_pages: int = 5) -> List[Note]:
+        """全ページの検索結果（v3 と同じ停止条件でページング）"""
+        pager = SearchPager(keyword, max_pages=max_pages)
+        notes = []
+        while (start := pager.next_start()) is not None:
+            notes.extend(pager.accept(await self.fetch_search_page(keyword, start, pager.page_size)))
+        return notes
+
+# ============================================================
+# 非同期収集ロジック
+# ============================================================
+
+class AsyncDataCollector(DataCollector):
+    """DataCollector の非同期版（進捗・出力ファイルは共通）"""
+
+    def __init__(self, concurrency: int = CONFIG["concurrency"],
+                 rate: float = CONFIG["requests_per_second"], transport=None):
+        super().__init__()
+        self.concurrency = concurrency
+        self.rate = rate
+        self.transport = transport
+        self.crawler: Optional[AsyncCrawler] = None
+        self.in_flight_users = 0
+
+    async def process_user_async(self, urlname: str, category: str, keyword: str) -> int:
+        """ユーザーの記事を処理（process_user と同じ判定）"""
+        if urlname in self.collected_users:
+            return 0
+        if len(self.collected_users) + self.in_flight_users >= CONFIG["max_users"]:
+            return 0
+
+        self.in_flight_users += 1
+        try:
+            user_info = await self.crawler.get_user_info(urlname)
+            if not user_info:
+                return 0
+            get_creator_store().record(urlname, user_info)
+
+            follower_count = user_info.get("followerCount", 0)
+            if follower_count > CONFIG["max_followers"]:
+                return 0
+
+            nickname = user_info.get("nickname", "")
+            print(f"  👤 {nickname} (@{urlname}) - {follower_count}フォロワー")
+
+            notes_collected = 0
+            for page in range(1, 6):  # 最大5ページ
+                if notes_collected >= CONFIG["articles_per_user"]:
+                    break
+                notes = await self.crawler.get_user_notes(urlname, page)
+                if not notes:
+                    break
+
+                for note in notes:
+                    if str(note.get("id", "")) in self.collected_notes:
+                        get_note_labels().add(note.get("id"), category, keyword)
+                        continue
+                    note_data = build_note_data(note, urlname, nickname, follower_count,
+                                                category, keyword)
+                    if note_data and note_data.power_score >= CONFIG["power_score_threshold"]:
+                        self.save_note(note_data)
+                        notes_collected += 1
+                        print(f"    ✅ {note_data.title[:30]}... (PS={note_data.power_score:.2f})")
+
+            self.collected_users.add(urlname)
+            return notes_collected
+        finally:
+            self.in_flight_users -= 1
+
+    async def collect_from_keyword_async(self, category: str, keyword: str):
+        """キーワードから収集（ユーザー単位で並列処理）"""
+        print(f"\n🔍 [{category}] '{keyword}' を検索中...")
+
+        users_found = {}
+        notes = await self.crawler.search_notes(keyword)
+        get_note_labels().add_many([(note.get("id"), category, keyword) for note in notes])
+        for note in notes:
+            urlname = note.get("user", {}).get("urlname", "")
+            if urlname and urlname not in users_found:
+                users_found[urlname] = note["user"]
+
+        print(f"  📊 {len(users_found)}人のユーザーを発見")
+
+        store = get_creator_store()
+        candidates = [
+            urlname for urlname, user_data in users_found.items()
+            if urlname not in self.collected_users
+            and store.should_fetch_profile(user_data, CONFIG["max_followers"])
+        ]
+        await asyncio.gather(*(
+            self.process_user_async(urlname, category, keyword) for urlname in candidates
+        ))
+
+        self.progress["completed_keywords"].append(f"{category}:{keyword}")
+        self.save_progress()
+
+    async def run_async(self, keywords: List[Tuple[str, str]]):
+        """メイン収集ループ（キーワードは順番に処理）"""
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(self.concurrency))
+        transport = self.transport or default_transport(self.concurrency)
+        self.crawler = AsyncCrawler(transport, self.concurrency, self.rate)
+
+        start_index = self.progress["current_keyword_index"]
+        try:
+            for i, (category, keyword) in enumerate(keywords[start_index:], start=start_index):
+                print(f"\n[{i+1}/{len(keywords)}] 処理中...")
+                self.progress["current_keyword_index"] = i
+                await self.collect_from_keyword_async(category, keyword)
+
+                if len(self.collected_users) >= CONFIG["max_users"]:
+                    print(f"\n🎯 目標ユーザー数 ({CONFIG['max_users']}) に到達!")
+                    break
+        finally:
+            await transport.close()
+
+    def run(self, keywords: Optional[List[Tuple[str, str]]] = None):
+        """メイン収集処理"""
+        keywords = keywords or v3.ALL_KEYWORDS
+        if not self.progress["started_at"]:
+            self.progress["started_at"] = datetime.now().isoformat()
+
+        print("=" * 60)
+        print("🚀 noteAI 非同期データ収集 開始")
+        print(f"📊 目標: {CONFIG['max_users']}ユーザー, {len(keywords)}キーワード")
+        print(f"⚡ 同時実行数: {self.concurrency}, 上限レート: {self.rate}req/s")
+        print("=" * 60)
+
+        asyncio.run(self.run_async(keywords))
+        self.save_progress()
+
+        print("\n" + "=" * 60)
+        print("✅ 収集完了!")
+        print(f"📊 合計: {self.progress['total_notes']}記事, {len(self.collected_users)}ユーザー")
+        print(f"📡 リクエスト数: {self.crawler.request_count}")
+        search_iterator.print_report()
+        http_client.print_stats()
+        response_cache.print_report()
+        get_creator_store().print_report()
+        print("=" * 60)
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def _read_records(path) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return sorted((json.loads(line) for line in f), key=lambda r: r["note_id"])
+
+
+def run_benchmark(num_keywords: int, concurrency: int, rate: float, latency: float):
+    """スタブサーバー上で同期版と非同期版のスループットを比較"""
+    from note_stub_server import start_stub_server
+
+    server = start_stub_server(latency=latency)
+    keywords = v3.ALL_KEYWORDS[:num_keywords]
+    saved = (v3.BASE_URL, v3.ALL_KEYWORDS, dict(CONFIG), v3.LIMITER)
+    v3.BASE_URL = server.base_url
+    v3.ALL_KEYWORDS = keywords
+    # 同期版にも同じレート上限を適用
+    v3.LIMITER = AdaptiveRateLimiter(rate=rate, min_rate=rate, max_rate=rate)
+    CONFIG.update(max_users=10**9)
+    http_client.configure(cache=False)  # 2回目の実行がキャッシュに当たらないように
+
+    cwd = os.getcwd()
+    results = {}
+    try:
+        for name in ("sync", "async"):
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                reset_creator_store()  # 前の実行の保存済みフォロワー数を使わない
+                reset_note_labels()
+                before = server.request_count
+                start = time.perf_counter()
+                if name == "sync":
+                    DataCollector().run()
+                else:
+                    AsyncDataCollector(concurrency, rate).run(keywords)
+                elapsed = time.perf_counter() - start
+                requests_made = server.request_count - before
+                results[name] = (elapsed, requests_made, _read_records(v3.RAW_DATA_FILE))
+                os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        reset_creator_store()
+        reset_note_labels()
+        v3.BASE_URL, v3.ALL_KEYWORDS, v3.LIMITER = saved[0], saved[1], saved[3]
+        CONFIG.clear()
+        CONFIG.update(saved[2])
+        server.shutdown()
+
+    print("\n" + "=" * 60)
+    print(f"📈 ベンチマーク結果（{num_keywords}キーワード, 遅延{latency * 1000:.0f}ms）")
+    print("=" * 60)
+    for name, (elapsed, requests_made, records) in results.items():
+        print(f"  {name:>5}: {elapsed:7.2f}秒  {requests_made:5d}リクエスト  "
+              f"{requests_made / elapsed:7.1f}req/s  {len(records)}記事")
+    same = results["sync"][2] == results["async"][2]
+    print(f"  出力一致: {'✅' if same else '❌'}")
+    print(f"  高速化: {results['sync'][0] / results['async'][0]:.1f}x")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI 非同期クロールエンジン")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "bench"])
+    parser.add_argument("--concurrency", type=int, default=CONFIG["concurrency"])
+    parser.add_argument("--rate", type=float, default=None,
+                        help="全体レート上限（req/s）。bench時の既定値は50")
+    parser.add_argument("--keywords", type=int, default=3, help="bench: 使用キーワード数")
+    parser.add_argument("--latency", type=float, default=0.05, help="bench: スタブの応答遅延（秒）")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        run_benchmark(args.keywords, args.concurrency, args.rate or 50.0, args.latency)
+    else:
+        AsyncDataCollector(args.concurrency, args.rate or CONFIG["requests_per_second"]).run()
@@ -0,0 +1,185 @@
+"""
+noteAI 収集パイプライン
+
+検索 → プロフィール取得 → 記事取得 → 書き込み のような処理を、
+上限付きキューで繋いだステージに分けてスレッドで並行実行する。
+
+仕組み:
+- ステージごとにワーカー数を設定（遅いステージに多く割り当てる）
+- キューが満杯なら上流が待つ（バックプレッシャー）
+- ステージごとの処理件数・スループット・稼働率・キュー深さを計測し、律速ステージを特定できる
+
+使用方法:
+    pipeline = Pipeline([
+        Stage("search", search_fn, workers=1),
+        Stage("profile", profile_fn, workers=2),
+        Stage("writer", write_fn, workers=1),
+    ], queue_size=50)
+    pipeline.run(seed_items)
+    pipeline.print_metrics()
+
+各ステージ関数は fn(item, emit) の形で、emit(x) で次ステージへ渡す。
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_DONE = object()  # ワーカー終了の合図
+
+# ============================================================
+# ステージ
+# ============================================================
+
+@dataclass
+class StageMetrics:
+    """ステージの計測値"""
+    processed: int = 0
+    emitted: int = 0
+    errors: int = 0
+    busy_time: float = 0.0
+    depth_samples: int = 0
+    depth_total: int = 0
+    max_depth: int = 0
+
+
+@dataclass
+class Stage:
+    """パイプラインの1ステージ"""
+    name: str
+    fn: Callable[[Any, Callable[[Any], None]], None]
+    workers: int = 1
+    metrics: StageMetrics = field(default_factory=StageMetrics)
+
+    def __post_init__(self):
+        self.inbox: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._alive = self.workers
+
+# ============================================================
+# パイプライン
+# ============================================================
+
+class Pipeline:
+    """上限付きキューで繋いだステージ群"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 100, report_interval: float = 0.0):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.report_interval = report_interval
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        for stage in stages:
+            stage.inbox = queue.Queue(maxsize=queue_size)
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        def emit(item):
+            if downstream is not None:
+                downstream.inbox.put(item)  # 満杯ならここで待つ（バックプレッシャー）
+                with stage._lock:
+                    stage.metrics.emitted += 1
+
+        while True:
+            item = stage.inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                stage.fn(item, emit)
+            except Exception as e:
+                print(f"  ❌ [{stage.name}] Error: {e}")
+                with stage._lock:
+                    stage.metrics.errors += 1
+            with stage._lock:
+                stage.metrics.processed += 1
+                stage.metrics.busy_time += time.perf_counter() - start
+
+        # 最後に終了したワーカーが下流に終了を伝える
+        with stage._lock:
+            stage._alive -= 1
+            last = stage._alive == 0
+        if last and downstream is not None:
+            for _ in range(downstream.workers):
+                downstream.inbox.put(_DONE)
+
+    def _monitor(self, stop: threading.Event):
+        while not stop.wait(0.1):
+            for stage in self.stages:
+                depth = stage.inbox.qsize()
+                with stage._lock:
+                    stage.metrics.depth_samples += 1
+                    stage.metrics.depth_total += depth
+                    stage.metrics.max_depth = max(stage.metrics.max_depth, depth)
+            if self.report_interval and time.perf_counter() - self._last_report >= self.report_interval:
+                self._last_report = time.perf_counter()
+                self.print_metrics(compact=True)
+
+    def run(self, seeds: Iterable[Any]):
+        """初段に seeds を投入し、全ステージが空になるまで実行"""
+        self.started_at = self._last_report = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(index,), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        stop = threading.Event()
+        monitor = threading.Thread(target=self._monitor, args=(stop,), daemon=True)
+        monitor.start()
+
+        first = self.stages[0]
+        for item in seeds:
+            first.inbox.put(item)
+        for _ in range(first.workers):
+            first.inbox.put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        stop.set()
+        monitor.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def metrics(self) -> Dict[str, Dict]:
+        """ステージごとの計測値"""
+        elapsed = (self.elapsed or time.perf_counter() - self.started_at) or 1e-9
+        result = {}
+        for stage in self.stages:
+            m = stage.metrics
+            result[stage.name] = {
+                "workers": stage.workers,
+                "processed": m.processed,
+                "emitted": m.emitted,
+                "errors": m.errors,
+                "throughput": m.processed / elapsed,
+                "utilization": m.busy_time / (elapsed * stage.workers),
+                "queue_depth": stage.inbox.qsize(),
+                "avg_queue_depth": m.depth_total / m.depth_samples if m.depth_samples else 0.0,
+                "max_queue_depth": m.max_depth,
+            }
+        return result
+
+    def bottleneck(self) -> Optional[str]:
+        """稼働率が最も高いステージ（律速の候補）"""
+        metrics = self.metrics()
+        if not metrics:
+            return None
+        return max(metrics, key=lambda name: metrics[name]["utilization"])
+
+    def print_metrics(self, compact: bool = False):
+        """計測値を表示"""
+        metrics = self.metrics()
+        if compact:
+            parts = [f"{name}:{m['processed']}件/q{m['queue_depth']}" for name, m in metrics.items()]
+            print(f"  ⏳ パイプライン {' → '.join(parts)}")
+            return
+        print(f"🔀 パイプライン計測（{self.elapsed:.1f}秒）")
+        for name, m in metrics.items():
+            print(f"  {name:>8} x{m['workers']}: {m['processed']:5d}件 {m['throughput']:6.2f}件/秒 "
+                  f"稼働率 {m['utilization']:4.0%}  キュー平均 {m['avg_queue_depth']:.1f} / 最大 {m['max_queue_depth']}")
+        print(f"  🐢 律速ステージ: {self.bottleneck()}")
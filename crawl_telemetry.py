@@ -0,0 +1,334 @@
+"""
+noteAI クロール計測（テレメトリ）
+
+数時間かかる収集で、どのエンドポイント（/v2/creators, /contents, /v3/searches）に
+どれだけ時間を使っているか、待機・429バックオフにどれだけ取られているかを記録する。
+
+仕組み:
+- http_client の観測関数として登録し、エンドポイント別にレイテンシのヒストグラム・
+  ステータス別件数・受信バイト数・キャッシュ応答数を集計
+- レート制限（AdaptiveRateLimiter）の統計から待機時間・バックオフ時間・リトライ数を取得
+- 一定間隔で JSONL にスナップショットを追記し、進捗と残り時間（ETA）を1行表示
+- 任意で Prometheus テキスト形式の /metrics を公開
+
+使用方法:
+    telemetry = start_telemetry(limiters=[LIMITER], interval=60, prometheus_port=9108)
+    for i, keyword in enumerate(keywords):
+        ...
+        set_frontier(i + 1, len(keywords))   # 残りの作業量（ETA の計算に使用）
+    stop_telemetry()
+
+    python collect_power_data_v3.py --telemetry              # data/telemetry.jsonl に記録
+    python collect_power_data_custom.py --telemetry --metrics-port 9108
+"""
+
+import bisect
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import http_client
+from jsonl_writer import JsonlWriter
+
+# ============================================================
+# 設定
+# ============================================================
+
+TELEMETRY_CONFIG = {
+    "path": Path("data") / "telemetry.jsonl",
+    "interval": 60.0,           # スナップショットの間隔（秒）
+    "prometheus_port": None,    # /metrics を公開するポート（None=無効）
+}
+
+# レイテンシのヒストグラムの上限値（秒、Prometheus の le）
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+# ============================================================
+# 集計
+# ============================================================
+
+@dataclass
+class EndpointStats:
+    """エンドポイント1種類分の計測値"""
+    requests: int = 0
+    cache_hits: int = 0
+    bytes: int = 0
+    latency_sum: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def observe(self, status: int, elapsed: float, size: int, cached: bool):
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        self.bytes += size
+        if cached:
+            self.cache_hits += 1
+            return
+        self.requests += 1
+        self.latency_sum += elapsed
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def percentile(self, p: float) -> float:
+        """ヒストグラムから分位点を推定（バケット内は線形補間）"""
+        target = self.requests * p
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.buckets):
+            upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            if count and seen + count >= target:
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+    def summary(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "bytes": self.bytes,
+            "statuses": dict(self.statuses),
+            "latency_sum": round(self.latency_sum, 4),
+            "p50": round(self.percentile(0.50), 4),
+            "p95": round(self.percentile(0.95), 4),
+            "buckets": list(self.buckets),
+        }
+
+
+class Telemetry:
+    """エンドポイント別の計測・スナップショット・ETA（スレッドセーフ）"""
+
+    def __init__(self, limiters: Optional[List] = None, path: Path = None, interval: float = None):
+        self.path = Path(path or TELEMETRY_CONFIG["path"])
+        self.interval = interval or TELEMETRY_CONFIG["interval"]
+        self.limiters = list(limiters or [])
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.started = time.monotonic()
+        self.frontier_done = 0
+        self.frontier_total = 0
+        self._frontier_start: Optional[tuple] = None   # (時刻, 完了数) ETA の起点
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._writer: Optional[JsonlWriter] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # --------------------------------------------------------
+    # 記録
+    # --------------------------------------------------------
+
+    def observe(self, endpoint: str, status: int, elapsed: float, size: int, cached: bool):
+        """http_client の観測関数"""
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.observe(status, elapsed, size, cached)
+
+    def set_frontier(self, done: int, total: int):
+        """残りの作業量を更新（キーワード数・キュー件数など）"""
+        with self._lock:
+            if self._frontier_start is None:
+                self._frontier_start = (time.monotonic(), done)
+            self.frontier_done = done
+            self.frontier_total = total
+
+    def eta(self) -> Optional[float]:
+        """残り時間の推定（秒）。計測開始からの平均処理速度で計算"""
+        with self._lock:
+            if self._frontier_start is None:
+                return None
+            started_at, started_done = self._frontier_start
+            done, total = self.frontier_done, self.frontier_total
+        progressed = done - started_done
+        if progressed <= 0:
+            return None
+        return (total - done) * (time.monotonic() - started_at) / progressed
+
+    def _limiter_summary(self) -> Dict:
+        summary = {"sleep_time": 0.0, "backoff_time": 0.0, "throttled": 0, "errors": 0, "rate": 0.0}
+        for limiter in self.limiters:
+            s = limiter.stats
+            summary["sleep_time"] += s.sleep_time
+            summary["backoff_time"] += s.backoff_time
+            summary["throttled"] += s.throttled
+            summary["errors"] += s.errors
+            summary["rate"] += limiter.rate
+        summary["retries"] = summary["throttled"] + summary["errors"]
+        summary["sleep_time"] = round(summary["sleep_time"], 3)
+        summary["backoff_time"] = round(summary["backoff_time"], 3)
+        return summary
+
+    def snapshot(self) -> Dict:
+        """現在の計測値"""
+        eta = self.eta()
+        with self._lock:
+            endpoints = {name: stats.summary() for name, stats in sorted(self.endpoints.items())}
+            frontier = {"done": self.frontier_done, "total": self.frontier_total}
+        frontier["eta_seconds"] = round(eta, 1) if eta is not None else None
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(time.monotonic() - self.started, 1),
+            "endpoints": endpoints,
+            "limiter": self._limiter_summary(),
+            "frontier": frontier,
+        }
+
+    # --------------------------------------------------------
+    # 出力
+    # --------------------------------------------------------
+
+    def emit(self) -> Dict:
+        """スナップショットを JSONL に追記し、1行で表示"""
+        snapshot = self.snapshot()
+        if self._writer is not None:
+            self._writer.write(snapshot)
+            self._writer.flush()
+        print(self.format_line(snapshot))
+        return snapshot
+
+    @staticmethod
+    def format_line(snapshot: Dict) -> str:
+        frontier, limiter = snapshot["frontier"], snapshot["limiter"]
+        eta = frontier["eta_seconds"]
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "--:--:--"
+        parts = [f"{name} {s['requests']}件 p50 {s['p50'] * 1000:.0f}ms"
+                 for name, s in snapshot["endpoints"].items()]
+        return (f"📊 [{frontier['done']}/{frontier['total']}] ETA {eta_text} | " + ", ".join(parts)
+                + f" | 待機 {limiter['sleep_time']:.0f}秒 (バックオフ {limiter['backoff_time']:.0f}秒), "
+                  f"リトライ {limiter['retries']}回")
+
+    def prometheus_text(self) -> str:
+        """Prometheus テキスト形式"""
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE noteai_http_requests_total counter",
+            "# TYPE noteai_http_request_duration_seconds histogram",
+            "# TYPE noteai_http_response_bytes_total counter",
+            "# TYPE noteai_http_cache_hits_total counter",
+        ]
+        for name, s in snapshot["endpoints"].items():
+            for status, count in sorted(s["statuses"].items()):
+                lines.append(f'noteai_http_requests_total{{endpoint="{name}",status="{status}"}} {count}')
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ["+Inf"], s["buckets"]):
+                cumulative += count
+                lines.append(f'noteai_http_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'noteai_http_request_duration_seconds_sum{{endpoint="{name}"}} {s["latency_sum"]}')
+            lines.append(f'noteai_http_request_duration_seconds_count{{endpoint="{name}"}} {s["requests"]}')
+            lines.append(f'noteai_http_response_bytes_total{{endpoint="{name}"}} {s["bytes"]}')
+            lines.append(f'noteai_http_cache_hits_total{{endpoint="{name}"}} {s["cache_hits"]}')
+        limiter, frontier = snapshot["limiter"], snapshot["frontier"]
+        lines += [
+            "# TYPE noteai_ratelimit_sleep_seconds_total counter",
+            f"noteai_ratelimit_sleep_seconds_total {limiter['sleep_time']}",
+            "# TYPE noteai_ratelimit_backoff_seconds_total counter",
+            f"noteai_ratelimit_backoff_seconds_total {limiter['backoff_time']}",
+            "# TYPE noteai_retries_total counter",
+            f"noteai_retries_total {limiter['retries']}",
+            "# TYPE noteai_ratelimit_rate gauge",
+            f"noteai_ratelimit_rate {limiter['rate']}",
+            "# TYPE noteai_frontier_done gauge",
+            f"noteai_frontier_done {frontier['done']}",
+            "# TYPE noteai_frontier_total gauge",
+            f"noteai_frontier_total {frontier['total']}",
+        ]
+        if frontier["eta_seconds"] is not None:
+            lines += ["# TYPE noteai_eta_seconds gauge", f"noteai_eta_seconds {frontier['eta_seconds']}"]
+        return "\n".join(lines) + "\n"
+
+    # --------------------------------------------------------
+    # 開始・停止
+    # --------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.emit()
+
+    def start(self, prometheus_port: Optional[int] = None):
+        http_client.add_observer(self.observe)
+        self._writer = JsonlWriter(self.path, fsync=False)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="telemetry")
+        self._thread.start()
+        if prometheus_port is not None:
+            self._server = _start_metrics_server(self, prometheus_port)
+            host, port = self._server.server_address[:2]
+            print(f"📈 メトリクス公開: http://{host}:{port}/metrics")
+
+    def stop(self):
+        """最終スナップショットを書いて停止"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        http_client.remove_observer(self.observe)
+        self.emit()
+        if self._server is not None:
+            self._server.shutdown()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    telemetry: Telemetry = None
+
+    def log_message(self, format, *args):
+        pass  # アクセスログは出さない
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.telemetry.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _start_metrics_server(telemetry: Telemetry, port: int) -> ThreadingHTTPServer:
+    handler = type("MetricsHandler", (_MetricsHandler,), {"telemetry": telemetry})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
+
+# ============================================================
+# モジュール関数
+# ============================================================
+
+_telemetry: Optional[Telemetry] = None
+
+
+def start_telemetry(limiters: Optional[List] = None, path: Path = None, interval: float = None,
+                    prometheus_port: Optional[int] = None) -> Telemetry:
+    """計測を開始（既に開始済みならそれを返す）"""
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = Telemetry(limiters, path, interval)
+        _telemetry.start(prometheus_port if prometheus_port is not None
+                         else TELEMETRY_CONFIG["prometheus_port"])
+    return _telemetry
+
+
+def stop_telemetry():
+    """計測を停止（開始していなければ何もしない）"""
+    global _telemetry
+    if _telemetry is not None:
+        _telemetry.stop()
+        _telemetry = None
+
+
+def set_frontier(done: int, total: int):
+    """残りの作業量を更新（計測していなければ何もしない）"""
+    if _telemetry is not None:
+        _telemetry.set_frontier(done, total)
+
+
+def get_telemetry() -> Optional[Telemetry]:
+    """開始中の計測（無ければNone）"""
+    return _telemetry
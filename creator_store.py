@@ -0,0 +1,281 @@
+"""
+noteAI クリエイターメタデータストア
+
+過去の実行で取得したプロフィール（フォロワー数など）を SQLite に保存し、
+検索結果に含まれるフォロワー情報と合わせて、プロフィールAPIを呼ぶ前に
+インフルエンサー（フォロワー上限超え）を除外する。
+差分収集用に、クリエイターごとの最新記事（publishAt / 記事ID）も記録する。
+
+使用方法:
+    store = get_creator_store()
+    if store.should_fetch_profile(search_user, min_followers=5, max_followers=3000):
+        user_info = get_user_info(urlname)
+        store.record(urlname, user_info)
+    store.print_report()   # 回避できたプロフィール取得数
+
+    # 差分収集: 既知の記事に到達したらページングを止める
+    state = store.get_state(urlname)
+    if state and state.reached(note): ...
+    store.update_state(urlname, newest_note(notes), category, keyword)
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# ============================================================
+# 設定
+# ============================================================
+
+STORE_CONFIG = {
+    "path": Path("data") / "creators.sqlite",
+    "max_age": 30 * 24 * 3600,   # 保存済みフォロワー数を信用する期間（秒）
+}
+
+# ============================================================
+# ストア本体
+# ============================================================
+
+@dataclass
+class CreatorRecord:
+    """保存済みクリエイター情報"""
+    urlname: str
+    user_id: str
+    nickname: str
+    follower_count: int
+    note_count: int
+    updated_at: float
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """publishAt（ISO 8601）を解析"""
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def newest_note(notes: Iterable[Optional[Dict]]) -> Optional[Dict]:
+    """publishAt が最も新しい記事"""
+    dated = [(_parse_time(n.get("publishAt")), n) for n in notes if n]
+    dated = [(t, n) for t, n in dated if t is not None]
+    return max(dated, key=lambda pair: pair[0])[1] if dated else None
+
+
+@dataclass
+class CrawlState:
+    """クリエイターごとの差分収集の状態（最新記事 = ハイウォーターマーク）"""
+    urlname: str
+    latest_publish_at: Optional[str]
+    latest_note_id: Optional[str]
+    category: str
+    keyword: str
+    crawled_at: float
+    stats_refreshed_at: float
+
+    def reached(self, note: Dict) -> bool:
+        """既知の記事（前回の最新記事以前）に到達したか"""
+        if self.latest_note_id and str(note.get("id", "")) == self.latest_note_id:
+            return True
+        published = _parse_time(note.get("publishAt"))
+        mark = _parse_time(self.latest_publish_at)
+        return published is not None and mark is not None and published <= mark
+
+
+@dataclass
+class PrefilterStats:
+    """プロフィール取得前フィルタの統計"""
+    checked: int = 0
+    skipped_by_search: int = 0   # 検索結果のフォロワー数で除外
+    skipped_by_store: int = 0    # 保存済みフォロワー数で除外
+
+    @property
+    def avoided(self) -> int:
+        return self.skipped_by_search + self.skipped_by_store
+
+
+class CreatorStore:
+    """SQLiteによるクリエイター情報の永続化（スレッドセーフ）"""
+
+    def __init__(self, path: Path = None, max_age: float = None):
+        self.path = Path(path or STORE_CONFIG["path"]).resolve()
+        self.max_age = max_age if max_age is not None else STORE_CONFIG["max_age"]
+        self.stats = PrefilterStats()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS creators (
+                urlname TEXT PRIMARY KEY,
+                user_id TEXT,
+                nickname TEXT,
+                follower_count INTEGER NOT NULL,
+                note_count INTEGER,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_state (
+                urlname TEXT PRIMARY KEY,
+                latest_publish_at TEXT,
+                latest_note_id TEXT,
+                category TEXT,
+                keyword TEXT,
+                crawled_at REAL NOT NULL,
+                stats_refreshed_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, urlname: str) -> Optional[CreatorRecord]:
+        """保存済み情報を取得"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT urlname, user_id, nickname, follower_count, note_count, updated_at "
+                "FROM creators WHERE urlname = ?", (urlname,),
+            ).fetchone()
+        return CreatorRecord(*row) if row else None
+
+    def _upsert(self, urlname: str, user: Dict):
+        """ロック取得済みで呼ぶ"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO creators VALUES (?, ?, ?, ?, ?, ?)",
+            (urlname, str(user.get("id", "")), user.get("nickname", ""),
+             user.get("followerCount", 0), user.get("noteCount"), time.time()),
+        )
+        self.conn.commit()
+
+    def record(self, urlname: str, user_info: Dict):
+        """プロフィールAPIの応答（または同等の辞書）を保存"""
+        with self._lock:
+            self._upsert(urlname, user_info)
+
+    def known_follower_count(self, urlname: str, search_user: Optional[Dict] = None) -> Optional[int]:
+        """検索結果 → 保存済み（有効期限内）の順でフォロワー数を探す"""
+        if search_user and isinstance(search_user.get("followerCount"), int):
+            return search_user["followerCount"]
+        record = self.get(urlname)
+        if record and time.time() - record.updated_at < self.max_age:
+            return record.follower_count
+        return None
+
+    def should_fetch_profile(self, search_user: Dict, max_followers: int, min_followers: int = 0) -> bool:
+        """プロフィールを取得する必要があるか（既知のフォロワー数が範囲外ならFalse）"""
+        urlname = search_user.get("urlname", "")
+        with self._lock:
+            self.stats.checked += 1
+
+        from_search = isinstance(search_user.get("followerCount"), int)
+        count = self.known_follower_count(urlname, search_user)
+        if count is None or min_followers <= count <= max_followers:
+            return True
+
+        with self._lock:
+            if from_search:
+                self.stats.skipped_by_search += 1
+                self._upsert(urlname, search_user)  # 次回以降のために保存
+            else:
+                self.stats.skipped_by_store += 1
+        return False
+
+    # --------------------------------------------------------
+    # 差分収集
+    # --------------------------------------------------------
+
+    def get_state(self, urlname: str) -> Optional[CrawlState]:
+        """差分収集の状態を取得"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT urlname, latest_publish_at, latest_note_id, category, keyword, "
+                "crawled_at, stats_refreshed_at FROM crawl_state WHERE urlname = ?", (urlname,),
+            ).fetchone()
+        return CrawlState(*row) if row else None
+
+    def update_state(self, urlname: str, newest: Optional[Dict], category: str, keyword: str,
+                     stats_refreshed: bool = False):
+        """記事一覧の取得後に呼ぶ（newest が前回より新しければハイウォーターマークを進める）"""
+        previous = self.get_state(urlname)
+        now = time.time()
+        publish_at = note_id = None
+        if previous:
+            publish_at, note_id = previous.latest_publish_at, previous.latest_note_id
+            category, keyword = previous.category or category, previous.keyword or keyword
+        if newest and (previous is None or not previous.reached(newest)):
+            publish_at, note_id = newest.get("publishAt"), str(newest.get("id", ""))
+        refreshed_at = now if stats_refreshed or previous is None else previous.stats_refreshed_at
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (urlname, publish_at, note_id, category, keyword, now, refreshed_at),
+            )
+            self.conn.commit()
+
+    def mark_stats_refreshed(self, urlname: str):
+        """フォロワー数・スキ数を更新した時刻を記録"""
+        with self._lock:
+            now = time.time()
+            self.conn.execute(
+                "INSERT INTO crawl_state (urlname, category, keyword, crawled_at, stats_refreshed_at) "
+                "VALUES (?, '', '', 0, ?) ON CONFLICT(urlname) DO UPDATE SET stats_refreshed_at = ?",
+                (urlname, now, now),
+            )
+            self.conn.commit()
+
+    def stats_due(self, urlnames: Iterable[str], max_age: float) -> List[str]:
+        """フォロワー数・スキ数の更新時期を過ぎたクリエイター（古い順）"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            refreshed = dict(self.conn.execute(
+                "SELECT urlname, stats_refreshed_at FROM crawl_state").fetchall())
+        due = [u for u in urlnames if refreshed.get(u, 0.0) < cutoff]
+        return sorted(due, key=lambda u: refreshed.get(u, 0.0))
+
+    def fresh_profile(self, urlname: str, max_age: float) -> Optional[Dict]:
+        """max_age 以内に保存したプロフィール（get_user_info と同じ形の辞書）"""
+        record = self.get(urlname)
+        if record is None or time.time() - record.updated_at >= max_age:
+            return None
+        return {"id": record.user_id, "nickname": record.nickname,
+                "followerCount": record.follower_count, "noteCount": record.note_count}
+
+    def print_report(self):
+        """回避できたプロフィール取得数を表示"""
+        s = self.stats
+        print(f"🧹 事前フィルタ: {s.checked}人中 {s.avoided}件のプロフィール取得を回避 "
+              f"(検索結果 {s.skipped_by_search} / 保存済み {s.skipped_by_store})")
+
+
+_store: Optional[CreatorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_creator_store() -> CreatorStore:
+    """共有ストアを取得（初回呼び出し時に作成）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CreatorStore()
+    return _store
+
+
+def reset_creator_store():
+    """共有ストアを閉じる（次の get_creator_store() で作業ディレクトリの data/ に作り直す）"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.conn.close()
+        _store = None
+
+
+def print_report():
+    """共有ストアのレポートを表示（未使用なら何もしない）"""
+    if _store is not None:
+        _store.print_report()
@@ -0,0 +1,257 @@
+"""
+noteAI 重複排除インデックス
+
+収集済みの記事ID・ユーザー名を SQLite（WITHOUT ROWID の主キー表）に保存する。
+起動時に raw_notes_*.jsonl を全行 json.loads してセットを作る代わりに、
+インデックスを開くだけで済む（件数はメタ表に保持、O(1)で起動）。
+
+仕組み:
+- set と同じ操作（in / add / len / 反復）を提供し、追加はバッファしてまとめて INSERT
+- add() はバッファするだけで、書き込むのは flush() / commit() のときだけ。呼び出し側は
+  JSONL を fsync（JsonlWriter.checkpoint）してから commit するので、ディスクに無い記事が
+  「収集済み」として残ることはない
+- commit(source) で JSONL の取り込み済みバイト位置を記録し、次回起動時は
+  その位置以降（前回の commit 後に書かれた行）だけを読み直して追いつく
+- 既存の JSON（collected_users_*.json）は初回だけ取り込む
+
+使用方法:
+    notes = DedupIndex(DEDUP_FILE, "notes")
+    notes.catch_up(RAW_DATA_FILE, "note_id")
+    if note_id not in notes:
+        notes.add(note_id)
+    notes.commit(RAW_DATA_FILE)
+
+    python dedup_index.py bench --sizes 100000 1000000   # 起動時間・RSSを従来方式と比較
+"""
+
+import argparse
+import json
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set
+
+# ============================================================
+# インデックス本体
+# ============================================================
+
+class DedupIndex:
+    """SQLiteによる永続的な文字列セット（スレッドセーフ）"""
+
+    def __init__(self, path: Path, name: str, batch_size: int = 1000):
+        # batch_size は catch_up（ディスク上の行の取り込み）でまとめて書き込む件数
+        self.path = Path(path).resolve()
+        self.name = name
+        self.batch_size = batch_size
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (key TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dedup_meta (
+                name TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                source_offset INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("INSERT OR IGNORE INTO dedup_meta VALUES (?, 0, 0)", (name,))
+        self.conn.commit()
+        self._count, self.source_offset = self.conn.execute(
+            "SELECT count, source_offset FROM dedup_meta WHERE name = ?", (name,)).fetchone()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._pending:
+                return True
+            return self.conn.execute(
+                f'SELECT 1 FROM "{self.name}" WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count + len(self._pending)
+
+    def __iter__(self) -> Iterator[str]:
+        self.flush()
+        with self._lock:
+            keys = [row[0] for row in self.conn.execute(f'SELECT key FROM "{self.name}" ORDER BY key')]
+        return iter(keys)
+
+    def add(self, key: str):
+        """追加（バッファのみ。flush / commit でまとめて書き込み、重複は INSERT OR IGNORE で除外）"""
+        with self._lock:
+            self._pending.add(key)
+
+    def update(self, keys: Iterable[str]):
+        """まとめて追加"""
+        for key in keys:
+            self.add(key)
+
+    def _write_pending(self, source_offset: Optional[int] = None):
+        """バッファをINSERTして件数を更新（ロック取得済みで呼ぶ）"""
+        added = 0
+        if self._pending:
+            cursor = self.conn.executemany(
+                f'INSERT OR IGNORE INTO "{self.name}" VALUES (?)', ((k,) for k in self._pending))
+            added = max(cursor.rowcount, 0)
+            self._pending.clear()
+        if source_offset is not None:
+            self.source_offset = source_offset
+        # 件数は差分で更新（複数プロセスが同じインデックスに書いても数え漏れない）
+        self.conn.execute("UPDATE dedup_meta SET count = count + ?, source_offset = ? WHERE name = ?",
+                          (added, self.source_offset, self.name))
+        self._count = self.conn.execute(
+            "SELECT count FROM dedup_meta WHERE name = ?", (self.name,)).fetchone()[0]
+        self.conn.commit()
+
+    def flush(self):
+        """バッファを書き込む"""
+        with self._lock:
+            self._write_pending()
+
+    def commit(self, source: Optional[Path] = None):
+        """バッファを書き込み、source（JSONL）の現在のサイズを取り込み済み位置として記録
+
+        source への追記 → add() の順で呼んでいれば、記録した位置までの行は全てインデックス済み。
+        """
+        offset = Path(source).stat().st_size if source and Path(source).exists() else None
+        with self._lock:
+            self._write_pending(offset)
+
+    def catch_up(self, source: Path, field: str) -> int:
+        """source の取り込み済み位置以降の行を読み、field の値を追加（追加行数を返す）"""
+        source = Path(source)
+        if not source.exists():
+            return 0
+        size = source.stat().st_size
+        offset = self.source_offset if self.source_offset <= size else 0  # 作り直されたファイル
+        lines = 0
+        with open(source, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # 書きかけの行は次回に回す
+                offset += len(line)
+                try:
+                    key = json.loads(line).get(field)
+                except (ValueError, AttributeError):
+                    continue
+                if key:
+                    self.add(str(key))
+                    lines += 1
+                    if len(self._pending) >= self.batch_size:
+                        self.flush()  # ディスク上の行なので途中で書き込んでよい
+        with self._lock:
+            self._write_pending(offset)
+        return lines
+
+    def import_json_list(self, source: Path) -> int:
+        """JSON配列ファイル（従来の collected_users_*.json）を初回だけ取り込む"""
+        source = Path(source)
+        if len(self) or not source.exists():
+            return 0
+        with open(source, "r", encoding="utf-8") as f:
+            keys = json.load(f)
+        self.update(str(k) for k in keys)
+        self.flush()
+        return len(keys)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _probe(mode: str, data_file: str, index_file: str):
+    """子プロセスで起動処理を1回実行し、時間・RSS・検索時間をJSONで出力"""
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    if mode == "legacy":
+        notes = set()
+        with open(data_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    notes.add(json.loads(line).get("note_id", ""))
+                except ValueError:
+                    pass
+    else:
+        notes = DedupIndex(index_file, "notes")
+        notes.catch_up(data_file, "note_id")
+    startup = time.perf_counter() - start
+
+    lookups = [str(i * 7919 % (2 * len(notes))) for i in range(10000)]
+    start = time.perf_counter()
+    hits = sum(1 for key in lookups if key in notes)
+    lookup = (time.perf_counter() - start) / len(lookups)
+    print(json.dumps({"startup": startup, "rss_mb": _rss_mb() - baseline,
+                      "lookup_us": lookup * 1e6, "count": len(notes), "hits": hits}))
+
+
+def _run_probe(mode: str, data_file: Path, index_file: Path) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "_probe", mode, str(data_file), str(index_file)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(sizes: Iterable[int]):
+    """従来方式（JSONL全行パース→set）とインデックスの起動時間・RSSを比較"""
+    print("=" * 72)
+    print("📈 重複排除インデックス ベンチマーク（起動時間 / 増加RSS / 1件の検索）")
+    print("=" * 72)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            data_file = Path(tmp) / f"raw_{size}.jsonl"
+            index_file = Path(tmp) / f"dedup_{size}.sqlite"
+            with open(data_file, "w", encoding="utf-8") as f:
+                for i in range(size):
+                    f.write(json.dumps({"note_id": str(i), "title": f"記事タイトル{i % 997}",
+                                        "user_id": f"user{i % 50000}", "like_count": i % 500},
+                                       ensure_ascii=False) + "\n")
+
+            start = time.perf_counter()
+            index = DedupIndex(index_file, "notes", batch_size=50000)
+            index.catch_up(data_file, "note_id")
+            index.close()
+            build = time.perf_counter() - start
+
+            legacy = _run_probe("legacy", data_file, index_file)
+            indexed = _run_probe("index", data_file, index_file)
+            print(f"  {size:>10,}件  (JSONL {data_file.stat().st_size / 1024 / 1024:.0f}MB, "
+                  f"初回構築 {build:.1f}秒, インデックス {index_file.stat().st_size / 1024 / 1024:.0f}MB)")
+            for label, r in (("従来(set)   ", legacy), ("インデックス", indexed)):
+                print(f"    {label}: 起動 {r['startup']:8.3f}秒  RSS +{r['rss_mb']:7.1f}MB  "
+                      f"検索 {r['lookup_us']:5.1f}µs")
+            data_file.unlink()
+            index_file.unlink()
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_probe":
+        _probe(*sys.argv[2:5])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="noteAI 重複排除インデックス")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes)
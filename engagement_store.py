@@ -0,0 +1,391 @@
+"""
+noteAI エンゲージメント時系列ストア
+
+同じ記事を繰り返し収集したときのスキ数・フォロワー数・コメント数を、記事ごとの時系列として保存する。
+レコード全体（JSON 1行 数百バイト）を保存し直す代わりに、1観測あたり数バイトで追記する。
+
+仕組み:
+- 記事IDごとに1行（SQLite）。観測値は (時刻, スキ数, フォロワー数, コメント数) の前回との差分を
+  ZigZag + 可変長整数（varint）で符号化し、BLOB の末尾に追記
+- 直近の値は列にも持つので、追記時に BLOB を復号する必要はない
+- 作成者ID（creator_id）に索引を張り、作成者単位でも引ける
+- JSONL からの取り込みはファイルごとの取り込み済みバイト位置を記録（何度実行しても重複しない）
+- 時刻は記録の fetched_at（note_stats_v3.jsonl）。fetched_at の無い記録（raw_notes_*.jsonl など）は取り込まない
+  （ファイルの更新時刻などで補うと、取り込む順番で残る観測が変わってしまう）
+
+使用方法:
+    store = get_engagement_store()
+    store.ingest_jsonl(Path("data/note_stats_v3.jsonl"))   # collect_power_data_v3 --refresh-stats が自動で実行
+    store.gains(days=7)                        # {note_id: 7日間で増えたスキ数}
+    store.series(note_id, start, end)          # [Observation, ...]
+
+    python engagement_store.py ingest data/note_stats_v3.jsonl
+    python engagement_store.py gains --days 7 --top 20
+    python engagement_store.py bench --notes 10000 --observations 30
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ============================================================
+# 設定
+# ============================================================
+
+ENGAGEMENT_CONFIG = {
+    "path": Path("data") / "engagement.sqlite",
+}
+
+# ============================================================
+# 符号化
+# ============================================================
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def encode_deltas(values: Iterable[int], out: bytearray):
+    """差分値を ZigZag + varint で out に追記"""
+    for value in values:
+        n = _zigzag(value)
+        while n >= 0x80:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+
+
+def decode_varints(data: bytes) -> List[int]:
+    """varint 列を符号付き整数のリストに復号"""
+    result = []
+    n = shift = 0
+    for byte in data:
+        n |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            result.append(_unzigzag(n))
+            n = shift = 0
+    return result
+
+# ============================================================
+# ストア
+# ============================================================
+
+FIELDS = 4  # 時刻, スキ数, フォロワー数, コメント数
+
+
+@dataclass
+class Observation:
+    """1回の観測"""
+    timestamp: int
+    like_count: int
+    follower_count: int
+    comment_count: int
+
+
+def _decode_series(data: bytes) -> List[Observation]:
+    values = decode_varints(data)
+    observations = []
+    current = [0] * FIELDS
+    for i in range(0, len(values) - FIELDS + 1, FIELDS):
+        for j in range(FIELDS):
+            current[j] += values[i + j]
+        observations.append(Observation(*current))
+    return observations
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        return None
+
+
+class EngagementStore:
+    """記事ごとのエンゲージメント時系列（スレッドセーフ）"""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or ENGAGEMENT_CONFIG["path"])
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS engagement (
+                note_id TEXT PRIMARY KEY,
+                creator_id TEXT,
+                observations INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                last_likes INTEGER NOT NULL,
+                last_followers INTEGER NOT NULL,
+                last_comments INTEGER NOT NULL,
+                data BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_engagement_creator ON engagement(creator_id)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS engagement_sources (
+                path TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    # --------------------------------------------------------
+    # 追記
+    # --------------------------------------------------------
+
+    def _append_locked(self, note_id: str, creator_id: Optional[str], timestamp: int,
+                       likes: int, followers: int, comments: int) -> bool:
+        row = self.conn.execute(
+            "SELECT last_ts, last_likes, last_followers, last_comments, data FROM engagement WHERE note_id = ?",
+            (note_id,)).fetchone()
+        encoded = bytearray()  # 連結すると TEXT になるため、BLOB は Python 側で連結する
+        if row is None:
+            encode_deltas((timestamp, likes, followers, comments), encoded)
+            self.conn.execute("INSERT INTO engagement VALUES (?, ?, 1, ?, ?, ?, ?, ?)",
+                              (note_id, creator_id, timestamp, likes, followers, comments, bytes(encoded)))
+            return True
+        if timestamp <= row[0]:
+            return False  # 同じ時刻以前の観測（取り込み済み）は追記しない
+        encode_deltas((timestamp - row[0], likes - row[1], followers - row[2], comments - row[3]), encoded)
+        self.conn.execute(
+            "UPDATE engagement SET observations = observations + 1, last_ts = ?, last_likes = ?, "
+            "last_followers = ?, last_comments = ?, data = ?, creator_id = COALESCE(creator_id, ?) "
+            "WHERE note_id = ?",
+            (timestamp, likes, followers, comments, row[4] + bytes(encoded), creator_id, note_id))
+        return True
+
+    def append(self, note_id, creator_id, timestamp: int, like_count: int,
+               follower_count: int, comment_count: int = 0) -> bool:
+        """観測を1件追記（既存の最終観測より新しい場合のみ。追記したらTrue）"""
+        with self._lock:
+            added = self._append_locked(str(note_id), str(creator_id) if creator_id else None, int(timestamp),
+                                        int(like_count or 0), int(follower_count or 0), int(comment_count or 0))
+            self.conn.commit()
+            return added
+
+    def ingest_jsonl(self, path: Path) -> int:
+        """収集スクリプトの JSONL（note_stats_v3.jsonl）から前回の続きを取り込む（fetched_at の無い記録は飛ばす）"""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        key = str(path.resolve())
+        size = path.stat().st_size
+        with self._lock:
+            row = self.conn.execute("SELECT offset FROM engagement_sources WHERE path = ?", (key,)).fetchone()
+        offset = row[0] if row and row[0] <= size else 0  # 小さくなったファイルは最初から
+
+        added = untimed = 0
+        with open(path, "rb") as f, self._lock:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # 書きかけの行は次回に回す
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                note_id = record.get("note_id") or record.get("id")
+                if not note_id:
+                    continue
+                timestamp = _parse_timestamp(record.get("fetched_at"))
+                if timestamp is None:
+                    untimed += 1
+                    continue
+                creator_id = record.get("user_urlname") or record.get("user_id")
+                added += self._append_locked(str(note_id), str(creator_id) if creator_id else None, timestamp,
+                                             int(record.get("like_count") or 0),
+                                             int(record.get("follower_count") or 0),
+                                             int(record.get("comment_count") or 0))
+            self.conn.execute("INSERT OR REPLACE INTO engagement_sources VALUES (?, ?)", (key, offset))
+            self.conn.commit()
+        if untimed:
+            print(f"⚠️ {path}: fetched_at の無い{untimed}件は取り込みませんでした")
+        return added
+
+    # --------------------------------------------------------
+    # 検索
+    # --------------------------------------------------------
+
+    def series(self, note_id, start: Optional[int] = None, end: Optional[int] = None) -> List[Observation]:
+        """記事の観測値（start <= 時刻 <= end）"""
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM engagement WHERE note_id = ?", (str(note_id),)).fetchone()
+        if row is None:
+            return []
+        return [o for o in _decode_series(row[0])
+                if (start is None or o.timestamp >= start) and (end is None or o.timestamp <= end)]
+
+    def gains(self, days: float, now: Optional[int] = None, field: str = "like_count",
+              creator_id: Optional[str] = None) -> Dict[str, int]:
+        """期間内の増加量 {note_id: 最新値 - 期間開始時点の値}
+
+        期間開始時点の値は、開始時刻以前の最後の観測（無ければ期間内の最初の観測）。
+        期間内に観測が無い記事は含めない。
+        """
+        now = now if now is not None else int(time.time())
+        since = now - int(days * 86400)
+        index = {"like_count": 1, "follower_count": 2, "comment_count": 3}[field]
+        query = "SELECT note_id, last_ts, data FROM engagement WHERE last_ts >= ?"
+        params: Tuple = (since,)
+        if creator_id is not None:
+            query += " AND creator_id = ?"
+            params += (str(creator_id),)
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        result = {}
+        for note_id, last_ts, data in rows:
+            values = decode_varints(data)
+            baseline = latest = None
+            ts = value = 0
+            for i in range(0, len(values) - FIELDS + 1, FIELDS):
+                ts += values[i]
+                value += values[i + index]
+                if ts > now:
+                    break
+                if ts <= since or baseline is None:
+                    baseline = value
+                latest = value
+            if latest is not None:
+                result[note_id] = latest - baseline
+        return result
+
+    def stats(self) -> Dict:
+        """件数と容量"""
+        with self._lock:
+            notes, observations, blob_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(observations), 0), COALESCE(SUM(LENGTH(data)), 0) "
+                "FROM engagement").fetchone()
+        file_bytes = sum(p.stat().st_size for p in self.path.parent.glob(self.path.name + "*"))
+        return {"notes": notes, "observations": observations, "blob_bytes": blob_bytes,
+                "file_bytes": file_bytes}
+
+    def print_report(self):
+        """件数と1観測あたりの容量を表示"""
+        s = self.stats()
+        if not s["observations"]:
+            return
+        print(f"📈 エンゲージメント時系列: {s['notes']}記事 / {s['observations']}観測, "
+              f"{s['blob_bytes'] / s['observations']:.1f}バイト/観測 "
+              f"(ファイル込み {s['file_bytes'] / s['observations']:.1f}バイト/観測)")
+
+    def close(self):
+        self.conn.close()
+
+
+_store: Optional[EngagementStore] = None
+_store_lock = threading.Lock()
+
+
+def get_engagement_store() -> EngagementStore:
+    """共有ストアを取得（初回呼び出し時に作成）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EngagementStore()
+    return _store
+
+
+def reset_engagement_store():
+    """共有ストアを閉じる（次回の get_engagement_store で開き直す）"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = None
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def run_benchmark(num_notes: int, num_observations: int, seed: int):
+    """1日1回の再収集を模したデータで、JSON行との容量比較と7日間の増加量の検索時間を計測"""
+    rng = random.Random(seed)
+    start_ts = int(datetime(2026, 1, 1).timestamp())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_file = Path(tmp) / "note_stats.jsonl"
+        with open(stats_file, "w", encoding="utf-8") as f:
+            state = {i: [rng.randint(0, 300), rng.randint(10, 3000)] for i in range(num_notes)}
+            for day in range(num_observations):
+                fetched_at = datetime.fromtimestamp(start_ts + day * 86400 + rng.randint(0, 3600))
+                for i, (likes, followers) in state.items():
+                    likes += rng.choice((0, 0, 1, 2, 5))
+                    followers += rng.randint(-2, 6)
+                    state[i] = [likes, followers]
+                    f.write(json.dumps({"note_id": str(100_000_000 + i), "user_id": f"user{i % 2000}",
+                                        "follower_count": followers, "like_count": likes,
+                                        "comment_count": likes // 40,
+                                        "fetched_at": fetched_at.isoformat()}, ensure_ascii=False) + "\n")
+        json_bytes = stats_file.stat().st_size
+
+        store = EngagementStore(Path(tmp) / "engagement.sqlite")
+        started = time.perf_counter()
+        added = store.ingest_jsonl(stats_file)
+        ingest_elapsed = time.perf_counter() - started
+        again = store.ingest_jsonl(stats_file)
+
+        now = start_ts + num_observations * 86400
+        started = time.perf_counter()
+        gains = store.gains(days=7, now=now)
+        query_elapsed = time.perf_counter() - started
+        s = store.stats()
+        store.close()
+
+    print("=" * 60)
+    print(f"📈 エンゲージメント時系列 ベンチマーク（{num_notes}記事 × {num_observations}回）")
+    print("=" * 60)
+    print(f"  取り込み: {added}観測 {ingest_elapsed:.2f}秒 (再実行時の追加 {again}件)")
+    print(f"  JSON行     : {json_bytes / added:6.1f}バイト/観測")
+    print(f"  時系列BLOB : {s['blob_bytes'] / added:6.1f}バイト/観測")
+    print(f"  SQLite全体 : {s['file_bytes'] / added:6.1f}バイト/観測 "
+          f"({json_bytes / s['file_bytes']:.0f}x 小さい)")
+    print(f"  7日間のスキ増加（全{len(gains)}記事）: {query_elapsed * 1000:.0f}ms")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI エンゲージメント時系列ストア")
+    parser.add_argument("command", choices=["ingest", "gains", "bench"])
+    parser.add_argument("paths", nargs="*", default=[str(Path("data") / "note_stats_v3.jsonl")])
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--notes", type=int, default=10000, help="bench: 記事数")
+    parser.add_argument("--observations", type=int, default=30, help="bench: 記事あたりの観測回数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        run_benchmark(args.notes, args.observations, args.seed)
+    elif args.command == "ingest":
+        store = get_engagement_store()
+        for path in map(Path, args.paths):
+            print(f"📥 {path}: {store.ingest_jsonl(path)}観測を追加")
+        store.print_report()
+    else:
+        store = get_engagement_store()
+        gains = store.gains(args.days)
+        print(f"📈 直近{args.days:g}日間のスキ増加 上位{args.top}件")
+        for note_id, gained in sorted(gains.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"  {note_id}: +{gained}")
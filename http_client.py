@@ -0,0 +1,330 @@
+"""
+noteAI 共通HTTPクライアント
+
+全収集スクリプトが共有する requests.Session（コネクションプール + keep-alive）。
+毎回の TCP/TLS ハンドシェイクを省き、リクエストごとのレイテンシと
+接続再利用数を計測する。キャッシュ対象のエンドポイントは response_cache を経由する。
+
+使用方法:
+    import http_client
+    response = http_client.get(url, params=params, headers=HEADERS, timeout=30, limiter=LIMITER)
+    http_client.is_cache_hit(response)   # True ならネットワークに出ていない（レート制限の対象外）
+    http_client.get_cached(url, params)  # 期限内のキャッシュだけで返せる応答（無ければNone）
+    http_client.print_stats()
+
+    python http_client.py bench   # スタブサーバーでハンドシェイク削減効果を計測
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util import make_headers
+
+import response_cache
+
+# ============================================================
+# 設定
+# ============================================================
+
+CLIENT_CONFIG = {
+    "pool_size": 16,        # ホストあたりの最大コネクション数
+    "pool_block": False,    # プール枯渇時に待機するか（False=一時接続を作成）
+    "cache": True,          # creators/contents/searches の応答をキャッシュ
+}
+
+# gzip/deflate に加え、brotli がインストールされていれば br も要求
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# ============================================================
+# 計測
+# ============================================================
+
+@dataclass
+class ClientStats:
+    """HTTPクライアントの計測値"""
+    requests: int = 0
+    new_connections: int = 0
+    bytes_received: int = 0
+    total_latency: float = 0.0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=10000))
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def summary(self) -> Dict:
+        """集計値を辞書で返す"""
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            return ordered[min(int(len(ordered) * p), len(ordered) - 1)] if ordered else 0.0
+
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_rate": self.reused_connections / self.requests if self.requests else 0.0,
+            "bytes_received": self.bytes_received,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "p50_latency": percentile(0.50),
+            "p95_latency": percentile(0.95),
+        }
+
+
+STATS = ClientStats()
+_stats_lock = threading.Lock()
+
+# リクエストごとに呼ばれる観測関数: (エンドポイント種別, ステータス, 秒, バイト数, キャッシュ応答か)
+# 通信エラーはステータス0で通知する（crawl_telemetry が登録）
+_observers: List[Callable[[str, int, float, int, bool], None]] = []
+
+
+def add_observer(observer: Callable[[str, int, float, int, bool], None]):
+    """リクエストの観測関数を登録"""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer: Callable[[str, int, float, int, bool], None]):
+    """観測関数の登録を解除"""
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _notify(url: str, status: int, elapsed: float, size: int, cached: bool):
+    if _observers:
+        endpoint = response_cache.endpoint_type(url) or "other"
+        for observer in list(_observers):
+            observer(endpoint, status, elapsed, size, cached)
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """新規コネクション作成を数える HTTPAdapter"""
+
+    def _instrument(self, pool):
+        if getattr(pool, "_noteai_counted", False):
+            return pool
+        original_new_conn = pool._new_conn
+
+        def counted_new_conn():
+            with _stats_lock:
+                STATS.new_connections += 1
+            return original_new_conn()
+
+        pool._new_conn = counted_new_conn
+        pool._noteai_counted = True
+        return pool
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        return self._instrument(super().get_connection_with_tls_context(*args, **kwargs))
+
+    def get_connection(self, *args, **kwargs):
+        return self._instrument(super().get_connection(*args, **kwargs))
+
+# ============================================================
+# セッション
+# ============================================================
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_custom_adapter: Optional[requests.adapters.BaseAdapter] = None
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    adapter = _custom_adapter or CountingHTTPAdapter(
+        pool_connections=CLIENT_CONFIG["pool_size"],
+        pool_maxsize=CLIENT_CONFIG["pool_size"],
+        pool_block=CLIENT_CONFIG["pool_block"],
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
+
+def get_session() -> requests.Session:
+    """共有セッションを取得（初回呼び出し時に作成）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def configure(**config):
+    """設定を変更してセッションを作り直す"""
+    global _session
+    CLIENT_CONFIG.update(config)
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def install_adapter(adapter: Optional[requests.adapters.BaseAdapter]):
+    """トランスポートを差し替える（録画・再生用。Noneで標準に戻す）"""
+    global _custom_adapter
+    _custom_adapter = adapter
+    configure()
+
+
+def _cached_response(entry: "response_cache.CacheEntry", url: str,
+                     cache_status: str = "HIT") -> requests.Response:
+    """キャッシュエントリから200応答を組み立てる（X-Cache: HIT=キャッシュのみ、REVALIDATED=304で再検証）"""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = entry.body
+    response.headers = CaseInsensitiveDict({"Content-Type": entry.content_type or "application/json",
+                                            "X-Cache": cache_status})
+    response.encoding = "utf-8"
+    return response
+
+
+def get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+        timeout: float = 30, limiter=None, revalidate: bool = False, **kwargs) -> requests.Response:
+    """共有セッションでGETリクエスト（レイテンシを記録、対象エンドポイントはキャッシュ）
+
+    limiter（rate_limiter.AdaptiveRateLimiter）を渡すと、ネットワークに出るときだけ acquire() する。
+    キャッシュのヒットはトークンも待機も使わない。
+    revalidate なら期限内のキャッシュもそのまま返さず、条件付きリクエストでサーバーに確認する
+    （新着記事・最新のスキ数が必要な差分収集・スキ数更新用）。
+    """
+    cache = key = entry = None
+    if CLIENT_CONFIG["cache"]:
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        if response_cache.endpoint_type(full_url):
+            cache = response_cache.get_cache()
+            key = cache.make_key(full_url)
+            entry = cache.lookup(key, revalidate)
+            if entry and entry.fresh and not revalidate:
+                _notify(full_url, 200, 0.0, len(entry.body), True)
+                return _cached_response(entry, full_url)
+            if entry:
+                headers = {**(headers or {}), **entry.validators()}
+
+    if limiter is not None:
+        limiter.acquire()
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        _notify(url, 0, time.perf_counter() - start, 0, False)
+        raise
+    elapsed = time.perf_counter() - start
+    _notify(response.url or url, response.status_code, elapsed, len(response.content), False)
+
+    with _stats_lock:
+        STATS.requests += 1
+        STATS.bytes_received += len(response.content)
+        STATS.total_latency += elapsed
+        STATS.latencies.append(elapsed)
+
+    if cache is not None:
+        if response.status_code == 304 and entry:
+            cache.revalidated(entry, full_url, response.headers)
+            return _cached_response(entry, full_url, "REVALIDATED")
+        if response.status_code == 200:
+            cache.store(key, full_url, response.content, response.headers)
+    return response
+
+
+def get_cached(url: str, params: Optional[Dict] = None) -> Optional[requests.Response]:
+    """期限内のキャッシュだけで返せる応答（ネットワークには出ない。無ければNone）
+
+    get() に limiter を渡せない呼び出し側（トークンを先に予約する非同期版）が、予約の前に確かめる用。
+    """
+    if not CLIENT_CONFIG["cache"]:
+        return None
+    full_url = requests.Request("GET", url, params=params).prepare().url
+    if not response_cache.endpoint_type(full_url):
+        return None
+    cache = response_cache.get_cache()
+    entry = cache.lookup(cache.make_key(full_url))
+    if entry is None or not entry.fresh:
+        return None
+    _notify(full_url, 200, 0.0, len(entry.body), True)
+    return _cached_response(entry, full_url)
+
+
+def is_cache_hit(response: requests.Response) -> bool:
+    """キャッシュだけで返した応答か（サーバーの応答ではないので、レート制限の成功として数えない）"""
+    return response.headers.get("X-Cache") == "HIT"
+
+
+def reset_stats():
+    """計測値をリセット"""
+    global STATS
+    with _stats_lock:
+        STATS = ClientStats()
+
+
+def get_stats() -> Dict:
+    """計測値の集計を取得"""
+    with _stats_lock:
+        return STATS.summary()
+
+
+def print_stats():
+    """計測値を表示"""
+    stats = get_stats()
+    print(f"📡 HTTP: {stats['requests']}リクエスト, "
+          f"新規接続 {stats['new_connections']} / 再利用 {stats['reused_connections']} "
+          f"({stats['reuse_rate']:.0%})")
+    print(f"⏱️ レイテンシ: 平均 {stats['avg_latency'] * 1000:.1f}ms, "
+          f"p50 {stats['p50_latency'] * 1000:.1f}ms, p95 {stats['p95_latency'] * 1000:.1f}ms")
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def run_benchmark(num_requests: int, latency: float):
+    """毎回接続（requests.get）と共有セッションを比較"""
+    from note_stub_server import start_stub_server
+
+    server = start_stub_server(latency=latency)
+    urls = [f"{server.base_url}/v2/creators/stub{i % 50:05d}" for i in range(num_requests)]
+    configure(cache=False)
+
+    try:
+        start = time.perf_counter()
+        for url in urls:
+            requests.get(url, timeout=30)
+        fresh_elapsed = time.perf_counter() - start
+
+        reset_stats()
+        start = time.perf_counter()
+        for url in urls:
+            get(url, timeout=30)
+        pooled_elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print("=" * 60)
+    print(f"📈 接続再利用ベンチマーク（{num_requests}リクエスト, 遅延{latency * 1000:.0f}ms）")
+    print("=" * 60)
+    print(f"  requests.get  : {fresh_elapsed:6.2f}秒 ({fresh_elapsed / num_requests * 1000:.2f}ms/req, 毎回新規接続)")
+    print(f"  共有セッション: {pooled_elapsed:6.2f}秒 ({pooled_elapsed / num_requests * 1000:.2f}ms/req)")
+    print_stats()
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI 共通HTTPクライアント")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    run_benchmark(args.requests, args.latency)
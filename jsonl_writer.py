@@ -0,0 +1,271 @@
+"""
+noteAI JSONL書き込み（バッチ・クラッシュ安全）
+
+記事ごとに open/write/close する代わりに、レコードをバッファして
+件数・サイズ・経過時間のいずれかが上限に達したらまとめて書き込む。
+
+仕組み:
+- 追記専用のファイルディスクリプタに os.write でまとめて書き込み（write回数を計測）
+- checkpoint() でデータを fsync してから、データのバイト位置を含む進捗JSONを
+  一時ファイル → fsync → os.replace で原子的に置き換える
+- 起動時、書きかけの最終行（改行で終わらない行）を切り詰める
+- 進捗に記録した位置より後ろの完全な行は「前回のチェックポイント以降の記録」として数える
+  （または rollback_jsonl で取り消し、進捗とデータを完全に一致させる）
+
+使用方法:
+    with JsonlWriter(RAW_DATA_FILE) as writer:
+        writer.write(record)
+        writer.checkpoint(PROGRESS_FILE, progress)   # progress["data_offset"] を記録
+    writer.print_report()
+
+    python jsonl_writer.py bench --records 100000   # 1件ずつ open/close と比較
+    python jsonl_writer.py recover data/raw_notes_v3.jsonl
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+# ============================================================
+# 設定
+# ============================================================
+
+WRITER_CONFIG = {
+    "max_records": 100,             # この件数たまったら書き込み
+    "max_bytes": 1024 * 1024,       # このサイズたまったら書き込み
+    "max_interval": 5.0,            # 前回の書き込みからこの秒数が経ったら書き込み（次のwrite時に判定）
+    "fsync": True,                  # checkpoint / close で fsync する
+}
+
+# ============================================================
+# 復旧
+# ============================================================
+
+def recover_jsonl(path: Path) -> int:
+    """書きかけの最終行を切り詰める（切り詰めたバイト数を返す）"""
+    path = Path(path)
+    if not path.exists():
+        return 0
+    size = path.stat().st_size
+    if size == 0:
+        return 0
+
+    with open(path, "rb+") as f:
+        # 末尾から最後の改行を探す
+        position = size
+        chunk = 64 * 1024
+        while position > 0:
+            start = max(position - chunk, 0)
+            f.seek(start)
+            data = f.read(position - start)
+            newline = data.rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            position = start
+        else:
+            end = 0
+        if end < size:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return size - end
+
+
+def count_records_after(path: Path, offset: int) -> int:
+    """offset 以降の完全な行数（前回のチェックポイント以降に書かれた記録）"""
+    path = Path(path)
+    if not path.exists() or path.stat().st_size <= offset:
+        return 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return sum(1 for line in f if line.endswith(b"\n"))
+
+
+def rollback_jsonl(path: Path, offset: int) -> int:
+    """チェックポイントの位置より後ろの記録を取り消す（切り詰めたバイト数を返す）"""
+    path = Path(path)
+    if not path.exists() or path.stat().st_size <= offset:
+        return 0
+    size = path.stat().st_size
+    with open(path, "rb+") as f:
+        f.truncate(offset)
+        f.flush()
+        os.fsync(f.fileno())
+    return size - offset
+
+
+def atomic_write_json(path: Path, data, fsync: bool = True, **dump_kwargs):
+    """一時ファイルに書いてから os.replace で置き換える（途中で落ちても旧ファイルが残る）"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# ============================================================
+# 書き込み
+# ============================================================
+
+@dataclass
+class WriterStats:
+    """書き込みの計測値"""
+    records: int = 0
+    batches: int = 0
+    write_calls: int = 0
+    fsync_calls: int = 0
+    bytes_written: int = 0
+    truncated_bytes: int = 0
+
+
+class JsonlWriter:
+    """バッファ付きの追記専用JSONLライター（スレッドセーフ）"""
+
+    def __init__(self, path: Path, max_records: int = None, max_bytes: int = None,
+                 max_interval: float = None, fsync: bool = None):
+        self.path = Path(path)
+        self.max_records = max_records or WRITER_CONFIG["max_records"]
+        self.max_bytes = max_bytes or WRITER_CONFIG["max_bytes"]
+        self.max_interval = max_interval if max_interval is not None else WRITER_CONFIG["max_interval"]
+        self.fsync = fsync if fsync is not None else WRITER_CONFIG["fsync"]
+        self.stats = WriterStats()
+        self._buffer: List[bytes] = []
+        self._buffered_bytes = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.stats.truncated_bytes = recover_jsonl(self.path)
+        if self.stats.truncated_bytes:
+            print(f"🩹 {self.path.name}: 書きかけの最終行を切り詰めました ({self.stats.truncated_bytes}バイト)")
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.offset = os.fstat(self._fd).st_size  # 書き込み済み（バッファを除く）のバイト位置
+        self._last_flush = time.monotonic()
+
+    def write(self, record: Dict):
+        """1レコードを追加（ポリシーに達したらまとめて書き込み）"""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered_bytes += len(line)
+            self.stats.records += 1
+            if (len(self._buffer) >= self.max_records or self._buffered_bytes >= self.max_bytes
+                    or time.monotonic() - self._last_flush >= self.max_interval):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            data = memoryview(b"".join(self._buffer))
+            while data:
+                written = os.write(self._fd, data)
+                self.stats.write_calls += 1
+                data = data[written:]
+            self.offset += self._buffered_bytes
+            self.stats.bytes_written += self._buffered_bytes
+            self.stats.batches += 1
+            self._buffer.clear()
+            self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """バッファを書き込む（OSのページキャッシュまで）"""
+        with self._lock:
+            self._flush_locked()
+
+    def sync(self):
+        """バッファを書き込み、ディスクまで永続化"""
+        with self._lock:
+            self._flush_locked()
+            if self.fsync:
+                os.fsync(self._fd)
+                self.stats.fsync_calls += 1
+
+    def checkpoint(self, progress_path: Path, progress: Dict):
+        """データを永続化してから、データ位置を含む進捗を原子的に保存"""
+        self.sync()
+        progress["data_offset"] = self.offset
+        atomic_write_json(progress_path, progress, fsync=self.fsync, indent=2)
+
+    def close(self):
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def print_report(self):
+        """書き込み回数を表示"""
+        s = self.stats
+        print(f"📝 書き込み: {s.records}件 / write {s.write_calls}回 ({s.batches}バッチ) / "
+              f"fsync {s.fsync_calls}回, {s.bytes_written / 1024:.0f}KB")
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def run_benchmark(num_records: int):
+    """1件ずつ open/write/close（従来）とバッチ書き込みを比較"""
+    record = {"note_id": "0", "title": "フォロワーが少なくてもスキが集まる記事の書き方", "like_count": 120,
+              "follower_count": 80, "power_score": 1.5, "body_preview": "本文" * 100}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.jsonl"
+        start = time.perf_counter()
+        for i in range(num_records):
+            with open(legacy_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**record, "note_id": str(i)}, ensure_ascii=False) + "\n")
+        legacy_elapsed = time.perf_counter() - start
+
+        batched_path = Path(tmp) / "batched.jsonl"
+        start = time.perf_counter()
+        with JsonlWriter(batched_path) as writer:
+            for i in range(num_records):
+                writer.write({**record, "note_id": str(i)})
+                if i % 1000 == 999:
+                    writer.checkpoint(Path(tmp) / "progress.json", {"total_notes": i + 1})
+        batched_elapsed = time.perf_counter() - start
+
+        # 書きかけの行を作って復旧を確認
+        with open(batched_path, "ab") as f:
+            f.write('{"note_id": "torn", "title": "書きかけ'.encode("utf-8"))
+        truncated = recover_jsonl(batched_path)
+        identical = legacy_path.read_bytes() == batched_path.read_bytes()
+
+    print("=" * 60)
+    print(f"📈 JSONL書き込みベンチマーク（{num_records}件）")
+    print("=" * 60)
+    print(f"  従来（1件ずつ open/write/close）: {legacy_elapsed:6.2f}秒, "
+          f"open {num_records}回 / write {num_records}回 / close {num_records}回")
+    print(f"  バッチ書き込み                  : {batched_elapsed:6.2f}秒, "
+          f"write {writer.stats.write_calls}回 / fsync {writer.stats.fsync_calls}回")
+    print(f"  書きかけ行の復旧: {truncated}バイト切り詰め, 内容一致: {'✅' if identical else '❌'}")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI JSONL書き込み")
+    parser.add_argument("command", choices=["bench", "recover"])
+    parser.add_argument("path", nargs="?", help="recover: 対象のJSONLファイル")
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        run_benchmark(args.records)
+    else:
+        truncated = recover_jsonl(Path(args.path))
+        print(f"🩹 {args.path}: {truncated}バイト切り詰め" if truncated else f"✅ {args.path}: 問題なし")
@@ -0,0 +1,248 @@
+"""
+noteAI キーワードスケジューラ（多腕バンディット）
+
+ALL_KEYWORDS を固定順に全ページ巡回する代わりに、キーワードごと・カテゴリごとの
+「1リクエストあたりの採用記事数」を記録し、リクエスト予算を収穫の多いキーワードに配分する。
+
+仕組み:
+- 1回の引き = あるキーワードの検索結果を1ページ取得し、見つかったユーザーを処理
+- カテゴリ選択: 採用記事のカテゴリ比率が CATEGORY_RATIO の目標から最も不足しているカテゴリ
+- キーワード選択: UCB（カテゴリ平均を事前分布とした平均収穫 + 探索ボーナス）
+- 空ページ・重複ページ・最終ページに達したキーワードは以降選ばない
+
+使用方法:
+    scheduler = KeywordScheduler(keywords, CATEGORY_RATIO, budget=500)
+    while (arm := scheduler.next_arm()) is not None:
+        notes = arm.accept(fetch_search_page(arm.keyword, arm.next_start(), 20))
+        accepted = ...   # ユーザーを処理して採用した記事数
+        scheduler.update(arm, accepted, requests_used)
+
+    # オフライン評価（録画済み応答で固定順とバンディットを比較）
+    python keyword_scheduler.py eval --archive fixtures/note_api.jsonl.gz --budget 400
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from search_iterator import SearchPager
+
+# ============================================================
+# 設定
+# ============================================================
+
+SCHEDULER_CONFIG = {
+    "policy": "bandit",     # "bandit" または "fixed"（従来どおり固定順に全ページ）
+    "exploration": 1.0,     # UCBの探索ボーナスの強さ
+    "prior_weight": 3.0,    # カテゴリ平均を何リクエスト分の観測として扱うか
+    "max_pages": 5,         # キーワードあたりの最大検索ページ数
+}
+
+# ============================================================
+# 腕（キーワード）
+# ============================================================
+
+@dataclass
+class KeywordArm:
+    """キーワード1つ分の観測値とページング状態"""
+    category: str
+    keyword: str
+    max_pages: int
+    pulls: int = 0
+    requests: int = 0
+    accepted: int = 0
+
+    def __post_init__(self):
+        self.pager: Optional[SearchPager] = None
+
+    def _get_pager(self) -> SearchPager:
+        if self.pager is None:
+            self.pager = SearchPager(self.keyword, max_pages=self.max_pages)
+        return self.pager
+
+    @property
+    def exhausted(self) -> bool:
+        return self.pager is not None and self.pager.next_start() is None
+
+    def next_start(self) -> int:
+        """次に取得する検索ページの start"""
+        return self._get_pager().next_start()
+
+    def accept(self, payload: Optional[Dict]) -> List[Dict]:
+        """取得した検索ページを渡し、処理すべき記事を受け取る"""
+        return self._get_pager().accept(payload)
+
+
+@dataclass
+class CategoryStats:
+    """カテゴリごとの観測値"""
+    pulls: int = 0
+    requests: int = 0
+    accepted: int = 0
+
+# ============================================================
+# スケジューラ
+# ============================================================
+
+class KeywordScheduler:
+    """リクエスト予算をキーワードに配分する"""
+
+    def __init__(self, keywords: List[Tuple[str, str]], category_ratio: Optional[Dict[str, float]] = None,
+                 budget: Optional[int] = None, policy: str = None, exploration: float = None,
+                 prior_weight: float = None, max_pages: int = None):
+        self.policy = policy or SCHEDULER_CONFIG["policy"]
+        self.budget = budget
+        self.exploration = exploration if exploration is not None else SCHEDULER_CONFIG["exploration"]
+        self.prior_weight = prior_weight if prior_weight is not None else SCHEDULER_CONFIG["prior_weight"]
+        max_pages = max_pages or SCHEDULER_CONFIG["max_pages"]
+
+        self.arms = [KeywordArm(category, keyword, max_pages) for category, keyword in keywords]
+        self.categories: Dict[str, CategoryStats] = {arm.category: CategoryStats() for arm in self.arms}
+        self.category_ratio = category_ratio  # None ならカテゴリ比率の制約なし
+        self.pulls = 0
+        self.requests = 0
+        self.accepted = 0
+
+    def _live_arms(self) -> List[KeywordArm]:
+        return [arm for arm in self.arms if not arm.exhausted]
+
+    def _category_mean(self, category: str) -> float:
+        """カテゴリの平均収穫（観測が無ければ全体平均）"""
+        stats = self.categories[category]
+        if stats.requests:
+            return stats.accepted / stats.requests
+        return self.accepted / self.requests if self.requests else 1.0
+
+    def _score(self, arm: KeywordArm) -> float:
+        """UCBスコア = 事前分布付きの平均収穫 + 探索ボーナス"""
+        prior = self._category_mean(arm.category)
+        mean = (arm.accepted + self.prior_weight * prior) / (arm.requests + self.prior_weight)
+        scale = max(self.accepted / self.requests if self.requests else 1.0, 1e-3)
+        bonus = self.exploration * scale * math.sqrt(math.log(self.pulls + 1) / (arm.pulls + 1))
+        return mean + bonus
+
+    def _choose_category(self, live: List[KeywordArm]) -> Optional[str]:
+        """採用記事の比率が目標から最も不足しているカテゴリ"""
+        if not self.category_ratio:
+            return None
+        live_categories = {arm.category for arm in live}
+        total_target = sum(self.category_ratio.get(c, 0.0) for c in live_categories) or 1.0
+
+        def deficit(category: str) -> float:
+            target = self.category_ratio.get(category, 0.0) / total_target
+            share = self.categories[category].accepted / self.accepted if self.accepted else 0.0
+            return target - share
+
+        return max(sorted(live_categories), key=deficit)
+
+    def next_arm(self) -> Optional[KeywordArm]:
+        """次に引くキーワード（予算切れ・全キーワード終了ならNone）"""
+        if self.budget is not None and self.requests >= self.budget:
+            return None
+        live = self._live_arms()
+        if not live:
+            return None
+        if self.policy == "fixed":
+            return live[0]
+
+        category = self._choose_category(live)
+        candidates = [arm for arm in live if category is None or arm.category == category]
+        return max(candidates, key=self._score)
+
+    def update(self, arm: KeywordArm, accepted: int, requests: int):
+        """引いた結果（採用記事数・使ったリクエスト数）を記録"""
+        requests = max(requests, 1)
+        stats = self.categories[arm.category]
+        for target in (arm, stats):
+            target.pulls += 1
+            target.requests += requests
+            target.accepted += accepted
+        self.pulls += 1
+        self.requests += requests
+        self.accepted += accepted
+
+    def print_report(self, top: int = 5):
+        """カテゴリ別の配分と収穫を表示"""
+        rate = self.accepted / self.requests if self.requests else 0.0
+        print(f"🎰 スケジューラ({self.policy}): {self.pulls}回 / {self.requests}リクエスト → "
+              f"採用 {self.accepted}記事 ({rate:.2f}記事/リクエスト)")
+        for category, stats in self.categories.items():
+            share = stats.accepted / self.accepted if self.accepted else 0.0
+            target = f" (目標 {self.category_ratio.get(category, 0.0):.0%})" if self.category_ratio else ""
+            print(f"  {category:>20}: {stats.requests:5d}リクエスト, 採用 {stats.accepted:5d} "
+                  f"= {share:4.0%}{target}")
+        pulled = sorted((a for a in self.arms if a.requests), key=lambda a: a.accepted / a.requests,
+                        reverse=True)
+        if pulled:
+            best = ", ".join(f"{a.keyword}({a.accepted / a.requests:.2f})" for a in pulled[:top])
+            print(f"  上位キーワード: {best}")
+
+# ============================================================
+# オフライン評価
+# ============================================================
+
+def evaluate(archive: Path, budget: int, num_keywords: Optional[int], latency: float, seed: int):
+    """録画済み応答を再生し、同じ予算で固定順とバンディットの収穫を比較"""
+    import http_client
+    import collect_power_data_custom as custom
+    from creator_store import reset_creator_store
+    from note_merge import reset_note_labels
+    from rate_limiter import AdaptiveRateLimiter
+    from replay_transport import ReplayAdapter
+
+    saved = (custom.ALL_KEYWORDS, custom.LIMITER)
+    if num_keywords:
+        custom.ALL_KEYWORDS = custom.ALL_KEYWORDS[:num_keywords]
+    http_client.configure(cache=False)
+
+    results = {}
+    cwd = os.getcwd()
+    try:
+        for policy in ("fixed", "bandit"):
+            adapter = ReplayAdapter(archive, latency=latency, seed=seed)
+            http_client.install_adapter(adapter)
+            custom.LIMITER = AdaptiveRateLimiter(rate=1000.0, min_rate=1.0, max_rate=1000.0)
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                reset_creator_store()
+                reset_note_labels()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    scheduler = custom.collect_data_scheduled(budget=budget, policy=policy)
+                os.chdir(cwd)
+            results[policy] = scheduler
+    finally:
+        os.chdir(cwd)
+        http_client.install_adapter(None)
+        custom.ALL_KEYWORDS, custom.LIMITER = saved
+
+    print("=" * 60)
+    print(f"📈 キーワードスケジューラ オフライン評価（予算 {budget}リクエスト）")
+    print("=" * 60)
+    for scheduler in results.values():
+        scheduler.print_report()
+    fixed, bandit = results["fixed"], results["bandit"]
+    if fixed.accepted:
+        print(f"\n  採用記事数: 固定順 {fixed.accepted} → バンディット {bandit.accepted} "
+              f"({bandit.accepted / fixed.accepted:.2f}x)")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI キーワードスケジューラ")
+    parser.add_argument("command", choices=["eval"])
+    parser.add_argument("--archive", default=str(Path("fixtures") / "note_api.jsonl.gz"))
+    parser.add_argument("--budget", type=int, default=400, help="リクエスト予算")
+    parser.add_argument("--keywords", type=int, default=None, help="使用するキーワード数（既定: 全部）")
+    parser.add_argument("--latency", type=float, default=0.0, help="再生時の応答遅延（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    evaluate(Path(args.archive).resolve(), args.budget, args.keywords, args.latency, args.seed)
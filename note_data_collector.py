@@ -9,7 +9,8 @@ note特化型AI開発プロジェクト - Phase 1: データ収集スクリプ
 使用方法:
 1. TARGET_USERSにユーザーIDを追加
 2. スクリプトを実行
-3. note_data.csvが生成される
+3. note_data.csv（fmt="arrow" / "parquet" ならその形式）が生成される
+   （ユーザー1人分ごとに追記されるので、途中で止まっても収集済みの行は残る）
 
 注意事項:
 - アクセス間隔を守ること（サーバー負荷軽減）
@@ -18,8 +19,8 @@ note特化型AI開発プロジェクト - Phase 1: データ収集スクリプ
 
 import time
 
-import pandas as pd
-import requests
+import http_client
+from columnar_writer import NOTE_SCHEMA, ColumnarWriter, RunningSummary, output_path
 
 # ==========================================
 # 設定エリア（ここを変更）
@@ -68,7 +69,7 @@ def verify_api_exists(test_user_id: str = "note") -> dict:
     print(f"\n[1] プロフィールAPI: {url_profile}")
 
     try:
-        res = requests.get(url_profile, headers=HEADERS, timeout=10)
+        res = http_client.get(url_profile, headers=HEADERS, timeout=10)
         print(f"    ステータスコード: {res.status_code}")
 
         if res.status_code == 200:
@@ -95,7 +96,7 @@ def verify_api_exists(test_user_id: str = "note") -> dict:
     print(f"\n[2] 記事一覧API: {url_contents}")
 
     try:
-        res = requests.get(url_contents, headers=HEADERS, timeout=10)
+        res = http_client.get(url_contents, headers=HEADERS, timeout=10)
         print(f"    ステータスコード: {res.status_code}")
 
         if res.status_code == 200:
@@ -137,152 +138,151 @@ def verify_api_exists(test_user_id: str = "note") -> dict:
 # ==========================================
 # メインのデータ収集関数
 # ==========================================
-def collect_note_data(user_ids: list) -> pd.DataFrame:
+def collect_note_data(user_ids: list, output_file: str = "note_data.csv", fmt: str = None) -> RunningSummary:
     """
     指定したユーザーIDリストから記事データを収集する。
     インフルエンサー（フォロワー数が閾値以上）は自動でスキップ。
+    記事はユーザー1人分ごとに output_file に書き出し（形式は columnar_writer）、集計を返す。
     """
     if not user_ids:
         print("エラー: TARGET_USERSが空です。ユーザーIDを追加してください。")
-        return pd.DataFrame()
+        return RunningSummary()
 
-    all_data = []
+    with ColumnarWriter(output_file, NOTE_SCHEMA, fmt) as writer:
+        for idx, user_id in enumerate(user_ids, 1):
+            print(f"\n[{idx}/{len(user_ids)}] @{user_id} を調査中...")
 
-    for idx, user_id in enumerate(user_ids, 1):
-        print(f"\n[{idx}/{len(user_ids)}] @{user_id} を調査中...")
+            # --- A. ユーザー情報を取得（フォロワー数チェック） ---
+            url_profile = f"https://note.com/api/v2/creators/{user_id}"
 
-        # --- A. ユーザー情報を取得（フォロワー数チェック） ---
-        url_profile = f"https://note.com/api/v2/creators/{user_id}"
+            try:
+                res_profile = http_client.get(url_profile, headers=HEADERS, timeout=10)
 
-        try:
-            res_profile = requests.get(url_profile, headers=HEADERS, timeout=10)
+                if res_profile.status_code != 200:
+                    print(
+                        f"    ✗ ユーザーが見つかりません (Status: {res_profile.status_code})"
+                    )
+                    time.sleep(SLEEP_TIME)
+                    continue
 
-            if res_profile.status_code != 200:
-                print(
-                    f"    ✗ ユーザーが見つかりません (Status: {res_profile.status_code})"
-                )
-                time.sleep(SLEEP_TIME)
-                continue
+                data_profile = res_profile.json()["data"]
+                follower_count = data_profile.get("followerCount", 0)
+                nickname = data_profile.get("nickname", user_id)
 
-            data_profile = res_profile.json()["data"]
-            follower_count = data_profile.get("followerCount", 0)
-            nickname = data_profile.get("nickname", user_id)
+                # インフルエンサーならスキップ（API節約）
+                if follower_count > FOLLOWER_THRESHOLD:
+                    print(
+                        f"    → フォロワー{follower_count:,}人のためスキップ（インフルエンサー除外）"
+                    )
+                    time.sleep(SLEEP_TIME)
+                    continue
 
-            # インフルエンサーならスキップ（API節約）
-            if follower_count > FOLLOWER_THRESHOLD:
                 print(
-                    f"    → フォロワー{follower_count:,}人のためスキップ（インフルエンサー除外）"
+                    f"    → フォロワー{follower_count:,}人（{nickname}）。記事を収集中..."
                 )
+
+            except Exception as e:
+                print(f"    ✗ エラー発生: {e}")
                 time.sleep(SLEEP_TIME)
                 continue
 
-            print(
-                f"    → フォロワー{follower_count:,}人（{nickname}）。記事を収集中..."
-            )
-
-        except Exception as e:
-            print(f"    ✗ エラー発生: {e}")
             time.sleep(SLEEP_TIME)
-            continue
-
-        time.sleep(SLEEP_TIME)
-
-        # --- B. 記事一覧を取得 ---
-        page = 1
-        has_next = True
-        user_note_count = 0
-
-        while has_next:
-            url_contents = f"https://note.com/api/v2/creators/{user_id}/contents?kind=note&page={page}"
 
-            try:
-                res_contents = requests.get(url_contents, headers=HEADERS, timeout=10)
-
-                if res_contents.status_code != 200:
+            # --- B. 記事一覧を取得 ---
+            page = 1
+            has_next = True
+            user_note_count = 0
+
+            while has_next:
+                url_contents = f"https://note.com/api/v2/creators/{user_id}/contents?kind=note&page={page}"
+
+                try:
+                    res_contents = http_client.get(url_contents, headers=HEADERS, timeout=10)
+
+                    if res_contents.status_code != 200:
+                        break
+
+                    data_contents = res_contents.json()["data"]
+                    notes = data_contents.get("contents", [])
+
+                    if not notes:
+                        break
+
+                    for note in notes:
+                        title = note.get("name", "")
+                        like_count = note.get("likeCount", 0)
+                        note_key = note.get("key", "")
+                        is_paid = note.get("isPaid", False)
+                        published_at = note.get("publishAt", "")
+
+                        # 実力スコア = スキ数 ÷ フォロワー数
+                        power_score = (
+                            round(like_count / follower_count, 4)
+                            if follower_count > 0
+                            else 0
+                        )
+
+                        writer.write(
+                            {
+                                "user_id": user_id,
+                                "nickname": nickname,
+                                "followers": follower_count,
+                                "title": title,
+                                "likes": like_count,
+                                "power_score": power_score,
+                                "is_paid": is_paid,
+                                "published_at": published_at,
+                                "url": f"https://note.com/{user_id}/n/{note_key}",
+                            }
+                        )
+                        user_note_count += 1
+
+                    # 次のページがあるか確認
+                    if data_contents.get("isLastPage", True):
+                        has_next = False
+                    else:
+                        page += 1
+                        time.sleep(SLEEP_TIME)
+
+                except Exception as e:
+                    print(f"    ✗ 記事取得エラー: {e}")
                     break
 
-                data_contents = res_contents.json()["data"]
-                notes = data_contents.get("contents", [])
-
-                if not notes:
-                    break
-
-                for note in notes:
-                    title = note.get("name", "")
-                    like_count = note.get("likeCount", 0)
-                    note_key = note.get("key", "")
-                    is_paid = note.get("isPaid", False)
-                    published_at = note.get("publishAt", "")
-
-                    # 実力スコア = スキ数 ÷ フォロワー数
-                    power_score = (
-                        round(like_count / follower_count, 4)
-                        if follower_count > 0
-                        else 0
-                    )
-
-                    all_data.append(
-                        {
-                            "user_id": user_id,
-                            "nickname": nickname,
-                            "followers": follower_count,
-                            "title": title,
-                            "likes": like_count,
-                            "power_score": power_score,
-                            "is_paid": is_paid,
-                            "published_at": published_at,
-                            "url": f"https://note.com/{user_id}/n/{note_key}",
-                        }
-                    )
-                    user_note_count += 1
-
-                # 次のページがあるか確認
-                if data_contents.get("isLastPage", True):
-                    has_next = False
-                else:
-                    page += 1
-                    time.sleep(SLEEP_TIME)
-
-            except Exception as e:
-                print(f"    ✗ 記事取得エラー: {e}")
-                break
-
-        print(f"    ✓ {user_note_count}件の記事を取得しました")
-        time.sleep(SLEEP_TIME)
+            # ユーザー1人分を書き出す（途中で止まっても、ここまでの行はファイルに残る）
+            writer.flush()
+            print(f"    ✓ {user_note_count}件の記事を取得しました")
+            time.sleep(SLEEP_TIME)
 
-    return pd.DataFrame(all_data)
+    return writer.summary
 
 
 # ==========================================
 # 結果の分析・保存
 # ==========================================
-def analyze_and_save(df: pd.DataFrame, output_file: str = "note_data.csv"):
+def analyze_and_save(summary: RunningSummary, output_file: str = "note_data.csv", fmt: str = None):
     """
-    収集したデータを分析し、CSVに保存する。
+    収集結果を表示する（記事は collect_note_data が書き出し済み）。
     """
-    if df.empty:
+    if not summary.rows:
         print("データが空です。")
         return
 
     print("\n" + "=" * 50)
     print("【収集結果サマリー】")
     print("=" * 50)
-    print(f"総記事数: {len(df)}件")
-    print(f"ユーザー数: {df['user_id'].nunique()}人")
-    print(f"有料記事数: {df['is_paid'].sum()}件")
+    summary.print_report()
 
     # 実力スコア上位を表示
     print("\n【実力スコア上位10件】（フォロワー比でスキが多い記事）")
-    top_10 = df.nlargest(10, "power_score")[
-        ["title", "likes", "followers", "power_score", "is_paid"]
-    ]
-    print(top_10.to_string(index=False))
+    for row in summary.top()[:10]:
+        print(
+            f"  [{row['power_score']:.4f}] {row['title'][:40]} | スキ: {row['likes']} | "
+            f"フォロワー: {row['followers']} | 有料: {row['is_paid']}"
+        )
 
-    # CSVに保存
-    df.to_csv(output_file, index=False, encoding="utf-8-sig")
-    print(f"\n✓ '{output_file}' に保存しました。")
+    print(f"\n✓ '{output_path(output_file, fmt)}' に保存しました。")
 
-    return df
+    return summary
 
 
 # ==========================================
@@ -300,6 +300,6 @@ if __name__ == "__main__":
         # TARGET_USERSが設定されていれば収集を開始
         if TARGET_USERS:
             print("\n\n")
-            df = collect_note_data(TARGET_USERS)
-            if not df.empty:
-                analyze_and_save(df)
+            summary = collect_note_data(TARGET_USERS)
+            if summary.rows:
+                analyze_and_save(summary)
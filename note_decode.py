@@ -0,0 +1,368 @@
+"""
+noteAI API応答の高速デコード
+
+response.json() で応答全体を辞書に展開する代わりに、収集スクリプトが使うフィールドだけを
+slots 付きの dataclass に取り出す。本文（body）はデコード時に先頭 500 文字に切り詰める。
+
+仕組み:
+- msgspec があれば型付きで直接デコード（不要なフィールドは生成しない）
+- 無ければ orjson（さらに無ければ json）でパースしてから必要なフィールドだけ取り出す
+- フィールド名は API のキーと同じ。get() / [] で辞書と同じように読めるため、
+  build_note_data / CreatorStore / SearchPager などの既存の関数にそのまま渡せる
+- v3 / custom の収集（safe_request / api_request の decode 引数）と crawl_engine が共通で使う
+
+使用方法:
+    page = decode_search_page(response.content)   # SearchPage または None
+    creator = decode_creator(response.content)    # Creator または None
+    notes = decode_contents(response.content)     # List[Note]
+
+    python note_decode.py bench --pages 1000                                 # スタブ生成の応答
+    python note_decode.py bench --archive fixtures/note_api.jsonl.gz         # 録画済みの応答
+"""
+
+import argparse
+import gzip
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+try:
+    import msgspec
+except ImportError:  # msgspec は任意依存
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # orjson は任意依存
+    orjson = None
+
+# ============================================================
+# 設定
+# ============================================================
+
+DECODE_CONFIG = {
+    "body_chars": 500,      # 本文はこの文字数だけ保持（収集スクリプトの最大プレビュー長）
+}
+
+BACKEND = "msgspec" if msgspec else "orjson" if orjson else "json"
+
+# ============================================================
+# 型
+# ============================================================
+
+def _get(self, key: str, default=None):
+    """dict.get と同じ読み方（値が無いフィールドは default）"""
+    value = getattr(self, key, None)
+    return default if value is None else value
+
+
+def _getitem(self, key: str):
+    value = getattr(self, key, None)
+    if value is None:
+        raise KeyError(key)
+    return value
+
+
+@dataclass(slots=True)
+class User:
+    """検索結果・記事に含まれる著者"""
+    id: Union[int, str, None] = None
+    urlname: Optional[str] = None
+    nickname: Optional[str] = None
+    followerCount: Optional[int] = None
+
+    get = _get
+    __getitem__ = _getitem
+
+
+@dataclass(slots=True)
+class Note:
+    """記事（検索結果・/contents 共通）"""
+    id: Union[int, str, None] = None
+    key: Optional[str] = None
+    name: Optional[str] = None
+    likeCount: Optional[int] = None
+    commentCount: Optional[int] = None
+    publishAt: Optional[str] = None
+    body: Optional[str] = None
+    user: Optional[User] = None
+
+    get = _get
+    __getitem__ = _getitem
+
+
+@dataclass(slots=True)
+class Creator:
+    """/v2/creators/{urlname} のクリエイター情報"""
+    id: Union[int, str, None] = None
+    urlname: Optional[str] = None
+    nickname: Optional[str] = None
+    followerCount: Optional[int] = None
+    noteCount: Optional[int] = None
+
+    get = _get
+    __getitem__ = _getitem
+
+
+@dataclass(slots=True)
+class SearchPage:
+    """/v3/searches の記事検索結果1ページ"""
+    contents: List[Note] = field(default_factory=list)
+    isLastPage: Optional[bool] = None
+
+    get = _get
+    __getitem__ = _getitem
+
+
+@dataclass(slots=True)
+class ContentsPage:
+    """/v2/creators/{urlname}/contents の1ページ"""
+    contents: List[Note] = field(default_factory=list)
+    isLastPage: Optional[bool] = None
+
+# msgspec 用の応答全体の型（data 以下の必要な階層だけ）
+
+@dataclass(slots=True)
+class _SearchData:
+    notes: Optional[SearchPage] = None
+
+
+@dataclass(slots=True)
+class _SearchResponse:
+    data: Optional[_SearchData] = None
+
+
+@dataclass(slots=True)
+class _CreatorResponse:
+    data: Optional[Creator] = None
+
+
+@dataclass(slots=True)
+class _ContentsResponse:
+    data: Optional[ContentsPage] = None
+
+# ============================================================
+# デコード
+# ============================================================
+
+def _loads(body: Union[bytes, str]):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _user_from_dict(d) -> Optional[User]:
+    if not isinstance(d, dict):
+        return None
+    return User(d.get("id"), d.get("urlname"), d.get("nickname"), d.get("followerCount"))
+
+
+def _note_from_dict(d: Dict, body_chars: int) -> Note:
+    body = d.get("body")
+    return Note(d.get("id"), d.get("key"), d.get("name"), d.get("likeCount"), d.get("commentCount"),
+                d.get("publishAt"), body[:body_chars] if body else body, _user_from_dict(d.get("user")))
+
+
+def _truncate_bodies(notes: List[Note]) -> List[Note]:
+    """msgspec でデコードした記事の本文を切り詰める"""
+    body_chars = DECODE_CONFIG["body_chars"]
+    for note in notes:
+        if note.body:
+            note.body = note.body[:body_chars]
+    return notes
+
+
+def _data(body: Union[bytes, str]) -> Optional[Dict]:
+    try:
+        payload = _loads(body)
+    except ValueError:
+        return None
+    data = payload.get("data") if isinstance(payload, dict) else None
+    return data if isinstance(data, dict) else None
+
+
+if msgspec is not None:
+    _decoders = {
+        "search": msgspec.json.Decoder(_SearchResponse),
+        "creator": msgspec.json.Decoder(_CreatorResponse),
+        "contents": msgspec.json.Decoder(_ContentsResponse),
+    }
+
+
+def _typed(kind: str, body: Union[bytes, str]):
+    """msgspec で型付きデコード（型が合わない応答は None → 汎用パスで再試行）"""
+    try:
+        return _decoders[kind].decode(body)
+    except (msgspec.DecodeError, msgspec.ValidationError):
+        return None
+
+
+def decode_search_page(body: Union[bytes, str]) -> Optional[SearchPage]:
+    """検索応答から記事一覧のページを取り出す（記事検索結果が無ければNone）"""
+    if msgspec is not None:
+        response = _typed("search", body)
+        if response is not None:
+            if response.data is None or response.data.notes is None:
+                return None
+            _truncate_bodies(response.data.notes.contents)
+            return response.data.notes
+    data = _data(body)
+    notes = data.get("notes") if data else None
+    if not isinstance(notes, dict) or "contents" not in notes:
+        return None
+    body_chars = DECODE_CONFIG["body_chars"]
+    return SearchPage([_note_from_dict(n, body_chars) for n in notes["contents"] or []],
+                      notes.get("isLastPage"))
+
+
+def decode_creator(body: Union[bytes, str]) -> Optional[Creator]:
+    """クリエイター応答を取り出す"""
+    if msgspec is not None:
+        response = _typed("creator", body)
+        if response is not None:
+            return response.data
+    data = _data(body)
+    if data is None:
+        return None
+    return Creator(data.get("id"), data.get("urlname"), data.get("nickname"),
+                   data.get("followerCount"), data.get("noteCount"))
+
+
+def decode_contents(body: Union[bytes, str]) -> List[Note]:
+    """記事一覧応答から記事を取り出す"""
+    if msgspec is not None:
+        response = _typed("contents", body)
+        if response is not None:
+            return _truncate_bodies(response.data.contents) if response.data else []
+    data = _data(body)
+    if not data or "contents" not in data:
+        return []
+    body_chars = DECODE_CONFIG["body_chars"]
+    return [_note_from_dict(n, body_chars) for n in data["contents"] or []]
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _kind(url: str) -> Optional[str]:
+    path = urlsplit(url).path
+    if path.endswith("/v3/searches"):
+        return "search"
+    if path.endswith("/contents"):
+        return "contents"
+    if "/v2/creators/" in path:
+        return "creator"
+    return None
+
+
+def _legacy_decode(kind: str, body: bytes):
+    """従来方式: response.json() 相当で全体を辞書に展開"""
+    data = json.loads(body).get("data")
+    if kind == "search":
+        return data.get("notes", {})
+    if kind == "contents":
+        return data.get("contents", [])
+    return data
+
+
+def _probe(mode: str, pages_file: str):
+    """子プロセスでページ群をデコードし、結果を保持したまま CPU時間・増加RSS を出力"""
+    with open(pages_file, "r", encoding="utf-8") as f:
+        pages = [(record["kind"], record["body"].encode("utf-8")) for record in map(json.loads, f)]
+    typed = {"search": decode_search_page, "creator": decode_creator, "contents": decode_contents}
+
+    baseline = _rss_mb()
+    start = time.process_time()
+    if mode == "legacy":
+        results = [_legacy_decode(kind, body) for kind, body in pages]
+    else:
+        results = [typed[kind](body) for kind, body in pages]
+    cpu = time.process_time() - start
+    print(json.dumps({"cpu": cpu, "rss_mb": _rss_mb() - baseline, "pages": len(results)}))
+
+
+def _write_pages(path: Path, num_pages: int, archive: Optional[Path], body_length: int) -> int:
+    """ベンチマーク用の応答ページを書き出す（録画済みアーカイブ、無ければスタブ生成）"""
+    pages = []
+    if archive:
+        with gzip.open(archive, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                kind = _kind(record["url"])
+                if kind and record.get("status") == 200 and "body" in record:
+                    pages.append({"kind": kind, "body": record["body"]})
+    else:
+        from note_stub_server import contents_payload, make_creator, search_payload
+        for i in range(num_pages):
+            urlname = f"stub{i:05d}"
+            kind = ("search", "creator", "contents")[i % 3]
+            if kind == "search":
+                payload = search_payload(f"キーワード{i}", 0, 20)
+            elif kind == "creator":
+                payload = {"data": make_creator(urlname)}
+            else:
+                payload = contents_payload(urlname, 1)
+                for note in payload["data"]["contents"]:
+                    note["body"] = ("本文" * body_length)[:body_length]  # 実際の記事に近い本文長
+            pages.append({"kind": kind, "body": json.dumps(payload, ensure_ascii=False)})
+
+    # 指定ページ数になるまで繰り返す
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(num_pages):
+            f.write(json.dumps(pages[i % len(pages)], ensure_ascii=False) + "\n")
+    return len(pages)
+
+
+def run_benchmark(num_pages: int, archive: Optional[Path], body_length: int):
+    """json + 辞書（従来）と型付きデコードの CPU時間・増加RSS を比較"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pages_file = Path(tmp) / "pages.jsonl"
+        distinct = _write_pages(pages_file, num_pages, archive, body_length)
+        results = {}
+        for mode in ("legacy", "typed"):
+            output = subprocess.run([sys.executable, __file__, "_probe", mode, str(pages_file)],
+                                    check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+        size_mb = pages_file.stat().st_size / 1024 / 1024
+
+    per = 1000 / num_pages
+    print("=" * 60)
+    print(f"📈 デコードベンチマーク（{num_pages}ページ, 異なる応答 {distinct}件, 約{size_mb:.0f}MB）")
+    print("=" * 60)
+    for label, mode in (("json + 辞書（従来）", "legacy"), (f"型付き（{BACKEND}）", "typed")):
+        r = results[mode]
+        print(f"  {label:<20}: CPU {r['cpu'] * per * 1000:7.1f}ms / 1000ページ, "
+              f"RSS +{r['rss_mb'] * per:6.1f}MB / 1000ページ")
+    legacy, typed = results["legacy"], results["typed"]
+    if typed["cpu"]:
+        print(f"  CPU: {legacy['cpu'] / typed['cpu']:.1f}x, "
+              f"RSS: {legacy['rss_mb'] / max(typed['rss_mb'], 0.1):.1f}x 削減")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_probe":
+        _probe(*sys.argv[2:4])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="noteAI API応答の高速デコード")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--archive", default=None, help="録画済みアーカイブ（既定: スタブで生成）")
+    parser.add_argument("--body-length", type=int, default=3000, help="スタブ生成時の本文の文字数")
+    args = parser.parse_args()
+
+    run_benchmark(args.pages, Path(args.archive).resolve() if args.archive else None, args.body_length)
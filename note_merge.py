@@ -0,0 +1,304 @@
+"""
+noteAI 記事単位のマージ（複数キーワードのラベル付け）
+
+同じ記事が複数のキーワード（「NISA」「新NISA」「投資初心者」など）から見つかった場合に、
+category / keyword だけが違うほぼ同じ行を重ねて保存する代わりに、記事を1行だけ保存し、
+見つかったキーワード・カテゴリを集合として持たせる。
+
+仕組み:
+- 記事IDごとの (カテゴリ, キーワード) を SQLite（data/note_labels.sqlite）に記録
+  （検索結果に出ただけの記事も記録。収集スクリプト間で共有）
+- 書き込み時: 記事を1回だけ書き、その時点のラベルを keywords / categories に入れる
+  （既存の category / keyword は最初に見つかったものとして残す）
+- compact: 既存の raw_notes_*.jsonl を記事IDでまとめ、重複行とラベルストアのラベルを統合
+
+使用方法:
+    labels = get_note_labels()
+    labels.add(note_id, category, keyword)            # 検索結果・記事取得のたびに
+    record.update(labels.label_fields(note_id))       # 書き込み直前
+
+    python note_merge.py compact data/raw_notes_custom.jsonl            # → *.merged.jsonl
+    python note_merge.py compact data/raw_notes_v3.jsonl --in-place     # 置き換え（収集停止中に）
+    python note_merge.py bench --records 20000 --duplicates 0.3         # 容量・データ準備時間の削減
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from jsonl_writer import JsonlWriter, atomic_write_json
+
+# ============================================================
+# 設定
+# ============================================================
+
+MERGE_CONFIG = {
+    "path": Path("data") / "note_labels.sqlite",
+    # in-place でまとめたとき data_offset を合わせる進捗ファイル
+    "progress_files": {
+        "raw_notes_custom.jsonl": "collection_progress_custom.json",
+        "raw_notes_v3.jsonl": "collection_progress_v3.json",
+    },
+}
+
+
+def note_key(record: Dict) -> str:
+    """記事ID（v3 は note_id、custom は id）"""
+    return str(record.get("note_id") or record.get("id") or "")
+
+# ============================================================
+# ラベルストア
+# ============================================================
+
+class NoteLabels:
+    """記事ID → (カテゴリ, キーワード) の集合（スレッドセーフ）"""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or MERGE_CONFIG["path"])
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS note_labels (
+                note_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                PRIMARY KEY (note_id, category, keyword)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def add(self, note_id, category: str, keyword: str) -> bool:
+        """ラベルを追加（新しいラベルならTrue）"""
+        if not note_id:
+            return False
+        with self._lock:
+            cursor = self.conn.execute("INSERT OR IGNORE INTO note_labels VALUES (?, ?, ?)",
+                                       (str(note_id), category or "", keyword or ""))
+            self.conn.commit()
+            return cursor.rowcount == 1
+
+    def add_many(self, labels: List[Tuple[str, str, str]]):
+        """まとめて追加"""
+        with self._lock:
+            self.conn.executemany("INSERT OR IGNORE INTO note_labels VALUES (?, ?, ?)",
+                                  [(str(n), c or "", k or "") for n, c, k in labels if n])
+            self.conn.commit()
+
+    def labels(self, note_id) -> Tuple[List[str], List[str]]:
+        """(カテゴリ一覧, キーワード一覧)"""
+        with self._lock:
+            rows = self.conn.execute("SELECT category, keyword FROM note_labels WHERE note_id = ?",
+                                     (str(note_id),)).fetchall()
+        return sorted({c for c, _ in rows if c}), sorted({k for _, k in rows if k})
+
+    def label_fields(self, note_id) -> Dict[str, List[str]]:
+        """記事の行に追加するフィールド"""
+        categories, keywords = self.labels(note_id)
+        return {"categories": categories, "keywords": keywords}
+
+    def close(self):
+        self.conn.close()
+
+
+_labels: Optional[NoteLabels] = None
+_labels_lock = threading.Lock()
+
+
+def get_note_labels() -> NoteLabels:
+    """共有ラベルストアを取得（初回呼び出し時に作成）"""
+    global _labels
+    if _labels is None:
+        with _labels_lock:
+            if _labels is None:
+                _labels = NoteLabels()
+    return _labels
+
+
+def reset_note_labels():
+    """共有ラベルストアを閉じる（次回の get_note_labels で開き直す）"""
+    global _labels
+    with _labels_lock:
+        if _labels is not None:
+            _labels.close()
+        _labels = None
+
+# ============================================================
+# 統合（compact）
+# ============================================================
+
+def merge_records(records: List[Dict], labels: Optional[NoteLabels] = None) -> Dict:
+    """同じ記事の行を1行にまとめる（最初の行を基に、ラベルを集合で持たせる）"""
+    merged = dict(records[0])
+    categories = set(merged.get("categories") or [])
+    keywords = set(merged.get("keywords") or [])
+    for record in records:
+        categories.update(record.get("categories") or [record.get("category")])
+        keywords.update(record.get("keywords") or [record.get("keyword")])
+    if labels is not None:
+        stored_categories, stored_keywords = labels.labels(note_key(merged))
+        categories.update(stored_categories)
+        keywords.update(stored_keywords)
+    merged["categories"] = sorted(c for c in categories if c)
+    merged["keywords"] = sorted(k for k in keywords if k)
+    return merged
+
+
+def compact(path: Path, output: Optional[Path] = None, labels: Optional[NoteLabels] = None) -> Dict:
+    """JSONLを記事IDでまとめて書き出す（出現順を維持）。統計を返す"""
+    path = Path(path)
+    output = Path(output) if output else path.with_name(path.stem + ".merged.jsonl")
+    groups: Dict[str, List[Dict]] = {}
+    rows = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                continue  # 書きかけの行
+            record = json.loads(line)
+            rows += 1
+            groups.setdefault(note_key(record) or f"__row{rows}", []).append(record)
+
+    tmp = output.with_name(output.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+    multi = 0
+    with JsonlWriter(tmp, max_records=1000) as writer:
+        for records in groups.values():
+            merged = merge_records(records, labels)
+            multi += len(merged["keywords"]) > 1
+            writer.write(merged)
+    os.replace(tmp, output)
+
+    return {"rows": rows, "notes": len(groups), "multi_keyword": multi,
+            "bytes_before": path.stat().st_size if path != output else None,
+            "bytes_after": output.stat().st_size, "output": output}
+
+
+def compact_in_place(path: Path, labels: Optional[NoteLabels] = None) -> Dict:
+    """元のファイルを置き換える（進捗ファイルの data_offset も新しいサイズに合わせる）"""
+    path = Path(path)
+    bytes_before = path.stat().st_size
+    result = compact(path, path, labels)
+    result["bytes_before"] = bytes_before
+
+    progress_name = MERGE_CONFIG["progress_files"].get(path.name)
+    progress_file = path.with_name(progress_name) if progress_name else None
+    if progress_file and progress_file.exists():
+        with open(progress_file, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+        if "data_offset" in progress:
+            progress["data_offset"] = result["bytes_after"]
+            atomic_write_json(progress_file, progress, indent=2)
+    return result
+
+
+def print_compact_report(path: Path, result: Dict):
+    before, after = result["bytes_before"], result["bytes_after"]
+    print(f"🧬 {Path(path).name}: {result['rows']}行 → {result['notes']}記事 "
+          f"(重複 {result['rows'] - result['notes']}行を統合, 複数キーワード {result['multi_keyword']}記事)")
+    print(f"  容量: {before / 1024:.0f}KB → {after / 1024:.0f}KB "
+          f"({1 - after / before if before else 0:.0%}削減) → {result['output']}")
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def _prepare_seconds(raw_file: Path, workdir: Path) -> float:
+    """prepare_training_data_v2.process_data の実行時間"""
+    import prepare_training_data_v2 as prepare
+
+    saved = (prepare.RAW_DATA_FILE, prepare.OUTPUT_DIR, prepare.TRAINING_FILE,
+             prepare.EVOL_INSTRUCT_FILE, prepare.QUALITY_REPORT_FILE)
+    prepare.RAW_DATA_FILE = raw_file
+    prepare.OUTPUT_DIR = workdir
+    prepare.TRAINING_FILE = workdir / "training.jsonl"
+    prepare.EVOL_INSTRUCT_FILE = workdir / "evol.jsonl"
+    prepare.QUALITY_REPORT_FILE = workdir / "report.json"
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            prepare.process_data()
+        return time.perf_counter() - start
+    finally:
+        (prepare.RAW_DATA_FILE, prepare.OUTPUT_DIR, prepare.TRAINING_FILE,
+         prepare.EVOL_INSTRUCT_FILE, prepare.QUALITY_REPORT_FILE) = saved
+
+
+def run_benchmark(num_records: int, duplicate_rate: float, source: Optional[Path], seed: int):
+    """重複行を含むデータを作り、統合前後の容量とデータ準備時間を比較"""
+    rng = random.Random(seed)
+    if source:
+        with open(source, "r", encoding="utf-8") as f:
+            base = [json.loads(line) for line in f if line.endswith("\n")]
+    else:
+        base = [{"id": str(i), "title": f"{'なぜ' if i % 3 == 0 else ''}続けられた{i % 10}つの習慣{i}",
+                 "user_id": str(i % 500), "like_count": 20 + i % 400, "follower_count": 10 + i % 2000,
+                 "power_score": round((20 + i % 400) / (10 + i % 2000), 3), "category": "lifestyle",
+                 "keyword": "習慣化", "body_preview": "本文" * 100}
+                for i in range(num_records)]
+    keywords = ["NISA", "新NISA", "投資初心者", "習慣化", "朝活", "副業"]
+
+    rows = []
+    for record in base:
+        rows.append(record)
+        while rng.random() < duplicate_rate:    # 別のキーワードから同じ記事を収集した行
+            rows.append({**record, "keyword": rng.choice(keywords)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw_file = tmp / "raw_notes.jsonl"
+        with open(raw_file, "w", encoding="utf-8") as f:
+            for record in rows:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        start = time.perf_counter()
+        result = compact(raw_file)
+        compact_elapsed = time.perf_counter() - start
+        prepare_before = _prepare_seconds(raw_file, tmp / "before")
+        prepare_after = _prepare_seconds(result["output"], tmp / "after")
+
+    print("=" * 60)
+    print(f"📈 記事単位マージ ベンチマーク（{len(rows)}行, 重複行 {1 - len(base) / len(rows):.0%}）")
+    print("=" * 60)
+    print_compact_report(raw_file, result)
+    print(f"  統合処理: {compact_elapsed:.2f}秒")
+    print(f"  データ準備（prepare_training_data_v2）: {prepare_before:.2f}秒 → {prepare_after:.2f}秒 "
+          f"({1 - prepare_after / prepare_before:.0%}削減)")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI 記事単位のマージ")
+    parser.add_argument("command", choices=["compact", "bench"])
+    parser.add_argument("paths", nargs="*", default=[str(Path("data") / "raw_notes_custom.jsonl"),
+                                                     str(Path("data") / "raw_notes_v3.jsonl")])
+    parser.add_argument("--in-place", action="store_true", help="compact: 元のファイルを置き換える")
+    parser.add_argument("--records", type=int, default=20000, help="bench: 行数")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="bench: 重複行の割合")
+    parser.add_argument("--source", default=None, help="bench: 元にするJSONL（既定: 合成データ）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        run_benchmark(args.records, args.duplicates, Path(args.source) if args.source else None, args.seed)
+    else:
+        labels = get_note_labels() if MERGE_CONFIG["path"].exists() else None
+        for path in map(Path, args.paths):
+            if not path.exists():
+                print(f"⏭️ {path}: ファイルなし")
+                continue
+            result = compact_in_place(path, labels) if args.in_place else compact(path, labels=labels)
+            print_compact_report(path, result)
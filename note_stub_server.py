@@ -0,0 +1,228 @@
+"""
+noteAI ローカルスタブサーバー
+
+note.com API（/api/v2/creators, /api/v3/searches）の応答形式を模した
+決定論的なローカルサーバー。収集スクリプトのスループット計測に使用する。
+
+使用方法:
+    python note_stub_server.py --port 8765 --latency 0.05
+    → BASE_URL = "http://127.0.0.1:8765/api" で各収集スクリプトを実行
+
+注意事項:
+- 応答内容は urlname / キーワードのハッシュから生成されるため毎回同じ
+- HTTP/1.1 keep-alive に対応（接続再利用の計測用）
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+# ============================================================
+# 設定
+# ============================================================
+
+STUB_CONFIG = {
+    "latency": 0.05,            # 1リクエストあたりの応答遅延（秒）
+    "users_per_keyword": 40,    # キーワードあたりの検索ヒットユーザー数
+    "notes_per_user": 60,       # ユーザーあたりの記事数
+    "contents_page_size": 20,   # /contents の1ページあたり件数
+    "throttle_every": 0,        # N件ごとに429を返す（0=無効）
+    "retry_after": 1,           # 429応答の Retry-After（秒）
+    "search_follower_count": False,  # 検索結果の user にフォロワー数を含める
+    "influencer_skew": False,   # キーワードごとにインフルエンサーの割合を変える（0〜80%）
+}
+
+# ============================================================
+# 決定論的データ生成
+# ============================================================
+
+def _seed(text: str) -> int:
+    """文字列から決定論的なシード値を生成"""
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def make_creator(urlname: str) -> Dict:
+    """クリエイター情報を生成"""
+    seed = _seed(urlname)
+    return {
+        "id": seed % 10_000_000,
+        "urlname": urlname,
+        "nickname": f"ユーザー{urlname[-4:]}",
+        # 0〜3999（フォロワー上限フィルタが効く分布）。"inf" で始まるユーザーはインフルエンサー
+        "followerCount": 10_000 + seed % 90_000 if urlname.startswith("inf") else seed % 4000,
+        "noteCount": STUB_CONFIG["notes_per_user"],
+    }
+
+
+def make_note(urlname: str, index: int) -> Dict:
+    """記事データを生成（indexが小さいほど新しい）"""
+    seed = _seed(f"{urlname}:{index}")
+    day = 28 - (index % 28)
+    return {
+        "id": seed % 100_000_000 + 100_000_000,
+        "key": f"n{seed:08x}",
+        "name": f"{urlname}の記事{index}：{'なぜ' if seed % 3 == 0 else ''}続けられた{seed % 10}つの習慣",
+        "likeCount": seed % 600,
+        "commentCount": seed % 15,
+        "publishAt": f"2025-12-{day:02d}T{seed % 24:02d}:00:00+09:00",
+        "body": "本文" * 200,
+        "price": 500 if seed % 5 == 0 else 0,
+        "user": {"urlname": urlname},
+    }
+
+
+def search_users(keyword: str) -> List[str]:
+    """キーワードに対応する著者urlname一覧を生成"""
+    seed = _seed(keyword)
+    influencer_share = (seed % 5) * 20 if STUB_CONFIG["influencer_skew"] else 0
+    return [
+        f"{'inf' if (i * 37) % 100 < influencer_share else 'stub'}{(seed + i * 7919) % 100_000:05d}"
+        for i in range(STUB_CONFIG["users_per_keyword"])
+    ]
+
+
+def search_payload(keyword: str, start: int, size: int) -> Dict:
+    """/v3/searches の応答を生成"""
+    users = search_users(keyword)
+    contents = []
+    for urlname in users[start:start + size]:
+        note = make_note(urlname, 0)
+        creator = make_creator(urlname)
+        note["user"] = {
+            "id": creator["id"],
+            "urlname": urlname,
+            "nickname": creator["nickname"],
+        }
+        if STUB_CONFIG["search_follower_count"]:
+            note["user"]["followerCount"] = creator["followerCount"]
+        contents.append(note)
+    return {
+        "data": {
+            "notes": {
+                "contents": contents,
+                "isLastPage": start + size >= len(users),
+            }
+        }
+    }
+
+
+def contents_payload(urlname: str, page: int) -> Dict:
+    """/v2/creators/{urlname}/contents の応答を生成"""
+    size = STUB_CONFIG["contents_page_size"]
+    total = STUB_CONFIG["notes_per_user"]
+    start = (page - 1) * size
+    contents = [make_note(urlname, i) for i in range(start, min(start + size, total))]
+    return {"data": {"contents": contents, "isLastPage": start + size >= total}}
+
+# ============================================================
+# HTTPハンドラ
+# ============================================================
+
+class StubHandler(BaseHTTPRequestHandler):
+    """note API スタブのリクエストハンドラ"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # keep-alive時の遅延ACK待ちを回避
+
+    def log_message(self, format, *args):
+        pass
+
+    def route(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, Optional[Dict]]:
+        """パスに応じた応答を返す"""
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        # /api/v3/searches
+        if parts[:3] == ["api", "v3", "searches"]:
+            keyword = query.get("q", [""])[0]
+            start = int(query.get("start", ["0"])[0])
+            size = int(query.get("size", ["20"])[0])
+            return 200, search_payload(keyword, start, size)
+        # /api/v2/creators/{urlname}[/contents]
+        if parts[:3] == ["api", "v2", "creators"] and len(parts) >= 4:
+            urlname = parts[3]
+            if len(parts) == 4:
+                return 200, {"data": make_creator(urlname)}
+            if len(parts) == 5 and parts[4] == "contents":
+                page = int(query.get("page", ["1"])[0])
+                return 200, contents_payload(urlname, page)
+        return 404, None
+
+    def do_GET(self):
+        count = self.server.count_request()
+        if STUB_CONFIG["latency"] > 0:
+            time.sleep(STUB_CONFIG["latency"])
+
+        throttle_every = STUB_CONFIG["throttle_every"]
+        if throttle_every and count % throttle_every == 0:
+            status, payload = 429, None
+        else:
+            parsed = urlparse(self.path)
+            status, payload = self.route(parsed.path, parse_qs(parsed.query))
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload else b""
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", str(STUB_CONFIG["retry_after"]))
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    """リクエスト数を数えるスタブサーバー"""
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, StubHandler)
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def count_request(self) -> int:
+        with self._lock:
+            self.request_count += 1
+            return self.request_count
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+
+def start_stub_server(port: int = 0, **config) -> StubServer:
+    """スタブサーバーをバックグラウンドスレッドで起動"""
+    STUB_CONFIG.update(config)
+    server = StubServer(("127.0.0.1", port))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="note API ローカルスタブサーバー")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=STUB_CONFIG["latency"])
+    parser.add_argument("--throttle-every", type=int, default=0, help="N件ごとに429を返す")
+    parser.add_argument("--influencer-skew", action="store_true",
+                        help="キーワードごとにインフルエンサーの割合を変える")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, latency=args.latency, throttle_every=args.throttle_every,
+                               influencer_skew=args.influencer_skew)
+    print(f"🧪 スタブサーバー起動: {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -14,10 +14,12 @@ from datetime import datetime
 
 import pandas as pd
 
+from columnar_writer import read_table
+
 # ============================================================
 # 設定
 # ============================================================
-INPUT_CSV = "note_power_data.csv"
+INPUT_CSV = "note_power_data.csv"  # collect_power_data の出力（arrow / parquet で書き出したならその拡張子）
 OUTPUT_JSONL = "training_data.jsonl"
 OUTPUT_REPORT = "data_report.txt"
 
@@ -332,7 +334,7 @@ def main():
 
     # 1. データ読み込み
     print("\n[1/5] データ読み込み中...")
-    df = pd.read_csv(INPUT_CSV)
+    df = read_table(INPUT_CSV)
     print(f"  → {len(df)} 件のレコードを読み込み")
 
     # 2. データ分析
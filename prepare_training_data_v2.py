@@ -9,12 +9,28 @@ noteAI データ準備スクリプト v2.0
 - 難易度ラベル付け
 """
 
+import argparse
+import hashlib
 import json
+import multiprocessing
+import os
 import re
+import shutil
+import tempfile
+import time
+import unicodedata
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from analysis_cache import CACHE_CONFIG, AnalysisCache
+
+try:
+    import numpy as np
+except ImportError:  # numpy は任意依存（一括の文字種集計だけで使う）
+    np = None
 
 # ============================================================
 # 設定
@@ -43,6 +59,12 @@ QUALITY_CONFIG = {
     ],
 }
 
+# 並列処理（--workers）
+PARALLEL_CONFIG = {
+    "workers": 1,                # 1 なら直列
+    "shards_per_worker": 4,      # 入力をワーカー数 × これだけのバイト範囲に分ける（偏りの吸収）
+}
+
 # タイトルパターン分類
 TITLE_PATTERNS = {
     "question": r"[？\?]$|^なぜ|^どうして|^どう|とは\？",
@@ -57,6 +79,26 @@ TITLE_PATTERNS = {
     "quotation": r"^「|^『|」$|』$",
 }
 
+# フック要素（detect_hooks の判定順）
+EMOTIONAL_WORDS = ["本当に", "マジで", "ガチで", "めちゃくちゃ", "超", "最強", "神"]
+NEGATIVE_WORDS = ["やめた", "辞めた", "しない", "捨てた", "やらない", "失敗"]
+HOOK_PATTERNS = {
+    "uses_numbers": r"\d+",
+    "uses_brackets": r"【|】|「|」|『|』",
+    "emotional_language": "|".join(map(re.escape, EMOTIONAL_WORDS)),
+    "negative_hook": "|".join(map(re.escape, NEGATIVE_WORDS)),
+    "shows_transformation": r"になった|できた|変わった|達成",
+    "exclusivity": r"だけ|のみ|限定|秘密",
+}
+
+# 分析器のバージョン（analyze_title の結果のキャッシュのキーに含める）
+ANALYZER_LOGIC_VERSION = 2  # 規則表以外の判定（文字種・品質スコア・難易度）やキャッシュの形式を変えたら上げる
+
+def analyzer_version() -> str:
+    """規則表と ANALYZER_LOGIC_VERSION のハッシュ（規則を変えるとキャッシュが自動で無効になる）"""
+    rules = [ANALYZER_LOGIC_VERSION, list(TITLE_PATTERNS.items()), list(HOOK_PATTERNS.items())]
+    return hashlib.sha256(json.dumps(rules, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
 # ============================================================
 # タイトル分析
 # ============================================================
@@ -99,6 +141,104 @@ def analyze_char_types(text: str) -> Dict[str, int]:
 
     return types
 
+# 文字種（analyze_char_types の辞書と同じ順。一括集計の列の順）
+CHAR_TYPES = ("hiragana", "katakana", "kanji", "number", "symbol", "alphabet")
+CHAR_BATCH_SIZE = 10_000    # 一括集計で1度にコードポイント配列にするタイトル数（CPUキャッシュに収まる程度）
+
+_CHAR_FIELD_BITS = 10   # 一括集計で文字種ごとの件数を詰める1つの int64 内のビット幅
+_char_class_table = None
+_char_weight_table = None
+
+def _char_class_table_path() -> Path:
+    """文字種表の保存先（Unicode のバージョンと列の順ごと。バイトコードと同じ __pycache__ に置く）"""
+    return (Path(__file__).resolve().parent / "__pycache__"
+            / f"char_classes.{unicodedata.unidata_version}.{'-'.join(CHAR_TYPES)}.npy")
+
+def _build_char_class_table():
+    """コードポイント → 文字種の列番号の表（0x110000要素）を作る"""
+    every_char = np.arange(0x110000, dtype=np.uint32).tobytes().decode("utf-32-le", "surrogatepass")
+    column = {name: i for i, name in enumerate(CHAR_TYPES)}
+    table = np.full(0x110000, column["symbol"], dtype=np.uint8)
+    # analyze_char_types の判定順（範囲 → isdigit → isalpha）になるよう、後の判定ほど先に書く
+    table[np.frombuffer(bytes(map(str.isalpha, every_char)), dtype=bool)] = column["alphabet"]
+    table[np.frombuffer(bytes(map(str.isdigit, every_char)), dtype=bool)] = column["number"]
+    table[0x4E00:0x9FFF + 1] = column["kanji"]
+    table[0x30A0:0x30FF + 1] = column["katakana"]
+    table[0x3040:0x309F + 1] = column["hiragana"]
+    return table
+
+def _get_char_class_table():
+    """コードポイント → 文字種の列番号の表（初回呼び出し時に保存済みの表を読むか、作って保存する）"""
+    global _char_class_table
+    if _char_class_table is None:
+        path = _char_class_table_path()
+        try:
+            table = np.load(path)
+            if table.shape != (0x110000,) or table.dtype != np.uint8:
+                raise ValueError(f"文字種表の形が違います: {path}")
+        except (OSError, ValueError):
+            table = _build_char_class_table()
+            try:
+                path.parent.mkdir(exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".npy", delete=False) as f:
+                    np.save(f, table)
+                os.replace(f.name, path)  # 並列のワーカーが同時に作っても壊れた表を読まない
+            except OSError:
+                pass  # 書き込めない場所では毎回作る
+        _char_class_table = table
+    return _char_class_table
+
+def _get_char_weight_table():
+    """コードポイント → 文字種の位置に1を立てた int64（文字種ごとに _CHAR_FIELD_BITS ビット）"""
+    global _char_weight_table
+    if _char_weight_table is None:
+        shifts = _CHAR_FIELD_BITS * np.arange(len(CHAR_TYPES), dtype=np.int64)
+        _char_weight_table = (np.int64(1) << shifts)[_get_char_class_table()]
+    return _char_weight_table
+
+def analyze_char_types_batch(texts: Iterable[str]) -> "np.ndarray":
+    """複数のタイトルの文字種をまとめてカウント（行: タイトル、列: CHAR_TYPES の順）
+
+    texts はリストのほか pyarrow の列（to_pylist を持つもの）も受け付ける。None は空文字列として数える。
+    各行は analyze_char_types(text) の値と同じ。
+    1文字ごとの重み（文字種の位置に1を立てた int64）をタイトルごとに合計し、文字種ごとの件数に分ける。
+    """
+    if np is None:
+        raise ImportError("analyze_char_types_batch には numpy が必要です（pip install numpy）")
+    if hasattr(texts, "to_pylist"):
+        texts = texts.to_pylist()
+    if not isinstance(texts, list) or None in texts:
+        texts = ["" if text is None else text for text in texts]
+    weights = _get_char_weight_table()
+    classes = _get_char_class_table()
+    shifts = _CHAR_FIELD_BITS * np.arange(len(CHAR_TYPES), dtype=np.int64)
+    field_max = (1 << _CHAR_FIELD_BITS) - 1
+    counts = np.zeros((len(texts), len(CHAR_TYPES)), dtype=np.int64)
+
+    for start in range(0, len(texts), CHAR_BATCH_SIZE):
+        chunk = texts[start:start + CHAR_BATCH_SIZE]
+        codepoints = np.frombuffer("".join(chunk).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        lengths = np.fromiter(map(len, chunk), dtype=np.intp, count=len(chunk))
+        offsets = np.cumsum(lengths) - lengths
+        rows = counts[start:start + len(chunk)]
+        nonempty = lengths > 0
+        if codepoints.size:
+            packed = np.add.reduceat(weights.take(codepoints), offsets[nonempty])
+            rows[nonempty] = (packed[:, None] >> shifts) & field_max
+        # 1つの文字種が field_max 文字を超えうる長い文字列は、桁あふれするので個別に数える
+        for i in np.flatnonzero(lengths > field_max):
+            segment = codepoints[offsets[i]:offsets[i] + lengths[i]]
+            rows[i] = np.bincount(classes[segment], minlength=len(CHAR_TYPES))
+    return counts
+
+def kanji_ratio_bonus_batch(counts: "np.ndarray") -> "np.ndarray":
+    """calculate_quality_score の文字種バランス項（漢字比率 0.2〜0.5 で +0.05）をまとめて計算"""
+    totals = counts.sum(axis=1)
+    kanji = counts[:, CHAR_TYPES.index("kanji")]
+    # 0.2 <= kanji / totals <= 0.5 を整数で判定（totals > 0 のとき浮動小数の比較と同じ結果）
+    in_range = (totals > 0) & (5 * kanji >= totals) & (2 * kanji <= totals)
+    return np.where(in_range, 0.05, 0.0)
+
 def detect_patterns(title: str) -> List[str]:
     """タイトルパターンを検出"""
     detected = []
@@ -112,37 +252,273 @@ def detect_hooks(title: str) -> List[str]:
     hooks = []
 
     # 数字の使用
-    if re.search(r'\d+', title):
+    if re.search(HOOK_PATTERNS["uses_numbers"], title):
         hooks.append("uses_numbers")
 
     # 括弧・記号の使用
-    if re.search(r'【|】|「|」|『|』', title):
+    if re.search(HOOK_PATTERNS["uses_brackets"], title):
         hooks.append("uses_brackets")
 
     # 感情的な表現
-    emotional_words = ["本当に", "マジで", "ガチで", "めちゃくちゃ", "超", "最強", "神"]
-    for word in emotional_words:
+    for word in EMOTIONAL_WORDS:
         if word in title:
             hooks.append("emotional_language")
             break
 
     # ネガティブフック
-    negative_words = ["やめた", "辞めた", "しない", "捨てた", "やらない", "失敗"]
-    for word in negative_words:
+    for word in NEGATIVE_WORDS:
         if word in title:
             hooks.append("negative_hook")
             break
 
     # 変化・結果を示唆
-    if re.search(r"になった|できた|変わった|達成", title):
+    if re.search(HOOK_PATTERNS["shows_transformation"], title):
         hooks.append("shows_transformation")
 
     # 限定性
-    if re.search(r"だけ|のみ|限定|秘密", title):
+    if re.search(HOOK_PATTERNS["exclusivity"], title):
         hooks.append("exclusivity")
 
     return list(set(hooks))
 
+# detect_patterns / detect_hooks は照合の基準実装。analyze_title は同じ結果を1パスで返す TITLE_MATCHER を使う
+
+_REGEX_SPECIAL = set(".^$*+?{}[]()|\\")
+_DIGIT = "\ue000"        # 照合用の文字列で数字（\\d）をまとめる文字
+_START, _END = "\x02", "\x03"   # ^ と $ の位置に置く文字
+_RESERVED = {_DIGIT, _START, _END}
+_COMMON_DIGITS = "0123456789０１２３４５６７８９"  # オートマトンが _DIGIT と同じに扱う数字（それ以外の数字は置き換える）
+_NEEDS_TRANSLATION = re.compile("[%s]|(?![%s])\\d" % ("".join(sorted(_RESERVED)), _COMMON_DIGITS))
+MATCH_CACHE_SIZE = 4096     # TitleMatcher が覚えておく判定結果（ラベルの組み合わせ）の数の上限
+_QUANTIFIER = re.compile(r"\*|\+|\?|\{(\d+)(,(\d*))?\}")
+
+
+def _translation_table() -> Dict[int, str]:
+    """数字を _DIGIT に、タイトル中の予約文字を照合に使わない文字に置き換える表"""
+    table = {cp: _DIGIT for cp in range(0x110000) if chr(cp).isdecimal()}
+    for char in _RESERVED:
+        table[ord(char)] = "\ue001"
+    return table
+
+
+def _parse(alternative: str) -> Optional[List[Tuple[List[str], int, Optional[int]]]]:
+    """正規表現の選択肢を (文字の候補, 最小回数, 最大回数) の並びに分解（扱えない構文はNone）"""
+    atoms = []
+    i = 0
+    while i < len(alternative):
+        char = alternative[i]
+        if char == "\\":
+            if alternative[i + 1:i + 2] == "d":
+                choices = [_DIGIT]
+            elif i + 1 < len(alternative) and not alternative[i + 1].isalnum():
+                choices = [alternative[i + 1]]
+            else:
+                return None
+            i += 2
+        elif char == "[":
+            end = alternative.find("]", i + 1)
+            inner = alternative[i + 1:end].replace("\\", "")
+            if end < 0 or not inner or inner[0] == "^" or "-" in inner:
+                return None
+            choices, i = list(inner), end + 1
+        elif char in _REGEX_SPECIAL:
+            return None
+        else:
+            choices, i = [char], i + 1
+        if any(c.isdecimal() or (c in _RESERVED and c != _DIGIT) for c in choices):
+            return None  # 数字そのものの指定は _DIGIT と区別できない
+        low, high = 1, 1
+        quantifier = _QUANTIFIER.match(alternative, i)
+        if quantifier:
+            text = quantifier.group(0)
+            if text in "*+?":
+                low, high = {"*": (0, None), "+": (1, None), "?": (0, 1)}[text]
+            else:
+                low = int(quantifier.group(1))
+                high = low if quantifier.group(2) is None else int(quantifier.group(3)) if quantifier.group(3) else None
+            i = quantifier.end()
+            if alternative[i:i + 1] in ("?", "+"):
+                return None  # 最短一致・強欲な量指定子
+        atoms.append((choices, low, high))
+    return atoms
+
+
+def _alternative_literals(alternative: str) -> Optional[List[str]]:
+    """選択肢が一致する条件を「照合用の文字列に含まれる文字列のどれか」に直す（直せなければNone）
+
+    re.search では、先頭（^ なし）・末尾（$ なし）の繰り返しは最小回数だけあれば一致するので、そこまで縮める。
+    途中に回数の決まらない繰り返しが残るものは直せない。
+    """
+    start, body, end = _strip_anchors(alternative)
+    atoms = _parse(body)
+    if not atoms:
+        return None
+    if not start:
+        atoms[0] = (atoms[0][0], atoms[0][1], atoms[0][1])
+    if not end:
+        atoms[-1] = (atoms[-1][0], atoms[-1][1], atoms[-1][1])
+    literals = [_START] if start else [""]
+    for choices, low, high in atoms:
+        if high != low:
+            return None
+        for _ in range(low):
+            literals = [prefix + choice for prefix in literals for choice in choices]
+        if len(literals) > 256:
+            return None
+    if end:
+        literals = [text + tail for text in literals for tail in (_END, "\n" + _END)]
+    return literals if all(literals) else None
+
+
+def _strip_anchors(alternative: str) -> Tuple[bool, str, bool]:
+    """選択肢を (^ があるか, 中身, $ があるか) に分ける"""
+    start = alternative.startswith("^")
+    end = alternative.endswith("$") and not alternative.endswith("\\$")
+    return start, alternative[int(start):len(alternative) - int(end)], end
+
+
+def _requires_digit(alternative: str) -> bool:
+    """選択肢に一致するには数字が1文字以上必要か（\\d が最小1回以上。分解できない選択肢は False = 常に判定）"""
+    atoms = _parse(_strip_anchors(alternative)[1])
+    return bool(atoms) and any(choices == [_DIGIT] and low >= 1 for choices, low, _ in atoms)
+
+
+class TitleMatcher:
+    """TITLE_PATTERNS と HOOK_PATTERNS の全ラベルを1パスで判定
+
+    タイトルの数字を1種類の文字にまとめ、前後に ^ / $ の位置を示す文字を付けた照合用の文字列を作り、
+    各規則の選択肢（文字列に直せるもの）をまとめた Aho-Corasick オートマトンで1文字ずつ1回だけ走査する。
+    文字列に直せない選択肢（^\\d+つ など）だけは、ラベルごとにまとめた正規表現で判定する
+    （\\d が必ず1文字以上要るものは数字があるときだけ）。結果は detect_patterns / detect_hooks と同じで、
+    import 時に規則から作った例で確かめる（_check_matcher）。
+    """
+
+    def __init__(self, patterns: Dict[str, str], hooks: Dict[str, str]):
+        rules = list(patterns.values()) + list(hooks.values())
+        self.pattern_bits = [(name, 1 << i) for i, name in enumerate(patterns)]
+        self.hook_bits = [(name, 1 << (len(patterns) + i)) for i, name in enumerate(hooks)]
+        self.digit_bit = 1 << len(rules)
+        self.table = _translation_table()
+        self._results: Dict[int, Tuple[List[str], List[str]]] = {}
+
+        literals: List[Tuple[str, int]] = [(_DIGIT, self.digit_bit)]
+        self.fallbacks: List[Tuple[re.Pattern, int, bool]] = []
+        for i, regex in enumerate(rules):
+            bit = 1 << i
+            # グループや文字クラスの中に「|」がある規則は分けずに正規表現のまま使う
+            splittable = "(" not in regex and "\\|" not in regex and not re.search(r"\[[^\]]*\|", regex)
+            others = []
+            for alternative in regex.split("|") if splittable else [regex]:
+                texts = _alternative_literals(alternative)
+                if texts is None:
+                    others.append(alternative)
+                else:
+                    literals += [(text, bit) for text in texts]
+            if others:
+                needs_digit = all(_requires_digit(alternative) for alternative in others)
+                self.fallbacks.append((re.compile("|".join(others)), bit, needs_digit))
+        self._build_automaton(literals)
+    def _build_automaton(self, literals: List[Tuple[str, int]]):
+        """文字列の選択肢から、遷移表を完全に展開した Aho-Corasick オートマトンを作る"""
+        goto: List[Dict[str, int]] = [{}]
+        output = [0]
+        for text, bit in literals:
+            state = 0
+            for char in text:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append(0)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state] |= bit
+
+        # 幅優先で失敗遷移をたどり、各状態の遷移表と出力に失敗先の分を合わせる
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            output[state] |= output[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0) if state else 0
+                queue.append(child)
+        # よく使う数字は置き換えずにそのまま _DIGIT と同じ遷移にする
+        for transitions in delta:
+            if _DIGIT in transitions:
+                transitions.update(dict.fromkeys(_COMMON_DIGITS, transitions[_DIGIT]))
+        self.delta = delta
+        self.output = output
+
+    def match(self, title: str) -> Tuple[List[str], List[str]]:
+        """(detect_patterns(title), detect_hooks(title)) と同じ結果"""
+        delta, output = self.delta, self.output
+        found = state = 0
+        text = title.translate(self.table) if _NEEDS_TRANSLATION.search(title) else title
+        for char in _START + text + _END:
+            state = delta[state].get(char, 0)
+            found |= output[state]
+        for regex, bit, needs_digit in self.fallbacks:
+            if not found & bit and (found & self.digit_bit or not needs_digit) and regex.search(title):
+                found |= bit
+
+        result = self._results.get(found)
+        if result is None:
+            patterns = [name for name, bit in self.pattern_bits if found & bit]
+            hooks = [name for name, bit in self.hook_bits if found & bit]
+            result = (patterns, list(set(hooks)))
+            if len(self._results) < MATCH_CACHE_SIZE:  # 組み合わせは多くて 2^ラベル数。メモリを一定に保つ
+                self._results[found] = result
+        return list(result[0]), list(result[1])
+
+
+class ReferenceMatcher:
+    """detect_patterns / detect_hooks をそのまま呼ぶ照合（TitleMatcher が規則を正しく扱えないときの代わり）"""
+
+    def match(self, title: str) -> Tuple[List[str], List[str]]:
+        return detect_patterns(title), detect_hooks(title)
+
+
+# 規則から作る例に加える固定の例（省略できる数字・全角数字・改行・境界）
+MATCHER_CHECK_TITLES = [
+    "", "つの話", "3つの方法", "１２つのコツ", "10選", "TOP３", "なぜ私は副業をやめたのか！！",
+    "【保存版】ChatGPTで40時間→3時間になった話", "「習慣」が続かない理由\n", "本当に変わった5つのこと。",
+]
+
+
+def _matcher_samples(rules: Iterable[str]) -> List[str]:
+    """規則の各選択肢から作った一致する文字列（最小回数と1回多いもの）と、その前後に文字を足した例"""
+    samples = list(MATCHER_CHECK_TITLES)
+    for regex in rules:
+        for alternative in regex.split("|"):
+            start, body, end = _strip_anchors(alternative)
+            atoms = _parse(body)
+            if not atoms:
+                continue
+            for extra in (0, 1):
+                core = "".join(("7" if choices == [_DIGIT] else choices[0])
+                               * (low + extra if high is None or low + extra <= high else low)
+                               for choices, low, high in atoms)
+                samples += [core, "前" + core, core + "後", "前" + core + "後", "1" + core, core + "2\n"]
+    return samples
+
+
+def _check_matcher(matcher: TitleMatcher) -> List[str]:
+    """matcher が detect_patterns / detect_hooks と違う判定をした例（空なら一致）"""
+    mismatches = []
+    for title in _matcher_samples(list(TITLE_PATTERNS.values()) + list(HOOK_PATTERNS.values())):
+        patterns, hooks = matcher.match(title)
+        if patterns != detect_patterns(title) or sorted(hooks) != sorted(detect_hooks(title)):
+            mismatches.append(title)
+    return mismatches
+
+
+TITLE_MATCHER = TitleMatcher(TITLE_PATTERNS, HOOK_PATTERNS)
+_MATCHER_MISMATCHES = _check_matcher(TITLE_MATCHER)
+if _MATCHER_MISMATCHES:
+    print(f"⚠️ TITLE_MATCHER が正規表現と違う判定をしました（例: {_MATCHER_MISMATCHES[:3]}）。"
+          f"規則表を確認してください。正規表現で照合します")
+    TITLE_MATCHER = ReferenceMatcher()
+
 def calculate_quality_score(title: str, patterns: List[str], hooks: List[str],
                            char_types: Dict[str, int]) -> float:
     """タイトルの品質スコアを計算"""
@@ -197,8 +573,7 @@ def determine_difficulty(title: str, patterns: List[str], power_score: float) ->
 def analyze_title(title: str, power_score: float = 0.0) -> TitleAnalysis:
     """タイトルを総合分析"""
     char_types = analyze_char_types(title)
-    patterns = detect_patterns(title)
-    hooks = detect_hooks(title)
+    patterns, hooks = TITLE_MATCHER.match(title)
     quality_score = calculate_quality_score(title, patterns, hooks, char_types)
     difficulty = determine_difficulty(title, patterns, power_score)
 
@@ -291,20 +666,8 @@ def should_include(note: Dict) -> bool:
 
     return True
 
-def process_data():
-    """データを処理してEvol-Instruct形式に変換"""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    if not RAW_DATA_FILE.exists():
-        print(f"❌ データファイルが見つかりません: {RAW_DATA_FILE}")
-        return
-
-    print("=" * 60)
-    print("🔄 データ準備 v2.0 開始")
-    print("=" * 60)
-
-    # 統計情報
-    stats = {
+def _new_stats() -> Dict:
+    return {
         "total_raw": 0,
         "filtered_out": 0,
         "success_examples": 0,
@@ -312,73 +675,250 @@ def process_data():
         "categories": Counter(),
         "patterns": Counter(),
         "difficulties": Counter(),
+        "analysis_cached": 0,      # --incremental: キャッシュの結果を使った件数
+        "analysis_computed": 0,    # --incremental: 新しく分析した件数
     }
 
-    training_data = []
-    evol_instruct_data = []
-
-    # データ読み込み
-    with open(RAW_DATA_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                note = json.loads(line)
-                stats["total_raw"] += 1
-
-                # フィルタリング
-                if not should_include(note):
-                    stats["filtered_out"] += 1
-                    continue
-
-                title = note["title"]
-                power_score = note.get("power_score", 0)
-                category = note.get("category", "unknown")
-
-                # タイトル分析
+def _merge_stats(total: Dict, shard: Dict):
+    """シャードの統計を足し込む（入力順に足せば Counter の並びも直列実行と同じになる）"""
+    for key, value in shard.items():
+        if isinstance(value, Counter):
+            total[key].update(value)
+        else:
+            total[key] += value
+
+def shard_ranges(input_file: Path, num_shards: int) -> List[Tuple[int, int]]:
+    """入力ファイルをほぼ同じバイト数の範囲 [start, end) に分ける"""
+    size = input_file.stat().st_size
+    num_shards = max(1, min(num_shards, size))
+    bounds = [size * i // num_shards for i in range(num_shards + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def read_shard(input_file: Path, start: int, end: int) -> Iterator[bytes]:
+    """start <= 行頭 < end の行を返す（範囲の境目で切れた行は、行頭を含むシャードが読む）"""
+    with open(input_file, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()  # start が行の途中なら、その行の残りを読み飛ばす
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+def iter_notes(lines: Iterable[bytes], stats: Dict) -> Iterator[Dict]:
+    """JSONL の行 → フィルタを通った記事"""
+    for line in lines:
+        try:
+            note = json.loads(line)
+            stats["total_raw"] += 1
+
+            # フィルタリング
+            if not should_include(note):
+                stats["filtered_out"] += 1
+                continue
+        except Exception as e:
+            print(f"  ⚠️ エラー: {e}")
+            continue
+        yield note
+
+def _canonical_hooks(hooks: Iterable[str]) -> List[str]:
+    """フックを HOOK_PATTERNS の順に並べる（キャッシュに保存する並び）
+
+    analyze_title のフックの並びは list(set(...)) なので、文字列のハッシュ（PYTHONHASHSEED）で変わる。
+    キャッシュにはこの順で保存し、読むときに同じ順で list(set(...)) に通して、その実行で分析し直した
+    場合と同じ並びに戻す。
+    """
+    found = set(hooks)
+    return [name for name in HOOK_PATTERNS if name in found]
+
+def iter_examples(notes: Iterable[Dict], stats: Dict,
+                  cache: Optional[AnalysisCache] = None) -> Iterator[Tuple[Dict, List[Dict]]]:
+    """記事 → 成功例の (トレーニングデータ, Evol-Instruct形式のバリエーション)。統計は逐次更新
+
+    cache があれば、キャッシュ済みのタイトルは分析せずに保存済みの TitleAnalysis を使う。
+    """
+    if cache is not None:
+        entries = cache.lookup(notes)
+    else:
+        entries = ((note, None, None) for note in notes)
+
+    for note, key, cached in entries:
+        try:
+            title = note["title"]
+            power_score = note.get("power_score", 0)
+            category = note.get("category", "unknown")
+
+            # タイトル分析（キャッシュがあればその結果。analysis_fields は asdict(analysis) と同じ辞書）
+            analysis_fields = None
+            if cached is not None:
+                analysis_fields = json.loads(cached)
+                analysis_fields["hooks"] = list(set(analysis_fields["hooks"]))  # _canonical_hooks の順から戻す
+                analysis = TitleAnalysis(**analysis_fields)
+                stats["analysis_cached"] += 1
+            else:
                 analysis = analyze_title(title, power_score)
-
-                # 統計更新
-                stats["categories"][category] += 1
-                for pattern in analysis.patterns:
-                    stats["patterns"][pattern] += 1
-                stats["difficulties"][analysis.difficulty] += 1
-
-                # 成功例判定（Power Score >= 1.0）
-                if power_score >= QUALITY_CONFIG["min_power_score"]:
-                    stats["success_examples"] += 1
-
-                    # 基本トレーニングデータ
-                    training_entry = {
-                        "title": title,
-                        "category": category,
-                        "power_score": power_score,
-                        "virality_score": note.get("virality_score", 0),
-                        "analysis": asdict(analysis),
-                        "user_nickname": note.get("user_nickname", ""),
-                        "follower_count": note.get("follower_count", 0),
-                        "like_count": note.get("like_count", 0),
-                    }
-                    training_data.append(training_entry)
-
-                    # Evol-Instruct形式
-                    variants = create_instruction_variants(
-                        title, analysis, category, power_score
-                    )
-                    for variant in variants:
-                        evol_instruct_data.append(variant)
-                        stats["evol_instruct_count"] += 1
-
-            except Exception as e:
-                print(f"  ⚠️ エラー: {e}")
+                if cache is not None:
+                    analysis_fields = asdict(analysis)
+                    cache.put(key, json.dumps({**analysis_fields, "hooks": _canonical_hooks(analysis.hooks)},
+                                              ensure_ascii=False))
+                    stats["analysis_computed"] += 1
+
+            # 統計更新
+            stats["categories"][category] += 1
+            for pattern in analysis.patterns:
+                stats["patterns"][pattern] += 1
+            stats["difficulties"][analysis.difficulty] += 1
+
+            # 成功例判定（Power Score >= 1.0）
+            if power_score < QUALITY_CONFIG["min_power_score"]:
                 continue
+            stats["success_examples"] += 1
+
+            # 基本トレーニングデータ
+            training_entry = {
+                "title": title,
+                "category": category,
+                "power_score": power_score,
+                "virality_score": note.get("virality_score", 0),
+                "analysis": analysis_fields if analysis_fields is not None else asdict(analysis),
+                "user_nickname": note.get("user_nickname", ""),
+                "follower_count": note.get("follower_count", 0),
+                "like_count": note.get("like_count", 0),
+            }
+
+            # Evol-Instruct形式
+            variants = create_instruction_variants(
+                title, analysis, category, power_score
+            )
+            stats["evol_instruct_count"] += len(variants)
+        except Exception as e:
+            print(f"  ⚠️ エラー: {e}")
+            continue
+        yield training_entry, variants
+
+def process_shard(input_file: Path, start: int, end: int, training_file: Path, evol_instruct_file: Path,
+                  cache_path: Optional[Path] = None, run_id: Optional[int] = None) -> Dict:
+    """入力の start〜end バイト目の行を処理して2つの出力ファイルに書き、統計を返す
+
+    行の読み込み → フィルタ → 分析 → 書き出しを1件ずつ流すので、メモリは入力の行数によらず一定。
+    cache_path があれば、そのタイトル分析キャッシュを使い、参照した行に run_id を記録する
+    （別バージョンの行・参照されなかった行の削除は process_data が行う）。
+    """
+    stats = _new_stats()
+    notes = iter_notes(read_shard(input_file, start, end), stats)
+    cache = AnalysisCache(analyzer_version(), cache_path, prune=False, run_id=run_id) if cache_path else None
+
+    try:
+        with open(training_file, "w", encoding="utf-8") as training_out, \
+                open(evol_instruct_file, "w", encoding="utf-8") as evol_out:
+            for training_entry, variants in iter_examples(notes, stats, cache):
+                training_out.write(json.dumps(training_entry, ensure_ascii=False) + "\n")
+                for variant in variants:
+                    evol_out.write(json.dumps(variant, ensure_ascii=False) + "\n")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return stats
+
+def _process_shard_job(job: Tuple) -> Dict:
+    return process_shard(*job)
+
+def _has_fork() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+def _can_parallelize() -> bool:
+    """ワーカーの出力が直列実行と同じになるか（fork で起動できるか、全プロセスのハッシュシードが固定か）"""
+    return _has_fork() or os.environ.get("PYTHONHASHSEED", "random") != "random"
+
+def _process_parallel(input_file: Path, training_file: Path, evol_instruct_file: Path,
+                      workers: int, cache_path: Optional[Path] = None, run_id: Optional[int] = None) -> Dict:
+    """バイト範囲のシャードをプロセスプールで処理し、出力と統計を入力順に結合する
+
+    フックの並び（list(set(...))）は文字列のハッシュに依存するので、ワーカーは fork で起動して
+    親プロセスと同じハッシュシードを使う（fork の無い環境では PYTHONHASHSEED の固定が必要。_can_parallelize）。
+    """
+    ranges = shard_ranges(input_file, workers * PARALLEL_CONFIG["shards_per_worker"])
+    context = multiprocessing.get_context("fork") if _has_fork() else None
+    stats = _new_stats()
+
+    with tempfile.TemporaryDirectory(dir=training_file.parent, prefix=".shards_") as tmp_dir:
+        parts = [(Path(tmp_dir) / f"{i:05d}.training.jsonl", Path(tmp_dir) / f"{i:05d}.evol.jsonl")
+                 for i in range(len(ranges))]
+        jobs = [(input_file, start, end, training_part, evol_part, cache_path, run_id)
+                for (start, end), (training_part, evol_part) in zip(ranges, parts)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for shard_stats in pool.map(_process_shard_job, jobs):
+                _merge_stats(stats, shard_stats)
+
+        # 結合も一時ファイルに書いてから置き換える（途中で止まっても前回の出力が残る）
+        for output_file, column in ((training_file, 0), (evol_instruct_file, 1)):
+            merged = Path(tmp_dir) / output_file.name
+            with open(merged, "wb") as out:
+                for part in parts:
+                    with open(part[column], "rb") as f:
+                        shutil.copyfileobj(f, out)
+            os.replace(merged, output_file)
+
+    return stats
+
+def process_data(workers: int = None, input_file: Path = None, output_dir: Path = None,
+                 incremental: bool = False, cache_path: Path = None):
+    """データを処理してEvol-Instruct形式に変換
+
+    workers >= 2 でシャードを並列処理（出力は直列実行と同じ）。
+    incremental なら、タイトル分析キャッシュにある行は分析せず、新しい行・変わった行だけを分析する。
+    """
+    workers = workers or PARALLEL_CONFIG["workers"]
+    input_file = Path(input_file or RAW_DATA_FILE)
+    output_dir = Path(output_dir or OUTPUT_DIR)
+    training_file = output_dir / TRAINING_FILE.name
+    evol_instruct_file = output_dir / EVOL_INSTRUCT_FILE.name
+    quality_report_file = output_dir / QUALITY_REPORT_FILE.name
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if not input_file.exists():
+        print(f"❌ データファイルが見つかりません: {input_file}")
+        return
 
-    # データ保存
-    with open(TRAINING_FILE, "w", encoding="utf-8") as f:
-        for entry in training_data:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print("=" * 60)
+    print("🔄 データ準備 v2.0 開始")
+    print("=" * 60)
 
-    with open(EVOL_INSTRUCT_FILE, "w", encoding="utf-8") as f:
-        for entry in evol_instruct_data:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    run_id = time.time_ns()  # この実行で参照したキャッシュの行の印
+    if incremental:
+        cache_path = Path(cache_path or output_dir / CACHE_CONFIG["path"].name)
+        with AnalysisCache(analyzer_version(), cache_path) as cache:  # 規則表が変わっていれば古い結果を削除
+            invalidated = cache.invalidated
+        print(f"  🗃️ 差分処理（キャッシュ: {cache_path}）")
+    else:
+        cache_path = None
+
+    if workers > 1 and not _can_parallelize():
+        # spawn のワーカーはそれぞれ別のハッシュシードになり、フックの並びが直列実行と変わってしまう
+        print("  ⚠️ fork が使えず PYTHONHASHSEED も固定されていないため、直列で処理します"
+              "（並列にするには PYTHONHASHSEED=0 などを設定）")
+        workers = 1
+
+    if workers > 1:
+        print(f"  ⚡ {workers}プロセスで並列処理")
+        stats = _process_parallel(input_file, training_file, evol_instruct_file, workers, cache_path, run_id)
+    else:
+        # 同じディレクトリの一時ファイルに書き、最後まで処理できたら置き換える（途中で止まっても前回の出力が残る）
+        with tempfile.TemporaryDirectory(dir=output_dir, prefix=".serial_") as tmp_dir:
+            training_part, evol_part = Path(tmp_dir) / training_file.name, Path(tmp_dir) / evol_instruct_file.name
+            stats = process_shard(input_file, 0, input_file.stat().st_size,
+                                  training_part, evol_part, cache_path, run_id)
+            os.replace(training_part, training_file)
+            os.replace(evol_part, evol_instruct_file)
+
+    if incremental:
+        # 最後まで処理できたので、今回の入力に無かった行（Power Score が変わった行・消えた行）を削除
+        with AnalysisCache(analyzer_version(), cache_path, prune=False, run_id=run_id) as cache:
+            stale = cache.delete_stale()
 
     # 品質レポート
     report = {
@@ -393,7 +933,7 @@ def process_data():
         "difficulties": dict(stats["difficulties"]),
     }
 
-    with open(QUALITY_REPORT_FILE, "w", encoding="utf-8") as f:
+    with open(quality_report_file, "w", encoding="utf-8") as f:
         json.dump(report, f, ensure_ascii=False, indent=2)
 
     # 結果表示
@@ -402,11 +942,14 @@ def process_data():
     print(f"  - フィルタ除外: {stats['filtered_out']}件")
     print(f"  - 成功例: {stats['success_examples']}件")
     print(f"  - Evol-Instruct形式: {stats['evol_instruct_count']}件")
+    if incremental:
+        print(f"  - タイトル分析: キャッシュ {stats['analysis_cached']}件 / 新規 {stats['analysis_computed']}件"
+              f"（規則表の変更で無効化 {invalidated}件 / 今回の入力に無い行を削除 {stale}件）")
 
     print(f"\n📁 出力ファイル:")
-    print(f"  - {TRAINING_FILE}")
-    print(f"  - {EVOL_INSTRUCT_FILE}")
-    print(f"  - {QUALITY_REPORT_FILE}")
+    print(f"  - {training_file}")
+    print(f"  - {evol_instruct_file}")
+    print(f"  - {quality_report_file}")
 
     print("\n" + "=" * 60)
     print("✅ データ準備完了!")
@@ -417,4 +960,11 @@ def process_data():
 # ============================================================
 
 if __name__ == "__main__":
-    process_data()
+    parser = argparse.ArgumentParser(description="noteAI データ準備 v2.0")
+    parser.add_argument("--workers", type=int, default=PARALLEL_CONFIG["workers"],
+                        help="並列プロセス数（0 で CPU コア数。出力は1プロセスのときと同じ）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="タイトル分析キャッシュにある行は分析し直さない（新しい行・変わった行だけ分析）")
+    args = parser.parse_args()
+
+    process_data(workers=args.workers if args.workers > 0 else os.cpu_count(), incremental=args.incremental)
@@ -0,0 +1,250 @@
+"""
+noteAI 適応型レート制限
+
+固定 sleep の代わりに、サーバーの応答（429/403）に応じてリクエスト間隔を調整する。
+
+仕組み（AIMD + トークンバケット）:
+- 成功するたびにレートを少しずつ上げる（加算的増加）
+- 429/403 を受けたらレートを半減し、Retry-After（無ければ指数バックオフ+ジッター）の間は送信停止
+- 時計を差し替え可能（SimulatedClock で実時間を使わずに挙動を検証できる）
+
+使用方法:
+    limiter = AdaptiveRateLimiter(rate=1 / 1.5, min_rate=0.05, max_rate=1.0)
+    limiter.acquire()                 # 送信前に呼ぶ（必要なら待機）
+    limiter.on_success()              # 200 のとき
+    limiter.on_throttle(retry_after)  # 429/403 のとき
+
+    python rate_limiter.py simulate   # 429 を定期的に返す模擬サーバーで挙動を確認
+"""
+
+import argparse
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# ============================================================
+# 時計
+# ============================================================
+
+class MonotonicClock:
+    """実時間の時計"""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """sleep で即座に時刻を進める模擬時計（検証用）"""
+
+    def __init__(self, start: float = 0.0):
+        self.current = start
+
+    def now(self) -> float:
+        return self.current
+
+    def sleep(self, seconds: float):
+        self.current += max(seconds, 0.0)
+
+# ============================================================
+# Retry-After
+# ============================================================
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After ヘッダー（秒数 or HTTP日付）を秒数に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+# ============================================================
+# レート制限
+# ============================================================
+
+@dataclass
+class LimiterStats:
+    """レート制限の統計"""
+    acquired: int = 0
+    successes: int = 0
+    throttled: int = 0
+    errors: int = 0
+    sleep_time: float = 0.0
+    backoff_time: float = 0.0   # 429/403・エラーによる待機（sleep_time の内数）
+
+
+class AdaptiveRateLimiter:
+    """AIMD方式の適応型トークンバケット（スレッドセーフ）"""
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float,
+                 increase: Optional[float] = None, decrease_factor: float = 0.5,
+                 burst: int = 1, base_backoff: float = 10.0, max_backoff: float = 300.0,
+                 jitter: float = 0.25, clock=None, rng: Optional[random.Random] = None):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        # 既定では200回連続成功で min_rate から max_rate まで戻る増分
+        self.increase = increase if increase is not None else (max_rate - min_rate) / 200
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.clock = clock or MonotonicClock()
+        self.rng = rng or random.Random()
+
+        self.next_time = self.clock.now()   # 次に送信できる理論時刻（GCRA）
+        self.blocked_until = 0.0            # バックオフ中は送信停止
+        self.consecutive_failures = 0
+        self.stats = LimiterStats()
+        self._lock = threading.Lock()
+
+    def _with_jitter(self, seconds: float) -> float:
+        return seconds * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def reserve(self) -> float:
+        """送信枠を予約し、送信までに待つべき秒数を返す（待機はしない）"""
+        with self._lock:
+            now = self.clock.now()
+            interval = 1.0 / self.rate
+            # バースト分だけ過去にさかのぼって枠を使える
+            start = max(self.next_time, now - (self.burst - 1) * interval, self.blocked_until)
+            self.next_time = start + interval
+            self.stats.acquired += 1
+            return max(start - now, 0.0)
+
+    def acquire(self):
+        """送信枠を取得（必要なら待機）"""
+        wait = self.reserve()
+        if wait > 0:
+            self.record_sleep(wait)
+            self.clock.sleep(wait)
+
+    def record_sleep(self, seconds: float):
+        """待機時間を統計に記録（非同期版で asyncio.sleep した場合など）"""
+        with self._lock:
+            self.stats.sleep_time += seconds
+
+    def on_success(self):
+        """成功時: レートを加算的に増加"""
+        with self._lock:
+            self.stats.successes += 1
+            self.consecutive_failures = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        """429/403 受信時: レートを乗算的に減少し、待機秒数を返す"""
+        with self._lock:
+            self.stats.throttled += 1
+            self.consecutive_failures += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            if retry_after is not None:
+                # Retry-After は下限として尊重し、ジッターは上乗せ方向のみ
+                wait = retry_after * (1 + self.rng.uniform(0, self.jitter))
+            else:
+                wait = self._with_jitter(
+                    min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_failures - 1)))
+            now = self.clock.now()
+            self.stats.backoff_time += max(now + wait - max(self.blocked_until, now), 0.0)
+            self.blocked_until = max(self.blocked_until, now + wait)
+            self.next_time = max(self.next_time, self.blocked_until)
+            return wait
+
+    def on_error(self, wait: float = 5.0) -> float:
+        """通信エラーや想定外のステータス: レートは維持して短く待機"""
+        with self._lock:
+            self.stats.errors += 1
+            wait = self._with_jitter(wait)
+            now = self.clock.now()
+            self.stats.backoff_time += max(now + wait - max(self.blocked_until, now), 0.0)
+            self.blocked_until = max(self.blocked_until, now + wait)
+            return wait
+
+
+def limiter_from_config(config: Dict, burst: int = 1, clock=None) -> AdaptiveRateLimiter:
+    """収集スクリプトの CONFIG から limiter を作成"""
+    return AdaptiveRateLimiter(
+        rate=1.0 / config["request_delay"],
+        min_rate=1.0 / config["max_request_delay"],
+        max_rate=1.0 / config["min_request_delay"],
+        burst=burst,
+        clock=clock,
+    )
+
+# ============================================================
+# シミュレーション
+# ============================================================
+
+class ScheduledThrottleServer:
+    """指定した時間帯に429を返す模擬サーバー（SimulatedClock用）"""
+
+    def __init__(self, clock: SimulatedClock, throttle_windows: List[Tuple[float, float]],
+                 capacity: float, retry_after: Optional[float] = 30.0):
+        self.clock = clock
+        self.throttle_windows = throttle_windows
+        self.capacity = capacity            # これを超えるレートでは常に429
+        self.retry_after = retry_after
+        self.last_request = None
+
+    def request(self) -> Tuple[int, Optional[float]]:
+        """(ステータス, Retry-After) を返す"""
+        now = self.clock.now()
+        interval = now - self.last_request if self.last_request is not None else float("inf")
+        self.last_request = now
+        in_window = any(start <= now < end for start, end in self.throttle_windows)
+        if in_window or interval < 1.0 / self.capacity:
+            return 429, self.retry_after
+        return 200, None
+
+
+def simulate(limiter: AdaptiveRateLimiter, server: ScheduledThrottleServer,
+             duration: float) -> List[Tuple[float, int, float]]:
+    """duration 秒分の送信を模擬し、(時刻, ステータス, レート) の履歴を返す"""
+    trace = []
+    while limiter.clock.now() < duration:
+        limiter.acquire()
+        status, retry_after = server.request()
+        if status == 200:
+            limiter.on_success()
+        else:
+            limiter.on_throttle(retry_after)
+        trace.append((limiter.clock.now(), status, limiter.rate))
+    return trace
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI 適応型レート制限")
+    parser.add_argument("command", choices=["simulate"])
+    parser.add_argument("--duration", type=float, default=3600.0)
+    parser.add_argument("--capacity", type=float, default=1.2, help="サーバーが許容するreq/s")
+    args = parser.parse_args()
+
+    clock = SimulatedClock()
+    limiter = AdaptiveRateLimiter(rate=1 / 1.5, min_rate=0.05, max_rate=2.0,
+                                  clock=clock, rng=random.Random(0))
+    server = ScheduledThrottleServer(clock, [(600, 660), (1800, 1900)], capacity=args.capacity)
+    trace = simulate(limiter, server, args.duration)
+
+    ok = sum(1 for _, status, _ in trace if status == 200)
+    print("=" * 60)
+    print(f"🧪 模擬実行: {args.duration:.0f}秒, サーバー許容 {args.capacity}req/s")
+    print("=" * 60)
+    for t in range(0, int(args.duration), 300):
+        window = [rate for ts, _, rate in trace if t <= ts < t + 300]
+        if window:
+            print(f"  {t:5d}s〜: 平均レート {sum(window) / len(window):.2f}req/s, {len(window)}リクエスト")
+    print(f"  成功: {ok}, 429: {len(trace) - ok}, 待機合計: {limiter.stats.sleep_time:.0f}秒")
@@ -0,0 +1,304 @@
+"""
+noteAI 録画・再生トランスポート
+
+note.com の /api/v2, /api/v3/searches の応答をフィクスチャアーカイブ（gzip JSONL）に録画し、
+ネットワーク無しで決定論的に再生する。遅延・エラー注入により、収集スクリプト全体を
+再現可能なスループットベンチマークとして実行できる。
+
+使用方法:
+    # 録画（実API、または --base-url でスタブサーバー）
+    python replay_transport.py record --target v3 --keywords 3 --archive fixtures/note_api.jsonl.gz
+
+    # 再生ベンチマーク（ネットワーク不要）
+    python replay_transport.py bench --target v3 --archive fixtures/note_api.jsonl.gz \\
+        --latency 0.05 --error-rate 0.02 --seed 0
+
+対応ターゲット:
+- v3     : collect_power_data_v3.DataCollector.run
+- custom : collect_power_data_custom.collect_data
+- custom-pipeline : collect_power_data_custom.collect_data_pipelined
+- custom-scheduled : collect_power_data_custom.collect_data_scheduled
+- v2     : collect_power_data_v2.collect_data
+"""
+
+import argparse
+import base64
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import http_client
+from rate_limiter import AdaptiveRateLimiter
+
+# 録画するヘッダー（再生時のキャッシュ検証・レート制限に必要なもの）
+RECORDED_HEADERS = ["Content-Type", "ETag", "Last-Modified", "Retry-After"]
+
+DEFAULT_ARCHIVE = Path("fixtures") / "note_api.jsonl.gz"
+
+
+def replay_key(url: str) -> str:
+    """ホストを除いたパス+クエリ（スタブで録画したアーカイブも本番URLで再生できる）"""
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}"
+
+# ============================================================
+# 録画
+# ============================================================
+
+def _encode_body(content: bytes) -> Dict:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(record: Dict) -> bytes:
+    if "body_b64" in record:
+        return base64.b64decode(record["body_b64"])
+    return record.get("body", "").encode("utf-8")
+
+
+class RecordingAdapter(http_client.CountingHTTPAdapter):
+    """実際の通信を行いつつ、応答をアーカイブに追記する"""
+
+    def __init__(self, archive: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = Path(archive)
+        self.archive.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.archive, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        record = {
+            "url": request.url,
+            "status": response.status_code,
+            "headers": {k: response.headers[k] for k in RECORDED_HEADERS if k in response.headers},
+            **_encode_body(response.content),
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.recorded += 1
+        return response
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        super().close()
+
+# ============================================================
+# 再生
+# ============================================================
+
+class ReplayAdapter(BaseAdapter):
+    """アーカイブから応答を返す（遅延・エラー注入付き）"""
+
+    def __init__(self, archive: Path, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, retry_after: int = 0, seed: int = 0):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.missing = 0
+        self.injected_errors = 0
+
+        # 同じURLが複数回録画されていれば順番に返す（最後の応答はその後も繰り返す）
+        self.responses: Dict[str, List[Dict]] = {}
+        with gzip.open(archive, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self.responses.setdefault(replay_key(record["url"]), []).append(record)
+        self._cursor: Dict[str, int] = {}
+
+    def _next_record(self, url: str) -> Optional[Dict]:
+        records = self.responses.get(url)
+        if not records:
+            return None
+        index = self._cursor.get(url, 0)
+        self._cursor[url] = index + 1
+        return records[min(index, len(records) - 1)]
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            delay = max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0.0)
+            inject = self.rng.random() < self.error_rate
+            record = None if inject else self._next_record(replay_key(request.url))
+            if inject:
+                self.injected_errors += 1
+            elif record is None:
+                self.missing += 1
+            else:
+                self.replayed += 1
+        if delay:
+            time.sleep(delay)
+
+        if inject:
+            status, headers, body = 429, {"Retry-After": str(self.retry_after)}, b""
+        elif record is None:
+            status, headers, body = 404, {}, b""
+        else:
+            status, headers, body = record["status"], record["headers"], _decode_body(record)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=delay)
+        return response
+
+    def close(self):
+        pass
+
+# ============================================================
+# 収集スクリプトの実行
+# ============================================================
+
+def _fast_limiter(rate: float) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(rate=rate, min_rate=min(rate, 1.0), max_rate=rate)
+
+
+def run_target(target: str, num_keywords: int, rate: float, base_url: Optional[str] = None):
+    """ターゲットの収集処理をキーワード数を絞って実行（モジュール設定は実行後に戻す）"""
+    if target == "v3":
+        import collect_power_data_v3 as module
+        saved = {"ALL_KEYWORDS": module.ALL_KEYWORDS, "LIMITER": module.LIMITER, "BASE_URL": module.BASE_URL}
+        module.ALL_KEYWORDS = module.ALL_KEYWORDS[:num_keywords]
+        module.LIMITER = _fast_limiter(rate)
+        run = lambda: module.DataCollector().run()
+    elif target in ("custom", "custom-pipeline", "custom-scheduled"):
+        import collect_power_data_custom as module
+        saved = {"ALL_KEYWORDS": module.ALL_KEYWORDS, "LIMITER": module.LIMITER, "BASE_URL": module.BASE_URL}
+        module.ALL_KEYWORDS = module.ALL_KEYWORDS[:num_keywords]
+        module.LIMITER = _fast_limiter(rate)
+        run = {"custom": module.collect_data, "custom-pipeline": module.collect_data_pipelined,
+               "custom-scheduled": module.collect_data_scheduled}[target]
+    elif target == "v2":
+        import collect_power_data_v2 as module
+        saved = {"SEARCH_KEYWORDS": module.SEARCH_KEYWORDS, "SLEEP_TIME": module.SLEEP_TIME}
+        module.SEARCH_KEYWORDS = module.SEARCH_KEYWORDS[:num_keywords]
+        module.SLEEP_TIME = 1.0 / rate
+        run = lambda: module.collect_data(resume=False)
+    else:
+        raise ValueError(f"未対応のターゲット: {target}")
+
+    if base_url and "BASE_URL" in saved:
+        module.BASE_URL = base_url
+    try:
+        run()
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def _count_output_rows() -> int:
+    rows = 0
+    for path in list(Path("data").glob("raw_notes_*.jsonl")) + list(Path(".").glob("*.csv")):
+        with open(path, "rb") as f:
+            rows += sum(1 for _ in f)
+    return rows
+
+
+def record(args):
+    """実APIまたはスタブに対してターゲットを実行し、応答を録画"""
+    archive = Path(args.archive).resolve()
+    adapter = RecordingAdapter(archive)
+    http_client.configure(cache=False)
+    http_client.install_adapter(adapter)
+
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            run_target(args.target, args.keywords, args.rate, args.base_url)
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        http_client.install_adapter(None)
+        adapter.close()
+    print(f"\n🎬 {adapter.recorded}件の応答を録画: {archive}")
+
+
+def bench(args):
+    """録画済みアーカイブでターゲットを実行し、スループットを計測"""
+    archive = Path(args.archive).resolve()
+    adapter = ReplayAdapter(archive, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, retry_after=args.retry_after, seed=args.seed)
+    http_client.configure(cache=False)
+    http_client.install_adapter(adapter)
+    http_client.reset_stats()
+
+    cwd = os.getcwd()
+    log = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(log) if args.quiet else contextlib.nullcontext():
+                run_target(args.target, args.keywords, args.rate)
+            elapsed = time.perf_counter() - start
+            rows = _count_output_rows()
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        http_client.install_adapter(None)
+
+    stats = http_client.get_stats()
+    print("=" * 60)
+    print(f"📈 再生ベンチマーク: {args.target}（{args.keywords}キーワード）")
+    print(f"   遅延 {args.latency * 1000:.0f}±{args.jitter * 1000:.0f}ms, エラー率 {args.error_rate:.1%}, seed={args.seed}")
+    print("=" * 60)
+    print(f"  実行時間: {elapsed:.2f}秒")
+    print(f"  リクエスト: {stats['requests']} ({stats['requests'] / elapsed:.1f}req/s)")
+    print(f"  再生 {adapter.replayed} / 未録画 {adapter.missing} / 注入エラー {adapter.injected_errors}")
+    print(f"  出力行数: {rows}")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI 録画・再生トランスポート")
+    parser.add_argument("command", choices=["record", "bench"])
+    parser.add_argument("--target", choices=["v3", "custom", "custom-pipeline", "custom-scheduled", "v2"], default="v3")
+    parser.add_argument("--archive", default=str(DEFAULT_ARCHIVE))
+    parser.add_argument("--keywords", type=int, default=3, help="使用するキーワード数")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="レート上限（req/s）。録画時の既定値は0.67、再生時は1000")
+    parser.add_argument("--base-url", default=None, help="record: APIのベースURL（スタブ用）")
+    parser.add_argument("--latency", type=float, default=0.0, help="bench: 応答遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="bench: 遅延のゆらぎ（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="bench: 429を注入する確率")
+    parser.add_argument("--retry-after", type=int, default=0, help="bench: 注入429の Retry-After")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quiet", action="store_true", help="bench: 収集ログを抑制")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        args.rate = args.rate or 1 / 1.5
+        record(args)
+    else:
+        args.rate = args.rate or 1000.0
+        bench(args)
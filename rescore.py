@@ -0,0 +1,352 @@
+"""
+noteAI スコア一括再計算（NumPy）
+
+収集済みコーパス（raw_notes_*.jsonl）からスキ数・コメント数・フォロワー数の列を NumPy 配列に読み込み、
+スコア（power_score / engagement_rate / virality_score）を全行まとめて再計算する。
+計算式を変えても再収集は不要で、数百万行でも数秒で終わる。
+
+仕組み:
+- 列は data/scores/{コーパス名}.npz にキャッシュ（取り込み済みバイト位置も保存し、次回は追記分だけ読む）
+- 計算式はバージョンごとに SCORE_VERSIONS に登録（収集スクリプトごとの式をそのまま移植）
+  - v3: NoteData.calculate_scores（フォロワー0人はスキ数・エンゲージメントをそのまま使う）
+  - custom: collect_power_data_custom.calculate_power_score（フォロワー0人は0、小数3桁）
+  - v2: collect_power_data / collect_power_data_v2 / note_data_collector（フォロワー0人は0、小数4桁）
+- 結果は同じ npz に「バージョン/列名」の列として保存（既存のバージョンは残る）
+- export で、選んだバージョンのスコアに置き換えた JSONL を書き出す（prepare_training_data_v2 にそのまま渡せる）
+
+使用方法:
+    python rescore.py run data/raw_notes_v3.jsonl --version v3 custom
+    python rescore.py export data/raw_notes_v3.jsonl --version v3       # → *.rescored.jsonl
+    python rescore.py bench --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson は任意依存
+    orjson = None
+
+# ============================================================
+# 設定
+# ============================================================
+
+RESCORE_CONFIG = {
+    "dir": Path("data") / "scores",
+}
+
+# 列名（コーパスの記録によってキー名が違うものは別名も見る）
+COLUMN_KEYS = {
+    "like_count": ("like_count", "likes"),
+    "comment_count": ("comment_count", "comments"),
+    "follower_count": ("follower_count", "followers"),
+}
+
+# ============================================================
+# 計算式
+# ============================================================
+
+def _ratio(numerator: np.ndarray, followers: np.ndarray, zero_value: np.ndarray) -> np.ndarray:
+    """numerator / followers（フォロワー0人の行は zero_value）"""
+    out = np.array(zero_value, dtype=np.float64, copy=True)
+    np.divide(numerator, followers, out=out, where=followers > 0)
+    return out
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """Python の round() と同じ丸め（np.round は 10^n 倍してから丸めるため、境界で1桁ずれることがある）"""
+    rounded = np.round(values, digits)
+    scale = 10.0 ** digits
+    # 丸め位置の境界付近だけ Python の round() で計算し直す
+    fraction = np.abs(values * scale) % 1.0
+    suspect = np.flatnonzero(np.abs(fraction - 0.5) < 1e-6)
+    for i in suspect:
+        rounded[i] = round(float(values[i]), digits)
+    return rounded
+
+
+def _power(values: np.ndarray, exponent: float) -> np.ndarray:
+    """values ** exponent（従来の計算と同じ値にするため、異なる値ごとに Python の pow で計算して引く）
+
+    np.power は 1ulp ずれることがある。スキ数・フォロワー数は整数で種類が少ないので、表引きでも速い。
+    """
+    unique, inverse = np.unique(values, return_inverse=True)
+    table = np.array([float(value) ** exponent for value in unique.tolist()], dtype=np.float64)
+    return table[inverse]
+
+
+def scores_v3(likes: np.ndarray, comments: np.ndarray, followers: np.ndarray) -> Dict[str, np.ndarray]:
+    """collect_power_data_v3.NoteData.calculate_scores"""
+    total_engagement = likes + comments * 3  # コメントは3倍重み
+    virality = _power(likes, 1.5)
+    return {
+        "power_score": _ratio(likes, followers, likes),
+        "engagement_rate": _ratio(total_engagement, followers, total_engagement),
+        "virality_score": _ratio(virality, _power(followers, 0.5), virality),
+    }
+
+
+def scores_custom(likes: np.ndarray, comments: np.ndarray, followers: np.ndarray) -> Dict[str, np.ndarray]:
+    """collect_power_data_custom.calculate_power_score"""
+    return {"power_score": _round(_ratio(likes, followers, np.zeros_like(likes)), 3)}
+
+
+def scores_v2(likes: np.ndarray, comments: np.ndarray, followers: np.ndarray) -> Dict[str, np.ndarray]:
+    """collect_power_data / collect_power_data_v2 / note_data_collector"""
+    return {"power_score": _round(_ratio(likes, followers, np.zeros_like(likes)), 4)}
+
+
+SCORE_VERSIONS: Dict[str, Callable[..., Dict[str, np.ndarray]]] = {
+    "v3": scores_v3,
+    "custom": scores_custom,
+    "v2": scores_v2,
+}
+
+# ============================================================
+# 列キャッシュ
+# ============================================================
+
+def _loads(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _count(record: Dict, keys) -> int:
+    for key in keys:
+        value = record.get(key)
+        if value is not None:
+            try:
+                return max(int(value), 0)
+            except (TypeError, ValueError):
+                return 0
+    return 0
+
+
+def read_columns(path: Path, offset: int = 0) -> Dict:
+    """JSONL の offset 以降からスコア計算に使う列を読み込む（書きかけの最終行は読まない）"""
+    note_ids: List[str] = []
+    columns = {name: [] for name in COLUMN_KEYS}
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                record = _loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            note_ids.append(str(record.get("note_id") or record.get("id") or ""))
+            for name, keys in COLUMN_KEYS.items():
+                columns[name].append(_count(record, keys))
+    result = {name: np.array(values, dtype=np.int64) for name, values in columns.items()}
+    result["note_id"] = np.array(note_ids, dtype=str)
+    result["offset"] = offset
+    return result
+
+
+def sidecar_path(path: Path) -> Path:
+    return RESCORE_CONFIG["dir"] / f"{Path(path).stem}.npz"
+
+
+class ScoreTable:
+    """コーパス1つ分の列とスコアのバージョン（data/scores/{コーパス名}.npz）"""
+
+    def __init__(self, corpus: Path, sidecar: Optional[Path] = None):
+        self.corpus = Path(corpus)
+        self.sidecar = Path(sidecar or sidecar_path(self.corpus))
+        self.columns: Dict[str, np.ndarray] = {}
+        self.offset = 0
+        self.added = 0
+        if self.sidecar.exists():
+            with np.load(self.sidecar) as saved:
+                self.columns = {key: saved[key] for key in saved.files if key != "offset"}
+                self.offset = int(saved["offset"])
+        self.refresh()
+
+    @property
+    def rows(self) -> int:
+        return len(self.columns.get("note_id", ()))
+
+    def refresh(self):
+        """コーパスの追記分を列に取り込む（ファイルが小さくなっていれば作り直す）"""
+        if self.offset > self.corpus.stat().st_size:
+            self.columns, self.offset = {}, 0
+        tail = read_columns(self.corpus, self.offset)
+        self.added = len(tail["note_id"])
+        if not self.added and self.columns:
+            return
+        for name in ("note_id", *COLUMN_KEYS):
+            previous = self.columns.get(name)
+            self.columns[name] = tail[name] if previous is None else np.concatenate([previous, tail[name]])
+        self.offset = tail["offset"]
+        # 行が増えたので既存のバージョンも計算し直す
+        for version in self.versions():
+            self.rescore(version)
+
+    def versions(self) -> List[str]:
+        return sorted({key.split("/", 1)[0] for key in self.columns if "/" in key})
+
+    def rescore(self, version: str) -> Dict[str, np.ndarray]:
+        """指定バージョンの計算式で全行のスコアを計算し、列として保持"""
+        likes = self.columns["like_count"].astype(np.float64)
+        comments = self.columns["comment_count"].astype(np.float64)
+        followers = self.columns["follower_count"].astype(np.float64)
+        scores = SCORE_VERSIONS[version](likes, comments, followers)
+        for name, values in scores.items():
+            self.columns[f"{version}/{name}"] = values
+        return scores
+
+    def scores(self, version: str) -> Dict[str, np.ndarray]:
+        prefix = f"{version}/"
+        return {key[len(prefix):]: values for key, values in self.columns.items() if key.startswith(prefix)}
+
+    def save(self):
+        """npz を書き換える（一時ファイル → rename）"""
+        self.sidecar.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.sidecar.with_suffix(".npz.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, offset=np.int64(self.offset), **self.columns)
+        os.replace(tmp, self.sidecar)
+
+    def export(self, version: str, output: Optional[Path] = None) -> Path:
+        """スコアを指定バージョンに置き換えた JSONL を書き出す"""
+        output = Path(output or self.corpus.with_suffix(".rescored.jsonl"))
+        scores = {name: values.tolist() for name, values in self.scores(version).items()}
+        row = 0
+        with open(self.corpus, "rb") as src, open(output, "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.endswith(b"\n") or row >= self.rows:
+                    break
+                try:
+                    record = _loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                for name, values in scores.items():
+                    record[name] = values[row]
+                record["score_version"] = version
+                dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+                row += 1
+        return output
+
+    def print_report(self, versions: List[str]):
+        followers = self.columns["follower_count"]
+        print(f"📊 {self.corpus}: {self.rows}行（追加 {self.added}行, フォロワー0人 {int((followers == 0).sum())}行）")
+        for version in versions:
+            for name, values in self.scores(version).items():
+                print(f"  {version + '/' + name:<24}: 平均 {values.mean() if len(values) else 0:10.4f}, "
+                      f"最大 {values.max() if len(values) else 0:12.4f}")
+
+# ============================================================
+# ベンチマーク
+# ============================================================
+
+def _write_corpus(path: Path, num_rows: int, seed: int):
+    """収集スクリプトの記録に近い形の合成コーパス（フォロワー0人の行を含む）"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(num_rows):
+            followers = 0 if rng.random() < 0.02 else rng.randint(1, 5000)
+            likes = rng.randint(0, 2000)
+            f.write(json.dumps({
+                "note_id": str(100_000_000 + i), "title": f"記事タイトル{i}", "user_id": f"user{i % 5000}",
+                "follower_count": followers, "like_count": likes, "comment_count": rng.randint(0, 50),
+                "body_preview": "本文" * 100, "category": "テック",
+            }, ensure_ascii=False) + "\n")
+
+
+def run_benchmark(num_rows: int, seed: int):
+    """1行ずつの計算（従来）とベクトル化の時間を比較し、結果が一致することを確認"""
+    from collect_power_data_custom import calculate_power_score
+    from collect_power_data_v3 import NoteData
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(tmp) / "raw_notes_bench.jsonl"
+        _write_corpus(corpus, num_rows, seed)
+
+        started = time.perf_counter()
+        table = ScoreTable(corpus, Path(tmp) / "scores.npz")
+        load_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for version in SCORE_VERSIONS:
+            table.rescore(version)
+        score_elapsed = time.perf_counter() - started
+        table.save()
+
+        started = time.perf_counter()
+        reloaded = ScoreTable(corpus, Path(tmp) / "scores.npz")
+        reload_elapsed = time.perf_counter() - started
+
+    # 従来: NoteData を1件ずつ作って calculate_scores
+    likes = table.columns["like_count"].tolist()
+    comments = table.columns["comment_count"].tolist()
+    followers = table.columns["follower_count"].tolist()
+    started = time.perf_counter()
+    legacy = {"power_score": [], "engagement_rate": [], "virality_score": []}
+    for like, comment, follower in zip(likes, comments, followers):
+        note = NoteData("", "", "", "", "", "", follower, like, comment, "", "", "")
+        note.calculate_scores()
+        legacy["power_score"].append(note.power_score)
+        legacy["engagement_rate"].append(note.engagement_rate)
+        legacy["virality_score"].append(note.virality_score)
+    legacy["custom"] = [calculate_power_score(like, follower) for like, follower in zip(likes, followers)]
+    legacy["v2"] = [round(like / follower, 4) if follower > 0 else 0 for like, follower in zip(likes, followers)]
+    legacy_elapsed = time.perf_counter() - started
+
+    mismatches = {f"v3/{name}": int((np.array(legacy[name]) != table.columns[f"v3/{name}"]).sum())
+                  for name in ("power_score", "engagement_rate", "virality_score")}
+    for version in ("custom", "v2"):
+        mismatches[f"{version}/power_score"] = int(
+            (np.array(legacy[version]) != table.columns[f"{version}/power_score"]).sum())
+
+    print("=" * 60)
+    print(f"📈 スコア再計算ベンチマーク（{num_rows}行, {len(SCORE_VERSIONS)}バージョン）")
+    print("=" * 60)
+    print(f"  列の読み込み（JSONL, 初回）: {load_elapsed:6.2f}秒")
+    print(f"  列の読み込み（npz キャッシュ）: {reload_elapsed:6.2f}秒 ({reloaded.rows}行)")
+    print(f"  1件ずつ（従来, 全バージョン）: {legacy_elapsed:6.2f}秒")
+    print(f"  ベクトル化（全バージョン）   : {score_elapsed:6.2f}秒 "
+          f"({legacy_elapsed / max(score_elapsed, 1e-9):.0f}x)")
+    print(f"  不一致: {mismatches}")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI スコア一括再計算")
+    parser.add_argument("command", choices=["run", "export", "bench"])
+    parser.add_argument("paths", nargs="*", default=[str(Path("data") / "raw_notes_v3.jsonl")])
+    parser.add_argument("--version", nargs="+", choices=sorted(SCORE_VERSIONS), default=["v3"])
+    parser.add_argument("--output", default=None, help="export: 出力先（既定: *.rescored.jsonl）")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="bench: 行数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        run_benchmark(args.rows, args.seed)
+    else:
+        for path in map(Path, args.paths):
+            table = ScoreTable(path)
+            for version in args.version:
+                table.rescore(version)
+            table.save()
+            table.print_report(args.version)
+            if args.command == "export":
+                output = table.export(args.version[0], Path(args.output) if args.output else None)
+                print(f"💾 {args.version[0]} のスコアで書き出し → {output}")
@@ -0,0 +1,252 @@
+"""
+noteAI HTTPレスポンスキャッシュ
+
+/v2/creators/{id}, /v2/creators/{id}/contents, /v3/searches の応答を SQLite に保存し、
+実行をまたいで・収集スクリプトをまたいで再利用する。
+
+仕組み:
+- キー: 正規化したURL（クエリ込み）の SHA-256
+- エンドポイント種別ごとのTTL（プロフィール > 記事一覧 > 検索）
+- 期限切れでも ETag / Last-Modified があれば条件付きリクエストで再検証（304なら本文を再利用）
+- 合計サイズが上限を超えたら最終アクセスが古い順に削除（LRU）
+
+使用方法:
+    http_client.get() が自動的に利用する（CLIENT_CONFIG["cache"] = False で無効化）
+    python response_cache.py stats   # キャッシュの中身を確認
+    python response_cache.py clear   # キャッシュを削除
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# ============================================================
+# 設定
+# ============================================================
+
+CACHE_CONFIG = {
+    "path": Path("data") / "http_cache.sqlite",
+    "max_bytes": 512 * 1024 * 1024,     # 512MB を超えたらLRU削除
+    "ttl": {
+        "creator": 7 * 24 * 3600,       # プロフィール（フォロワー数）: 7日
+        "contents": 24 * 3600,          # 記事一覧（スキ数）: 1日
+        "search": 3600,                 # 検索結果: 1時間
+    },
+}
+
+# パス → エンドポイント種別
+ENDPOINT_PATTERNS = [
+    ("contents", re.compile(r"/v2/creators/[^/]+/contents$")),
+    ("creator", re.compile(r"/v2/creators/[^/]+$")),
+    ("search", re.compile(r"/v3/searches$")),
+]
+
+
+def endpoint_type(url: str) -> Optional[str]:
+    """キャッシュ対象のエンドポイント種別を返す（対象外はNone）"""
+    path = urlparse(url).path.rstrip("/")
+    for name, pattern in ENDPOINT_PATTERNS:
+        if pattern.search(path):
+            return name
+    return None
+
+# ============================================================
+# キャッシュ本体
+# ============================================================
+
+@dataclass
+class CacheEntry:
+    """キャッシュされた応答"""
+    key: str
+    body: bytes
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """条件付きリクエスト用ヘッダー"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class CacheStats:
+    """キャッシュの統計"""
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    evicted: int = 0
+    bytes_saved: int = 0
+
+
+class ResponseCache:
+    """SQLiteによるHTTPレスポンスキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, path: Path = None, max_bytes: int = None, ttl: Dict[str, int] = None):
+        self.path = Path(path or CACHE_CONFIG["path"]).resolve()
+        self.max_bytes = max_bytes or CACHE_CONFIG["max_bytes"]
+        self.ttl = ttl or CACHE_CONFIG["ttl"]
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                body BLOB NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        """正規化済みURLからキーを作成"""
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str, revalidate: bool = False) -> Optional[CacheEntry]:
+        """キーに対応するエントリを取得（revalidate なら期限内でもヒットとして数えない）"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body, content_type, etag, last_modified, expires_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(key, row[0], row[1], row[2], row[3], row[4])
+            if entry.fresh and not revalidate:
+                self.stats.hits += 1
+                self.stats.bytes_saved += len(entry.body)
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+            return entry
+
+    def store(self, key: str, url: str, body: bytes, headers: Dict[str, str]):
+        """200応答を保存（ネットワークから本文を取得した = ミス）"""
+        endpoint = endpoint_type(url)
+        now = time.time()
+        with self._lock:
+            self.stats.misses += 1
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, endpoint, body, headers.get("Content-Type"), headers.get("ETag"),
+                 headers.get("Last-Modified"), now, now + self.ttl[endpoint], now, len(body)),
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def revalidated(self, entry: CacheEntry, url: str, headers: Dict[str, str]):
+        """304応答: 有効期限を延長して本文を再利用"""
+        now = time.time()
+        with self._lock:
+            self.stats.revalidated += 1
+            self.stats.bytes_saved += len(entry.body)
+            self.conn.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (now + self.ttl[endpoint_type(url)], now, headers.get("ETag"),
+                 headers.get("Last-Modified"), entry.key),
+            )
+            self.conn.commit()
+
+    def _evict(self):
+        """上限の90%になるまで古いエントリを削除（ロック取得済みで呼ぶ）"""
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.total_bytes -= size
+            self.stats.evicted += 1
+
+    def clear(self):
+        """全エントリを削除"""
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+            self.total_bytes = 0
+
+    def print_report(self):
+        """ヒット/ミス/削減バイト数を表示"""
+        s = self.stats
+        lookups = s.hits + s.revalidated + s.misses
+        rate = (s.hits + s.revalidated) / lookups if lookups else 0.0
+        print(f"💾 キャッシュ: ヒット {s.hits} / 再検証 {s.revalidated} / ミス {s.misses} "
+              f"(ヒット率 {rate:.0%}), 削減 {s.bytes_saved / 1024 / 1024:.1f}MB, "
+              f"保存量 {self.total_bytes / 1024 / 1024:.1f}MB")
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """共有キャッシュを取得（初回呼び出し時に作成）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def print_report():
+    """共有キャッシュのレポートを表示（未使用なら何もしない）"""
+    if _cache is not None:
+        _cache.print_report()
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI HTTPレスポンスキャッシュ")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.command == "clear":
+        cache.clear()
+        print(f"🗑️ キャッシュを削除しました: {cache.path}")
+    else:
+        print(f"📁 {cache.path}")
+        rows = cache.conn.execute(
+            "SELECT endpoint, COUNT(*), SUM(size), SUM(expires_at > ?) FROM responses GROUP BY endpoint",
+            (time.time(),),
+        ).fetchall()
+        for endpoint, count, size, fresh in rows:
+            print(f"  {endpoint:>8}: {count}件 ({fresh}件有効), {size / 1024 / 1024:.1f}MB")
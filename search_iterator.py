@@ -0,0 +1,178 @@
+"""
+noteAI 検索ページング
+
+/v3/searches を start オフセットでページングする共通イテレータ。
+現在のページを処理している間に次のページを先読みし、
+空ページ・最終ページ・既出の記事だけのページ（重複ページ）で停止する。
+
+使用方法:
+    def fetch_page(keyword, start, size):   # 各収集スクリプトのリクエスト関数で
+        return data["data"]["notes"]         # {"contents": [...], "isLastPage": ...} を返す
+
+    for notes in iter_search_pages(fetch_page, keyword, max_pages=5):
+        ...
+    print_report()   # 1リクエストあたりのユニーク件数（無駄な検索の可視化）
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+# ============================================================
+# 設定
+# ============================================================
+
+SEARCH_CONFIG = {
+    "page_size": 20,        # 1ページあたりの件数
+    "max_pages": 5,         # キーワードあたりの最大ページ数
+    "prefetch": True,       # 処理中に次ページを先読み
+}
+
+# ============================================================
+# 計測
+# ============================================================
+
+@dataclass
+class SearchStats:
+    """検索の計測値"""
+    keywords: int = 0
+    requests: int = 0
+    results: int = 0
+    unique_results: int = 0
+    empty_pages: int = 0
+    repeated_pages: int = 0
+    unused_prefetches: int = 0
+
+
+STATS = SearchStats()
+_stats_lock = threading.Lock()
+
+# ============================================================
+# ページング
+# ============================================================
+
+def _note_key(note: Dict) -> str:
+    return str(note.get("id") or note.get("key") or "")
+
+
+class SearchPager:
+    """1キーワード分のページング状態（同期版・非同期版で共通）"""
+
+    def __init__(self, keyword: str, page_size: int = None, max_pages: int = None):
+        self.keyword = keyword
+        self.page_size = page_size or SEARCH_CONFIG["page_size"]
+        self.max_pages = max_pages or SEARCH_CONFIG["max_pages"]
+        self.page = 0
+        self.done = False
+        self.seen = set()
+        with _stats_lock:
+            STATS.keywords += 1
+
+    def state(self) -> Dict:
+        """再開用の状態（JSONに保存できる形）"""
+        return {"keyword": self.keyword, "page_size": self.page_size, "max_pages": self.max_pages,
+                "page": self.page, "done": self.done, "seen": sorted(self.seen)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "SearchPager":
+        """state() で保存した状態から復元（続きのページから取得する）"""
+        pager = cls(state["keyword"], state["page_size"], state["max_pages"])
+        pager.page = state["page"]
+        pager.done = state["done"]
+        pager.seen = set(state["seen"])
+        return pager
+
+    def next_start(self) -> Optional[int]:
+        """次に取得するページの start（終了ならNone）"""
+        if self.done or self.page >= self.max_pages:
+            return None
+        return self.page * self.page_size
+
+    def accept(self, payload: Optional[Dict]) -> List[Dict]:
+        """取得したページを受け取り、処理すべき記事を返す（停止条件も判定）"""
+        self.page += 1
+        contents = (payload or {}).get("contents") or []
+        keys = {_note_key(note) for note in contents}
+        new_keys = keys - self.seen
+        self.seen |= keys
+
+        with _stats_lock:
+            STATS.requests += 1
+            STATS.results += len(contents)
+            STATS.unique_results += len(new_keys)
+            if not contents:
+                STATS.empty_pages += 1
+            elif not new_keys:
+                STATS.repeated_pages += 1
+
+        if not contents or not new_keys:
+            self.done = True    # 空ページ / 既出の記事だけのページ
+            return []
+        if (payload or {}).get("isLastPage") or len(contents) < self.page_size:
+            self.done = True
+        return contents
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search-prefetch")
+    return _executor
+
+
+def iter_search_pages(fetch_page: Callable[[str, int, int], Optional[Dict]], keyword: str,
+                      max_pages: int = None, page_size: int = None,
+                      prefetch: bool = None, pager: Optional[SearchPager] = None) -> Iterator[List[Dict]]:
+    """検索結果をページごとに返す（次ページは先読み。pager を渡すとその続きから）"""
+    pager = pager or SearchPager(keyword, page_size, max_pages)
+    prefetch = SEARCH_CONFIG["prefetch"] if prefetch is None else prefetch
+
+    def request(start: int) -> Future:
+        if prefetch:
+            return _get_executor().submit(fetch_page, keyword, start, pager.page_size)
+        future = Future()
+        future.set_result(fetch_page(keyword, start, pager.page_size))
+        return future
+
+    start = pager.next_start()
+    pending = request(start) if start is not None else None
+    try:
+        while pending is not None:
+            notes = pager.accept(pending.result())
+            start = pager.next_start()
+            # 先読み: 現在のページを返す前に次のページを依頼
+            pending = request(start) if start is not None and prefetch else None
+            if notes:
+                yield notes
+            if pending is None and start is not None:
+                pending = request(start)
+    finally:
+        if pending is not None and prefetch:
+            # 呼び出し側が途中で止めた場合、先読みした1ページは使われない
+            with _stats_lock:
+                STATS.unused_prefetches += 1
+
+
+def reset_stats():
+    """計測値をリセット"""
+    global STATS
+    with _stats_lock:
+        STATS = SearchStats()
+
+
+def print_report():
+    """1リクエストあたりのユニーク件数を表示（未使用なら何もしない）"""
+    s = STATS
+    if not s.requests:
+        return
+    print(f"🔎 検索: {s.keywords}キーワード / {s.requests}リクエスト, "
+          f"{s.results}件中ユニーク {s.unique_results}件 "
+          f"({s.unique_results / s.requests:.1f}件/リクエスト), "
+          f"空ページ {s.empty_pages} / 重複ページ {s.repeated_pages} / 未使用の先読み {s.unused_prefetches}")
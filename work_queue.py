@@ -0,0 +1,387 @@
+"""
+noteAI 共有ワークキュー（リース方式）
+
+キーワード・クリエイターの作業項目を SQLite に置き、複数の収集ワーカー
+（同じマシンの別プロセス、または共有ファイルシステム上の別ノード）で分担して処理する。
+
+仕組み:
+- 作業項目は (種類, キー) で一意。クリエイターは INSERT OR IGNORE で1回だけ登録される
+- lease() で項目を借りる（BEGIN IMMEDIATE で排他。期限切れのリースは他のワーカーが引き継ぐ）
+- 処理中はハートビートでリースを延長。落ちたワーカーの項目は期限切れ後に再配布
+- complete() は自分がリースを持っている場合だけ成功（期限切れ後の二重完了を防ぐ）
+- 出力はワーカーごとのファイル（raw_notes_v3.<worker>.jsonl）。merge で記事ID単位に重複排除して統合
+- 収集済みユーザーは通常の v3 と同じインデックス（USERS_INDEX_FILE）と creator_store を共有する。
+  収集済みのクリエイターは登録しない
+- 目標ユーザー数（v3 の max_users）はキュー全体で数える。数えるのは収集対象になったクリエイター
+  （done）だけで、フォロワー数などで対象外だったものは skipped として完了にする。done + リース中が
+  目標に達したら lease() はクリエイターを貸さず、done が目標に達したらワーカーは終了する
+- レート制限はワーカーごと（各プロセスが自分の LIMITER を持つ）
+
+使用方法:
+    python work_queue.py seed --keywords 10          # v3 のキーワードを登録
+    python work_queue.py worker --worker-id w1 &     # ワーカーを必要な数だけ起動（--max-users で全体の目標数）
+    python work_queue.py worker --worker-id w2 &
+    python work_queue.py status                      # 進捗
+    python work_queue.py merge                       # ワーカー出力を raw_notes_v3.jsonl に統合
+
+注意: 共有ファイルシステムで使う場合は、SQLite のファイルロックが正しく動くもの（NFSv4 等）に限る。
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# ============================================================
+# 設定
+# ============================================================
+
+QUEUE_CONFIG = {
+    "path": Path("data") / "work_queue.sqlite",
+    "lease_seconds": 120,       # リース期間（ハートビートが途絶えたらこの秒数で再配布）
+    "heartbeat_interval": 30,   # リース延長の間隔（秒）
+    "max_attempts": 3,          # これを超えて失敗した項目は failed
+    "poll_interval": 2.0,       # 他のワーカーの作業待ちの間隔（秒）
+}
+
+# ============================================================
+# キュー本体
+# ============================================================
+
+@dataclass
+class WorkItem:
+    """作業項目"""
+    kind: str
+    key: str
+    payload: Dict
+    attempts: int
+
+
+class WorkQueue:
+    """SQLiteによるリース方式の作業キュー（スレッドセーフ）"""
+
+    def __init__(self, path: Path = None, worker_id: str = None, lease_seconds: float = None):
+        self.path = Path(path or QUEUE_CONFIG["path"]).resolve()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds or QUEUE_CONFIG["lease_seconds"]
+        self._held: Dict[tuple, WorkItem] = {}  # 自分がリース中の項目
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30,
+                                    isolation_level=None)  # トランザクションは明示的に開始
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS work_items (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_work_state ON work_items(kind, state, lease_until)")
+
+    def enqueue(self, kind: str, key: str, payload: Optional[Dict] = None) -> bool:
+        """項目を登録（既に登録済みなら何もしない。新規登録ならTrue）"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO work_items (kind, key, payload, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(payload or {}, ensure_ascii=False), time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def _claimed(self, kind: str, now: float) -> int:
+        """完了 + 有効なリース中の件数（ロック取得済みで呼ぶ）"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM work_items WHERE kind = ? AND "
+            "(state = 'done' OR (state = 'leased' AND lease_until >= ?))", (kind, now)).fetchone()[0]
+
+    def lease(self, kind: str, limit: int = 1, max_done: Optional[int] = None) -> List[WorkItem]:
+        """未処理（または期限切れリース）の項目を借りる
+
+        max_done を渡すと、完了 + リース中の件数がそれに達する分までしか貸さない（キュー全体の目標数）。
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if max_done is not None:
+                    limit = max(min(limit, max_done - self._claimed(kind, now)), 0)
+                rows = self.conn.execute(
+                    "SELECT key, payload, attempts FROM work_items WHERE kind = ? AND "
+                    "(state = 'pending' OR (state = 'leased' AND lease_until < ?)) "
+                    "ORDER BY rowid LIMIT ?", (kind, now, limit),
+                ).fetchall()
+                items = []
+                for key, payload, attempts in rows:
+                    self.conn.execute(
+                        "UPDATE work_items SET state = 'leased', owner = ?, lease_until = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE kind = ? AND key = ?",
+                        (self.worker_id, now + self.lease_seconds, now, kind, key),
+                    )
+                    item = WorkItem(kind, key, json.loads(payload or "{}"), attempts + 1)
+                    self._held[(kind, key)] = item
+                    items.append(item)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return items
+
+    def heartbeat(self) -> int:
+        """リース中の項目の期限を延長（延長できた件数を返す）"""
+        now = time.time()
+        renewed = 0
+        with self._lock:
+            for kind, key in list(self._held):
+                cursor = self.conn.execute(
+                    "UPDATE work_items SET lease_until = ?, updated_at = ? "
+                    "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                    (now + self.lease_seconds, now, kind, key, self.worker_id),
+                )
+                if cursor.rowcount:
+                    renewed += 1
+                else:
+                    del self._held[(kind, key)]  # 期限切れで他のワーカーに移った
+        return renewed
+
+    def complete(self, item: WorkItem, accepted: bool = True) -> bool:
+        """完了にする（accepted=False なら処理したが対象外 = skipped。リースを失っていたらFalse）"""
+        with self._lock:
+            self._held.pop((item.kind, item.key), None)
+            cursor = self.conn.execute(
+                "UPDATE work_items SET state = ?, lease_until = NULL, updated_at = ? "
+                "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                ("done" if accepted else "skipped", time.time(), item.kind, item.key, self.worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, item: WorkItem, error: str):
+        """失敗を記録（max_attempts 未満なら再配布待ちに戻す）"""
+        state = "failed" if item.attempts >= QUEUE_CONFIG["max_attempts"] else "pending"
+        with self._lock:
+            self._held.pop((item.kind, item.key), None)
+            self.conn.execute(
+                "UPDATE work_items SET state = ?, owner = NULL, lease_until = NULL, error = ?, "
+                "updated_at = ? WHERE kind = ? AND key = ? AND owner = ?",
+                (state, error[:500], time.time(), item.kind, item.key, self.worker_id),
+            )
+
+    def claimed(self, kind: str) -> int:
+        """完了 + 有効なリース中の件数"""
+        with self._lock:
+            return self._claimed(kind, time.time())
+
+    def done(self, kind: str) -> int:
+        """完了した件数（対象外だった skipped は含まない）"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM work_items WHERE kind = ? AND state = 'done'", (kind,)).fetchone()[0]
+
+    def remaining(self) -> int:
+        """未完了（未処理 + リース中）の項目数"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM work_items WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def status(self) -> Dict[str, Dict[str, int]]:
+        """種類・状態ごとの件数"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT kind, state, COUNT(*) FROM work_items GROUP BY kind, state").fetchall()
+        result: Dict[str, Dict[str, int]] = {}
+        for kind, state, count in rows:
+            result.setdefault(kind, {})[state] = count
+        return result
+
+    def owners(self) -> Dict[str, int]:
+        """ワーカーごとの完了件数（対象外だった skipped も含む）"""
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT owner, COUNT(*) FROM work_items WHERE state IN ('done', 'skipped') "
+                "GROUP BY owner").fetchall())
+
+
+class Heartbeat:
+    """バックグラウンドでリースを延長し続ける"""
+
+    def __init__(self, queue: WorkQueue, interval: float = None):
+        self.queue = queue
+        self.interval = interval or QUEUE_CONFIG["heartbeat_interval"]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.queue.heartbeat()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+# ============================================================
+# v3 ワーカー
+# ============================================================
+
+def _worker_files(worker_id: str):
+    """ワーカーごとの出力ファイル名に使える文字列"""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in worker_id)
+
+
+def seed(num_keywords: Optional[int]):
+    """v3 のキーワードを作業項目として登録"""
+    import collect_power_data_v3 as v3
+
+    queue = WorkQueue()
+    keywords = v3.ALL_KEYWORDS[:num_keywords] if num_keywords else v3.ALL_KEYWORDS
+    added = sum(queue.enqueue("keyword", f"{category}:{keyword}", {"category": category, "keyword": keyword})
+                for category, keyword in keywords)
+    print(f"🌱 {added}/{len(keywords)}キーワードを登録: {queue.path}")
+
+
+def run_worker(worker_id: str, base_url: Optional[str] = None, rate: Optional[float] = None,
+               max_users: Optional[int] = None):
+    """キューが空になるか、キュー全体で目標ユーザー数を処理するまでキーワード・クリエイターを処理
+    （v3 の判定をそのまま使用）"""
+    import collect_power_data_v3 as v3
+    from creator_store import get_creator_store
+    from rate_limiter import AdaptiveRateLimiter
+    from search_iterator import iter_search_pages
+
+    queue = WorkQueue(worker_id=worker_id)
+    suffix = _worker_files(queue.worker_id)
+    # 出力・進捗・記事IDの重複排除インデックスはワーカーごと（収集済みユーザーは v3 と共有）
+    v3.RAW_DATA_FILE = v3.DATA_DIR / f"raw_notes_v3.{suffix}.jsonl"
+    v3.PROGRESS_FILE = v3.DATA_DIR / f"collection_progress_v3.{suffix}.json"
+    v3.DEDUP_FILE = v3.DATA_DIR / f"dedup_index_v3.{suffix}.sqlite"
+    target = max_users or v3.CONFIG["max_users"]  # 目標数はキュー全体で管理
+    if base_url:
+        v3.BASE_URL = base_url
+    if rate:
+        v3.LIMITER = AdaptiveRateLimiter(rate=rate, min_rate=min(rate, 1.0), max_rate=rate)
+
+    collector = v3.DataCollector()
+    store = get_creator_store()
+    processed = {"keyword": 0, "creator": 0}
+    print(f"👷 ワーカー {queue.worker_id} 開始（目標: キュー全体で {target}ユーザー）")
+
+    with Heartbeat(queue):
+        while True:
+            if queue.done("creator") >= target:
+                print(f"\n🎯 目標ユーザー数 ({target}) に到達!")
+                break
+            # 先に見つかっているクリエイターを処理し、無ければ次のキーワードを検索
+            # （目標数のクリエイターが処理中なら検索はしない）
+            items = queue.lease("creator", max_done=target)
+            if not items and queue.claimed("creator") < target:
+                items = queue.lease("keyword")
+            if not items:
+                if queue.remaining() == 0:
+                    break
+                time.sleep(QUEUE_CONFIG["poll_interval"])  # 他のワーカーの処理待ち
+                continue
+
+            item = items[0]
+            accepted = True
+            try:
+                if item.kind == "keyword":
+                    category, keyword = item.payload["category"], item.payload["keyword"]
+                    print(f"\n🔍 [{category}] '{keyword}' を検索中...")
+                    for notes in iter_search_pages(v3.fetch_search_page, keyword, max_pages=5):
+                        for note in notes:
+                            user = note.get("user", {})
+                            urlname = user.get("urlname", "")
+                            if (urlname and urlname not in collector.collected_users
+                                    and store.should_fetch_profile(user, v3.CONFIG["max_followers"])):
+                                queue.enqueue("creator", urlname, {"category": category, "keyword": keyword})
+                else:
+                    # 収集済みユーザーのインデックスと creator_store の状態は process_user が更新する
+                    known = item.key in collector.collected_users
+                    collector.process_user(item.key, item.payload["category"], item.payload["keyword"])
+                    collector.save_progress()  # 出力を永続化してから完了にする
+                    # 目標数に数えるのは収集済みユーザーに加わったクリエイターだけ（フォロワー数超過などは対象外）
+                    accepted = not known and item.key in collector.collected_users
+                if not queue.complete(item, accepted):
+                    print(f"  ⚠️ リース切れ: {item.kind} {item.key}（他のワーカーが再処理）")
+                processed[item.kind] += 1
+            except Exception as e:
+                print(f"  ❌ {item.kind} {item.key}: {e}")
+                queue.fail(item, str(e))
+
+    collector.save_progress()
+    print(f"\n✅ ワーカー {queue.worker_id} 終了: キーワード {processed['keyword']} / "
+          f"クリエイター {processed['creator']}, {collector.progress['total_notes']}記事")
+
+
+def merge():
+    """ワーカーごとの出力を記事ID単位で重複排除して raw_notes_v3.jsonl に追記"""
+    import collect_power_data_v3 as v3
+    from dedup_index import DedupIndex
+    from jsonl_writer import JsonlWriter
+
+    notes = DedupIndex(v3.DEDUP_FILE, "notes")
+    notes.catch_up(v3.RAW_DATA_FILE, "note_id")
+    added = duplicates = 0
+    with JsonlWriter(v3.RAW_DATA_FILE) as writer:
+        for path in sorted(v3.DATA_DIR.glob("raw_notes_v3.*.jsonl")):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        continue
+                    record = json.loads(line)
+                    if record["note_id"] in notes:
+                        duplicates += 1
+                        continue
+                    writer.write(record)
+                    notes.add(record["note_id"])
+                    added += 1
+    notes.commit(v3.RAW_DATA_FILE)
+    print(f"🔗 統合: {added}記事を追加, 重複 {duplicates}件をスキップ → {v3.RAW_DATA_FILE}")
+
+# ============================================================
+# メイン
+# ============================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="noteAI 共有ワークキュー")
+    parser.add_argument("command", choices=["seed", "worker", "status", "merge"])
+    parser.add_argument("--keywords", type=int, default=None, help="seed: 登録するキーワード数")
+    parser.add_argument("--worker-id", default=None, help="worker: ワーカー名（既定: ホスト名:PID）")
+    parser.add_argument("--base-url", default=None, help="worker: APIのベースURL（スタブ用）")
+    parser.add_argument("--rate", type=float, default=None, help="worker: このワーカーのレート上限（req/s）")
+    parser.add_argument("--max-users", type=int, default=None,
+                        help="worker: キュー全体の目標ユーザー数（既定: v3 の max_users）")
+    parser.add_argument("--lease", type=float, default=None, help="リース期間（秒）")
+    args = parser.parse_args()
+
+    if args.lease:
+        QUEUE_CONFIG["lease_seconds"] = args.lease
+        QUEUE_CONFIG["heartbeat_interval"] = args.lease / 4
+
+    if args.command == "seed":
+        seed(args.keywords)
+    elif args.command == "worker":
+        run_worker(args.worker_id, args.base_url, args.rate, args.max_users)
+    elif args.command == "merge":
+        merge()
+    else:
+        queue = WorkQueue()
+        for kind, states in queue.status().items():
+            print(f"  {kind:>8}: " + ", ".join(f"{state} {count}" for state, count in sorted(states.items())))
+        print(f"  完了数（ワーカー別）: {queue.owners()}")